@@ -0,0 +1,646 @@
+"""
+ChainAware - Benchmark Suite
+============================
+
+Micro-benchmarks and load tests for the ChainAwareTraceability hot paths.
+
+The contract is imported with a local stand-in for the `genlayer` module,
+so the suite runs with plain CPython. Every case reports throughput,
+p50/p99 latency per operation and the peak memory traced while it runs,
+and the results can be written as JSON and compared against a saved
+baseline:
+
+    python benchmarks/bench_chainaware.py --output results.json
+    python benchmarks/bench_chainaware.py --baseline results.json --threshold 0.2
+
+The comparison exits with status 1 when any case loses more than the
+threshold in throughput or p50 latency. Use --quick for smaller sizes and
+--only to select cases by name prefix.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import math
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any, Callable, Awaitable
+
+# Stand-in for the GenLayer runtime; only the contract decorator is needed
+if "genlayer" not in sys.modules:
+    genlayer = types.ModuleType("genlayer")
+    genlayer.intelligent_contract = lambda cls: cls
+    genlayer.__all__ = ["intelligent_contract"]
+    sys.modules["genlayer"] = genlayer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chainaware_traceability as chainaware
+from chainaware_traceability import (
+    ChainAwareTraceability, LocationData, LocationHistory, NullEventSink, ScoringPool,
+    haversine_km, score_risk_batch, verify_history_proof
+)
+
+START_TIME = datetime(2024, 1, 1)
+
+@dataclass
+class BenchmarkResult:
+    """Timing and memory figures of one benchmark case"""
+    name: str
+    params: Dict[str, Any]
+    operations: int
+    items: int
+    seconds: float
+    throughput: float
+    p50_us: float
+    p99_us: float
+    peak_kib: float
+
+    @property
+    def key(self) -> str:
+        return self.name + "".join(f" {name}={value}" for name, value in sorted(self.params.items()))
+
+@dataclass
+class Benchmark:
+    """
+    A benchmark case: setup builds the state for one parameter set, and
+    step runs one timed operation and returns the number of items it
+    processed (readings, rows, products...).
+    """
+    name: str
+    setup: Callable[..., Awaitable[Any]]
+    step: Callable[[Any, int], Awaitable[int]]
+    params: List[Dict[str, Any]]
+    quick_params: List[Dict[str, Any]]
+    operations: int = 200
+    teardown: Optional[Callable[[Any], Awaitable[None]]] = None
+
+# Fixtures
+
+def product_data(index: int, batches: int = 100) -> Dict[str, Any]:
+    return {
+        "name": f"Product {index}",
+        "category": "pharmaceuticals" if index % 2 else "food",
+        "origin": ("ES", "FR", "DE", "IT")[index % 4],
+        "manufacturer": f"Manufacturer {index % 50}",
+        "production_date": (START_TIME + timedelta(minutes=index)).isoformat(),
+        "batch_number": f"B{index % batches:06d}",
+        "specifications": {"weight_kg": 1.5},
+        "regulatory_codes": ["FDA-21-CFR-11", f"EU-GMP-{index % 10}"]
+    }
+
+def reading(index: int, product_offset: int = 0) -> Dict[str, Any]:
+    excursion = index % 50 == 0
+    return {
+        "latitude": 40.0 + (index % 1000) * 0.001 + product_offset * 0.01,
+        "longitude": -3.7 + (index % 700) * 0.001,
+        "timestamp": (START_TIME + timedelta(seconds=index)).isoformat(),
+        "temperature": 45.0 if excursion else 4.0 + (index % 7) * 0.1,
+        "humidity": 55.0 + (index % 5),
+        "pressure": 1013.0,
+        "shock_level": 1.0
+    }
+
+def location(index: int, product_offset: int = 0) -> LocationData:
+    data = reading(index, product_offset)
+    data["timestamp"] = datetime.fromisoformat(data["timestamp"])
+    return LocationData(**data)
+
+async def new_contract(anomaly_detection: bool = True) -> ChainAwareTraceability:
+    contract = ChainAwareTraceability()
+    await contract.configure_event_sink(NullEventSink())
+    contract.configure_anomaly_detection(anomaly_detection)
+    contract.configure_alert_policy(rate_limit=None)
+    return contract
+
+async def populate(contract: ChainAwareTraceability, products: int, readings_per_product: int = 0,
+                   batches: int = 100) -> List[str]:
+    """Fill the catalog and location histories directly, skipping validation and events"""
+    product_ids = []
+    for index in range(products):
+        data = product_data(index, batches)
+        product_id = contract._generate_product_id(data)
+        contract._store_product(contract._build_product(product_id, data))
+        product_ids.append(product_id)
+        for row in range(readings_per_product):
+            await contract._store_location(product_id, location(row, index))
+    return product_ids
+
+def fast_history(contract: ChainAwareTraceability, product_id: str, rows: int):
+    """Attach a large history by filling the columns in place (no stats or commitments)"""
+    history = LocationHistory()
+    for row in range(rows):
+        history.append(location(row))
+    contract.locations[product_id] = history
+    latest = history.latest()
+    if latest is not None:
+        contract.spatial_index.update(product_id, latest.latitude, latest.longitude)
+
+def tiled_history(contract: ChainAwareTraceability, product_id: str, rows: int, block: int = 10000):
+    """Like fast_history, but repeats one block of readings shifted in time so huge histories build quickly"""
+    fast_history(contract, product_id, min(rows, block))
+    history = contract.locations[product_id]
+    span = history.timestamp_us[-1] - history.timestamp_us[0] + 1000000
+    base = history.timestamp_us[:]
+    for start in range(len(history), rows, block):
+        count = min(block, rows - start)
+        shift = span * (start // block)
+        for name, _ in LocationHistory.COLUMNS:
+            if name != "timestamp_us":
+                getattr(history, name).extend(getattr(history, name)[:count])
+        history.timestamp_us.extend(timestamp + shift for timestamp in base[:count])
+
+# Cases
+
+async def setup_register(products: int) -> Dict[str, Any]:
+    contract = await new_contract()
+    await populate(contract, products)
+    return {"contract": contract, "next": products}
+
+async def step_register(state: Dict[str, Any], index: int) -> int:
+    await state["contract"].register_product(product_data(state["next"] + index))
+    return 1
+
+async def step_register_bulk(state: Dict[str, Any], index: int) -> int:
+    start = state["next"] + index * 1000
+    await state["contract"].register_products_bulk(product_data(i) for i in range(start, start + 1000))
+    return 1000
+
+async def setup_update(products: int, history: int, anomaly_detection: bool = True,
+                       metrics: bool = False, workers: int = 0) -> Dict[str, Any]:
+    contract = await new_contract(anomaly_detection)
+    product_ids = await populate(contract, products)
+    if metrics:
+        contract.enable_metrics()
+    if workers:
+        contract.enable_parallel_scoring(workers, min_batch=256)
+    for product_id in product_ids[:1]:
+        fast_history(contract, product_id, history)
+    return {"contract": contract, "product_ids": product_ids, "row": history, "use_scoring_pool": bool(workers)}
+
+async def step_update_single(state: Dict[str, Any], index: int) -> int:
+    await state["contract"].update_location(state["product_ids"][0], reading(state["row"] + index))
+    return 1
+
+async def step_update_stream(state: Dict[str, Any], index: int) -> int:
+    # Round-robin over the catalog, as a fleet of sensors reporting in turn
+    product_ids = state["product_ids"]
+    for offset in range(100):
+        position = index * 100 + offset
+        await state["contract"].update_location(product_ids[position % len(product_ids)], reading(state["row"] + position))
+    return 100
+
+async def step_update_bulk(state: Dict[str, Any], index: int) -> int:
+    product_ids = state["product_ids"]
+    base = state["row"] + index * 1000
+    await state["contract"].update_locations_bulk(
+        ((product_ids[(base + offset) % len(product_ids)], reading(base + offset)) for offset in range(1000)),
+        use_scoring_pool=state["use_scoring_pool"]
+    )
+    return 1000
+
+async def setup_durable_update(products: int, fsync_interval: float) -> Dict[str, Any]:
+    state = await setup_update(products, 0)
+    state["directory"] = tempfile.mkdtemp(prefix="chainaware-bench-")
+    await state["contract"].enable_durability(state["directory"], fsync_interval=fsync_interval)
+    return state
+
+async def teardown_durable(state: Dict[str, Any]):
+    await state["contract"].disable_durability()
+    shutil.rmtree(state["directory"], ignore_errors=True)
+
+async def setup_score_batch(size: int, backend: str, workers: int = 0) -> Dict[str, Any]:
+    temperatures = [4.0 + (i % 50) for i in range(size)]
+    humidities = [50.0 + (i % 40) for i in range(size)]
+    shocks = [math.nan if i % 11 == 0 else (i % 8) * 1.0 for i in range(size)]
+    if backend == "numpy" and chainaware.np is None:
+        raise RuntimeError("NumPy is not installed")
+    state = {"columns": (temperatures, humidities, shocks), "backend": backend, "size": size}
+    if backend == "pool":
+        state["pool"] = ScoringPool(workers, min_batch=1)
+        state["product_ids"] = [f"{i % 1000:016x}" for i in range(size)]
+    return state
+
+async def step_score_batch(state: Dict[str, Any], index: int) -> int:
+    if state["backend"] == "pool":
+        await state["pool"].score(state["product_ids"], *state["columns"])
+        return state["size"]
+    numpy = chainaware.np
+    if state["backend"] == "python":
+        chainaware.np = None
+    try:
+        score_risk_batch(*state["columns"])
+    finally:
+        chainaware.np = numpy
+    return state["size"]
+
+async def teardown_score_batch(state: Dict[str, Any]):
+    if "pool" in state:
+        state["pool"].shutdown()
+
+async def setup_verify_documents(documents: int, workers: int) -> Dict[str, Any]:
+    contract = await new_contract()
+    if workers:
+        contract.enable_parallel_scoring(workers, min_batch=256)
+    batch = [
+        {"product_id": f"{i % 1000:016x}", "type": "certificate", "issuer": f"Lab {i % 17}",
+         "codes": ["FDA-21-CFR-11", f"EU-GMP-{i % 10}"], "measurements": [i * 0.5, i * 0.25, i * 0.125]}
+        for i in range(documents)
+    ]
+    return {"contract": contract, "documents": batch, "use_scoring_pool": bool(workers)}
+
+async def step_verify_documents(state: Dict[str, Any], index: int) -> int:
+    await state["contract"].verify_documents_bulk(state["documents"], use_scoring_pool=state["use_scoring_pool"])
+    return len(state["documents"])
+
+async def setup_predict(products: int, cached: bool, source_latency_ms: float = 0.0) -> Dict[str, Any]:
+    contract = await new_contract()
+    product_ids = await populate(contract, products, readings_per_product=5)
+    if source_latency_ms:
+        # Simulated network round trips to show the concurrent fan-out
+        async def slow(source: Awaitable[Dict[str, Any]]) -> Dict[str, Any]:
+            await asyncio.sleep(source_latency_ms / 1000.0)
+            return await source
+        weather, traffic = contract._get_weather_data, contract._get_traffic_data
+        contract._get_weather_data = lambda origin, destination: slow(weather.__func__(contract, origin, destination))
+        contract._get_traffic_data = lambda origin, destination: slow(traffic.__func__(contract, origin, destination))
+    return {"contract": contract, "product_ids": product_ids, "cached": cached}
+
+async def step_predict(state: Dict[str, Any], index: int) -> int:
+    contract = state["contract"]
+    if not state["cached"]:
+        contract.external_cache.clear()
+    product_id = state["product_ids"][index % len(state["product_ids"])]
+    await contract.predict_delivery_risks(product_id, {"latitude": 48.85 + (index % 3), "longitude": 2.35})
+    return 1
+
+async def setup_traceability(history: int, mode: str) -> Dict[str, Any]:
+    contract = await new_contract()
+    product_ids = await populate(contract, 1)
+    fast_history(contract, product_ids[0], history)
+    return {"contract": contract, "product_id": product_ids[0], "history": history, "mode": mode}
+
+async def step_traceability(state: Dict[str, Any], index: int) -> int:
+    contract, product_id, history = state["contract"], state["product_id"], state["history"]
+    mode = state["mode"]
+    if mode == "page":
+        result = await contract.get_product_traceability(product_id, limit=100, cursor=str((index * 100) % max(1, history - 100)))
+    elif mode == "range":
+        since = START_TIME + timedelta(seconds=(index * 997) % max(1, history - 3600))
+        result = await contract.get_product_traceability(product_id, since=since, until=since + timedelta(hours=1))
+    elif mode == "bucket":
+        result = await contract.get_product_traceability(product_id, downsample="bucket", bucket_seconds=3600)
+    else:
+        result = await contract.get_product_traceability(product_id)
+    return len(result["location_history"])
+
+NATURAL_LANGUAGE_QUERIES = (
+    "Show products from Manufacturer 7",
+    "What are the high-risk shipments?",
+    "Where are the products right now?",
+    "Show alerts for today",
+    "Which items are in danger?",
+    "Hello"
+)
+
+async def setup_query(products: int) -> Dict[str, Any]:
+    contract = await new_contract()
+    product_ids = await populate(contract, products, readings_per_product=2)
+    return {"contract": contract, "product_ids": product_ids}
+
+async def step_query(state: Dict[str, Any], index: int) -> int:
+    await state["contract"].query_natural_language(NATURAL_LANGUAGE_QUERIES[index % len(NATURAL_LANGUAGE_QUERIES)])
+    return 1
+
+async def setup_spatial(products: int, query: str, scan: str = "grid") -> Dict[str, Any]:
+    contract = await new_contract()
+    product_ids = await populate(contract, products)
+    for index, product_id in enumerate(product_ids):
+        contract.spatial_index.update(product_id, 36.0 + (index * 7919 % 9000) / 1000.0, -9.0 + (index * 104729 % 12000) / 1000.0)
+    return {"contract": contract, "query": query, "scan": scan}
+
+def linear_scan(contract: ChainAwareTraceability, latitude: float, longitude: float,
+                radius_km: Optional[float] = None, k: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Brute-force baseline for the grid: measure every position and sort"""
+    matches = []
+    for product_id, (lat, lon, _) in contract.spatial_index.positions.items():
+        distance = haversine_km(latitude, longitude, lat, lon)
+        if radius_km is None or distance <= radius_km:
+            matches.append((distance, product_id))
+    matches.sort()
+    return [contract._position_entry(product_id, distance) for distance, product_id in matches[:k]]
+
+async def step_spatial(state: Dict[str, Any], index: int) -> int:
+    contract = state["contract"]
+    latitude, longitude = 40.0 + (index % 10) * 0.1, -3.7
+    if state["scan"] == "linear":
+        if state["query"] == "radius":
+            return len(linear_scan(contract, latitude, longitude, radius_km=25.0)) or 1
+        return len(linear_scan(contract, latitude, longitude, k=10)) or 1
+    if state["query"] == "radius":
+        return len(await contract.find_products_within_radius(latitude, longitude, 25.0)) or 1
+    return len(await contract.find_nearest_products(latitude, longitude, 10)) or 1
+
+async def setup_snapshot(products: int, readings_per_product: int) -> Dict[str, Any]:
+    contract = await new_contract()
+    product_ids = await populate(contract, products)
+    for product_id in product_ids:
+        tiled_history(contract, product_id, readings_per_product)
+    directory = tempfile.mkdtemp(prefix="chainaware-bench-")
+    path = os.path.join(directory, "state.snap")
+    await contract.save_snapshot(path)
+    return {"contract": contract, "directory": directory, "path": path, "readings": products * readings_per_product}
+
+async def step_snapshot_save(state: Dict[str, Any], index: int) -> int:
+    await state["contract"].save_snapshot(state["path"])
+    return state["readings"]
+
+async def step_snapshot_load(state: Dict[str, Any], index: int) -> int:
+    contract = ChainAwareTraceability()
+    await contract.load_snapshot(state["path"])
+    await contract.shutdown()
+    return state["readings"]
+
+async def teardown_snapshot(state: Dict[str, Any]):
+    shutil.rmtree(state["directory"], ignore_errors=True)
+
+async def setup_export(products: int, readings_per_product: int, format: str) -> Dict[str, Any]:
+    contract = await new_contract()
+    product_ids = await populate(contract, products)
+    for product_id in product_ids:
+        fast_history(contract, product_id, readings_per_product)
+    return {"contract": contract, "format": format}
+
+async def step_export(state: Dict[str, Any], index: int) -> int:
+    rows = 0
+    async for _ in state["contract"].export_traceability(state["format"]):
+        rows += 1
+    return rows
+
+async def setup_recall(products: int) -> Dict[str, Any]:
+    contract = await new_contract()
+    await populate(contract, products, batches=max(1, products // 100))
+    return {"contract": contract, "batches": max(1, products // 100)}
+
+async def step_recall(state: Dict[str, Any], index: int) -> int:
+    result = await state["contract"].recall_products(batch_number=f"B{index % state['batches']:06d}")
+    return max(1, result["affected"])
+
+async def setup_history_proof(history: int) -> Dict[str, Any]:
+    contract = await new_contract()
+    product_ids = await populate(contract, 1, readings_per_product=history)
+    root = (await contract.get_history_root(product_ids[0]))["root"]
+    return {"contract": contract, "product_id": product_ids[0], "history": history, "root": root}
+
+async def step_history_proof(state: Dict[str, Any], index: int) -> int:
+    proof = await state["contract"].get_history_proof(state["product_id"], (index * 7919) % state["history"])
+    if not verify_history_proof(proof["reading"], proof, state["root"]):
+        raise RuntimeError("History proof failed to verify")
+    return 1
+
+async def setup_route(waypoints: int, offset_degrees: float) -> Dict[str, Any]:
+    contract = await new_contract()
+    product_id = (await populate(contract, 1))[0]
+    contract.set_planned_route(product_id, [(40.0 + i * 0.0005, -3.7 + i * 0.001) for i in range(waypoints)], tolerance_km=5.0)
+    return {
+        "contract": contract,
+        "product_id": product_id,
+        "route": contract.planned_routes[product_id],
+        "waypoints": waypoints,
+        "offset": offset_degrees
+    }
+
+async def step_route(state: Dict[str, Any], index: int) -> int:
+    # A shipment advancing along the route, offset to the north of it
+    waypoint = (index * 3) % state["waypoints"]
+    reading = LocationData(
+        latitude=40.0 + waypoint * 0.0005 + state["offset"],
+        longitude=-3.7 + waypoint * 0.001,
+        timestamp=START_TIME + timedelta(seconds=index)
+    )
+    await state["contract"]._check_route(state["product_id"], state["route"], reading)
+    return 1
+
+BENCHMARKS = [
+    Benchmark("register_product", setup_register, step_register,
+              [{"products": 1000}, {"products": 100000}], [{"products": 1000}]),
+    Benchmark("register_products_bulk", setup_register, step_register_bulk,
+              [{"products": 1000}, {"products": 100000}], [{"products": 1000}], operations=10),
+    Benchmark("update_location", setup_update, step_update_single,
+              [{"products": 1000, "history": 0}, {"products": 1000, "history": 1000000}],
+              [{"products": 100, "history": 10000}], operations=2000),
+    Benchmark("update_location_no_anomaly", lambda **params: setup_update(anomaly_detection=False, **params),
+              step_update_single, [{"products": 1000, "history": 0}], [{"products": 100, "history": 0}], operations=2000),
+    Benchmark("update_location_metrics", lambda **params: setup_update(metrics=True, **params),
+              step_update_single, [{"products": 1000, "history": 0}], [{"products": 100, "history": 0}], operations=2000),
+    Benchmark("update_location_stream", setup_update, step_update_stream,
+              [{"products": 1000, "history": 0}, {"products": 100000, "history": 0}],
+              [{"products": 1000, "history": 0}], operations=100),
+    Benchmark("update_locations_bulk", setup_update, step_update_bulk,
+              [{"products": 1000, "history": 0}, {"products": 100000, "history": 0}],
+              [{"products": 1000, "history": 0}], operations=30),
+    # The opt-in pool against the inline path above; it is not expected to be faster
+    Benchmark("update_locations_bulk_parallel", setup_update, step_update_bulk,
+              [{"products": 1000, "history": 0, "workers": 2}, {"products": 1000, "history": 0, "workers": 4}],
+              [{"products": 1000, "history": 0, "workers": 2}], operations=30),
+    Benchmark("update_location_durable", setup_durable_update, step_update_single,
+              [{"products": 1000, "fsync_interval": 0.01}, {"products": 1000, "fsync_interval": 0.0}],
+              [{"products": 100, "fsync_interval": 0.01}], operations=500, teardown=teardown_durable),
+    Benchmark("update_locations_bulk_durable", setup_durable_update, step_update_bulk,
+              [{"products": 1000, "fsync_interval": 0.01}], [{"products": 100, "fsync_interval": 0.01}],
+              operations=20, teardown=teardown_durable),
+    Benchmark("score_risk_batch", setup_score_batch, step_score_batch,
+              [{"size": 100000, "backend": "python"}, {"size": 100000, "backend": "numpy"},
+               {"size": 1000000, "backend": "python"}, {"size": 1000000, "backend": "numpy"}],
+              [{"size": 10000, "backend": "python"}], operations=20),
+    # The pool next to the inline backends it has to beat before being enabled
+    Benchmark("score_risk_batch_pool", setup_score_batch, step_score_batch,
+              [{"size": 100000, "backend": "python", "workers": 0}, {"size": 100000, "backend": "numpy", "workers": 0},
+               {"size": 100000, "backend": "pool", "workers": 2}, {"size": 100000, "backend": "pool", "workers": 4},
+               {"size": 100000, "backend": "pool", "workers": 8}],
+              [{"size": 10000, "backend": "python", "workers": 0}, {"size": 10000, "backend": "pool", "workers": 2}],
+              operations=20, teardown=teardown_score_batch),
+    Benchmark("verify_documents_bulk", setup_verify_documents, step_verify_documents,
+              [{"documents": 10000, "workers": 0}, {"documents": 10000, "workers": 4}],
+              [{"documents": 1000, "workers": 0}, {"documents": 1000, "workers": 2}], operations=10),
+    Benchmark("predict_delivery_risks", setup_predict, step_predict,
+              [{"products": 1000, "cached": True}, {"products": 1000, "cached": False}],
+              [{"products": 100, "cached": True}], operations=1000),
+    Benchmark("predict_delivery_risks_fanout", setup_predict, step_predict,
+              [{"products": 100, "cached": False, "source_latency_ms": 20.0}],
+              [{"products": 10, "cached": False, "source_latency_ms": 5.0}], operations=50),
+    Benchmark("get_product_traceability", setup_traceability, step_traceability,
+              [{"history": 1000, "mode": "full"}, {"history": 1000000, "mode": "page"},
+               {"history": 1000000, "mode": "range"}, {"history": 1000000, "mode": "bucket"}],
+              [{"history": 10000, "mode": "page"}, {"history": 10000, "mode": "range"}], operations=50),
+    Benchmark("query_natural_language", setup_query, step_query,
+              [{"products": 1000}, {"products": 10000}], [{"products": 200}], operations=120),
+    Benchmark("spatial_query", setup_spatial, step_spatial,
+              [{"products": 100000, "query": "radius"}, {"products": 100000, "query": "nearest"}],
+              [{"products": 10000, "query": "radius"}, {"products": 10000, "query": "nearest"}], operations=200),
+    # The linear scan the grid replaces, for the same queries
+    Benchmark("spatial_query_linear", setup_spatial, step_spatial,
+              [{"products": 100000, "query": "radius", "scan": "linear"},
+               {"products": 100000, "query": "nearest", "scan": "linear"}],
+              [{"products": 10000, "query": "radius", "scan": "linear"},
+               {"products": 10000, "query": "nearest", "scan": "linear"}], operations=20),
+    Benchmark("snapshot_save", setup_snapshot, step_snapshot_save,
+              [{"products": 100, "readings_per_product": 10000}, {"products": 100, "readings_per_product": 100000}],
+              [{"products": 10, "readings_per_product": 1000}],
+              operations=5, teardown=teardown_snapshot),
+    Benchmark("snapshot_load", setup_snapshot, step_snapshot_load,
+              [{"products": 100, "readings_per_product": 10000}, {"products": 100, "readings_per_product": 100000}],
+              [{"products": 10, "readings_per_product": 1000}],
+              operations=5, teardown=teardown_snapshot),
+    Benchmark("export_traceability", setup_export, step_export,
+              [{"products": 100, "readings_per_product": 2000, "format": "ndjson"},
+               {"products": 100, "readings_per_product": 2000, "format": "csv"}],
+              [{"products": 10, "readings_per_product": 500, "format": "ndjson"}], operations=3),
+    Benchmark("recall_products", setup_recall, step_recall,
+              [{"products": 1000000}], [{"products": 10000}], operations=50),
+    Benchmark("history_proof", setup_history_proof, step_history_proof,
+              [{"history": 100000}], [{"history": 1000}], operations=500),
+    Benchmark("route_check", setup_route, step_route,
+              [{"waypoints": 1000, "offset_degrees": 0.01}, {"waypoints": 100000, "offset_degrees": 0.01},
+               {"waypoints": 100000, "offset_degrees": 0.5}],
+              [{"waypoints": 5000, "offset_degrees": 0.01}, {"waypoints": 5000, "offset_degrees": 0.5}], operations=2000),
+]
+
+# Runner
+
+def percentile(sorted_values: List[float], quantile: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(quantile * len(sorted_values)))]
+
+async def run_case(benchmark: Benchmark, params: Dict[str, Any], operations: int) -> BenchmarkResult:
+    """Time operations individually, then trace peak memory over a shorter second pass"""
+    state = await benchmark.setup(**params)
+    try:
+        warmup = max(1, operations // 20)
+        for index in range(warmup):
+            await benchmark.step(state, index)
+
+        gc.collect()
+        latencies = []
+        items = 0
+        started = time.perf_counter()
+        for index in range(warmup, warmup + operations):
+            operation_started = time.perf_counter()
+            items += await benchmark.step(state, index)
+            latencies.append(time.perf_counter() - operation_started)
+        seconds = time.perf_counter() - started
+
+        tracemalloc.start()
+        baseline, _ = tracemalloc.get_traced_memory()
+        offset = warmup + operations
+        for index in range(offset, offset + max(1, min(operations // 10, 20))):
+            await benchmark.step(state, index)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        if benchmark.teardown is not None:
+            await benchmark.teardown(state)
+        if isinstance(state, dict) and "contract" in state:
+            await state["contract"].shutdown()
+
+    latencies.sort()
+    return BenchmarkResult(
+        name=benchmark.name,
+        params=params,
+        operations=operations,
+        items=items,
+        seconds=seconds,
+        throughput=items / seconds if seconds else 0.0,
+        p50_us=percentile(latencies, 0.50) * 1e6,
+        p99_us=percentile(latencies, 0.99) * 1e6,
+        peak_kib=max(0, peak - baseline) / 1024.0
+    )
+
+async def run_benchmarks(quick: bool = False, only: Optional[List[str]] = None,
+                         scale: float = 1.0) -> List[BenchmarkResult]:
+    results = []
+    for benchmark in BENCHMARKS:
+        if only and not any(benchmark.name.startswith(prefix) for prefix in only):
+            continue
+        for params in benchmark.quick_params if quick else benchmark.params:
+            operations = max(1, int(benchmark.operations * scale))
+            try:
+                result = await run_case(benchmark, params, operations)
+            except RuntimeError as e:
+                print(f"{benchmark.name} {params}: skipped ({e})")
+                continue
+            print(format_result(result))
+            results.append(result)
+    return results
+
+def format_result(result: BenchmarkResult) -> str:
+    return (f"{result.key:<72} {result.throughput:>14,.0f} items/s  p50 {result.p50_us:>11,.1f} us  "
+            f"p99 {result.p99_us:>11,.1f} us  peak {result.peak_kib:>10,.0f} KiB")
+
+def environment() -> Dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "numpy": getattr(chainaware.np, "__version__", None),
+        "timestamp": datetime.now().isoformat()
+    }
+
+def compare(results: List[BenchmarkResult], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Regressions against a saved results file: throughput more than
+    threshold below, or p50 latency more than threshold above the baseline.
+    """
+    previous = {
+        BenchmarkResult(**entry).key: entry for entry in baseline["results"]
+    }
+    regressions = []
+    for result in results:
+        entry = previous.get(result.key)
+        if entry is None:
+            continue
+        if entry["throughput"] and result.throughput < entry["throughput"] * (1 - threshold):
+            regressions.append(f"{result.key}: throughput {result.throughput:,.0f} < baseline {entry['throughput']:,.0f} items/s")
+        if entry["p50_us"] and result.p50_us > entry["p50_us"] * (1 + threshold):
+            regressions.append(f"{result.key}: p50 {result.p50_us:,.1f} > baseline {entry['p50_us']:,.1f} us")
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="ChainAwareTraceability benchmark suite")
+    parser.add_argument("--quick", action="store_true", help="run small sizes only")
+    parser.add_argument("--only", default=None, help="comma-separated benchmark name prefixes")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the operation counts")
+    parser.add_argument("--output", default=None, help="write JSON results to this path")
+    parser.add_argument("--baseline", default=None, help="compare against a saved JSON results file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression (default 0.2)")
+    args = parser.parse_args(argv)
+
+    only = [prefix.strip() for prefix in args.only.split(",")] if args.only else None
+    results = asyncio.run(run_benchmarks(quick=args.quick, only=only, scale=args.scale))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"environment": environment(), "results": [asdict(result) for result in results]}, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
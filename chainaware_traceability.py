@@ -7,13 +7,38 @@ to create a predictive, self-regulating supply chain ecosystem.
 """
 
 from genlayer import *
-from typing import Dict, List, Optional, Any
-from datetime import datetime, timezone
+from typing import Dict, List, Optional, Any, Iterable, Tuple, Callable, Awaitable, Hashable, AsyncIterable, Union, Sequence
+from datetime import datetime, timezone, timedelta
 from enum import Enum
+from array import array
+from collections import deque, OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import csv
+import functools
+import io
 import json
+import math
 import re
 import hashlib
-from dataclasses import dataclass
+import heapq
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import time
+import unicodedata
+import zlib
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from operator import itemgetter
+from dataclasses import dataclass, fields as dataclass_fields
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; batch scoring falls back to pure Python
+    np = None
 
 class ProductStatus(Enum):
     """Product status tracking"""
@@ -41,6 +66,36 @@ class AlertType(Enum):
     SECURITY_BREACH = "security_breach"
     REGULATORY_VIOLATION = "regulatory_violation"
 
+# Alert type raised for the leading risk factor of a reading
+FACTOR_ALERT_TYPES = {
+    "temperature_extreme": AlertType.TEMPERATURE_DEVIATION,
+    "humidity_extreme": AlertType.QUALITY_RISK,
+    "excessive_shock": AlertType.QUALITY_RISK,
+    "temperature_drift": AlertType.TEMPERATURE_DEVIATION,
+    "temperature_spike": AlertType.TEMPERATURE_DEVIATION
+}
+
+REGULATORY_CODE_PATTERN = re.compile(r'^[A-Z0-9-]+$')
+
+# Sensor thresholds used by real-time risk analysis
+TEMPERATURE_MIN = 0
+TEMPERATURE_MAX = 40
+HUMIDITY_MIN = 30
+HUMIDITY_MAX = 80
+SHOCK_MAX = 5
+
+# Risk factors in bitmask order (bit i set means RISK_FACTORS[i] applies)
+RISK_FACTORS = ("temperature_extreme", "humidity_extreme", "excessive_shock")
+
+# Small-int encoding of risk levels used by batch scoring
+RISK_LEVEL_CODES = (RiskLevel.LOW, RiskLevel.MEDIUM, RiskLevel.HIGH, RiskLevel.CRITICAL)
+
+CURRENT_RISK_RECOMMENDATIONS = {
+    RiskLevel.LOW: "Conditions are within acceptable range",
+    RiskLevel.MEDIUM: "Monitor conditions closely",
+    RiskLevel.HIGH: "Immediate attention required - conditions may affect product quality"
+}
+
 @dataclass
 class ProductData:
     """Product information structure"""
@@ -54,6 +109,7 @@ class ProductData:
     specifications: Dict[str, Any]
     regulatory_codes: List[str]
     sensors_config: Dict[str, Any]
+    status: ProductStatus = ProductStatus.MANUFACTURED
 
 @dataclass
 class LocationData:
@@ -82,133 +138,2965 @@ class Alert:
     type: AlertType
     level: RiskLevel
     message: str
-    location: LocationData
+    location: Optional[LocationData]
     timestamp: datetime
     acknowledged: bool = False
     resolution: Optional[str] = None
+    product_id: Optional[str] = None
+    count: int = 1
+    first_seen: Optional[datetime] = None
+    last_seen: Optional[datetime] = None
+    
+    @property
+    def is_open(self) -> bool:
+        """Open alerts absorb repeated occurrences; acknowledged or resolved ones are closed"""
+        return not self.acknowledged and not self.resolution
 
-@intelligent_contract
-class ChainAwareTraceability:
+class EventSink:
+    """Destination for contract events, written in batches by EventLog"""
+    
+    async def write(self, events: List[Tuple[str, Dict[str, Any], float]]):
+        """Write a batch of (event_type, data, unix_time) records"""
+        raise NotImplementedError
+    
+    async def close(self):
+        """Release any resources held by the sink"""
+        pass
+
+class NullEventSink(EventSink):
+    """Discards every event"""
+    
+    async def write(self, events: List[Tuple[str, Dict[str, Any], float]]):
+        pass
+
+class StdoutEventSink(EventSink):
+    """Prints events in the historical 'ChainAware Event' format, off the event loop"""
+    
+    async def write(self, events: List[Tuple[str, Dict[str, Any], float]]):
+        text = "".join(
+            f"ChainAware Event: {event_type} - {json.dumps(data, default=str)}\n"
+            for event_type, data, _ in events
+        )
+        await asyncio.to_thread(self._print, text)
+    
+    def _print(self, text: str):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+class MemoryEventSink(EventSink):
+    """Keeps the most recent events in a bounded ring buffer"""
+    
+    def __init__(self, capacity: int = 10000):
+        self.buffer = deque(maxlen=capacity)
+    
+    async def write(self, events: List[Tuple[str, Dict[str, Any], float]]):
+        self.buffer.extend(events)
+    
+    @property
+    def events(self) -> List[Dict[str, Any]]:
+        return [
+            {"event": event_type, "data": data, "timestamp": timestamp}
+            for event_type, data, timestamp in self.buffer
+        ]
+
+class JsonLinesEventSink(EventSink):
+    """Appends events to a JSON-lines file, one write and flush per batch"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+    
+    async def write(self, events: List[Tuple[str, Dict[str, Any], float]]):
+        lines = "".join(
+            json.dumps({"event": event_type, "timestamp": timestamp, "data": data}, default=str) + "\n"
+            for event_type, data, timestamp in events
+        )
+        await asyncio.to_thread(self._append, lines)
+    
+    def _append(self, lines: str):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(lines)
+        self._file.flush()
+    
+    async def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def _snapshot_payload(value: Any) -> Any:
+    """Copy the dicts and lists of an event payload; other values are kept as they are"""
+    if isinstance(value, dict):
+        return {key: _snapshot_payload(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_snapshot_payload(item) for item in value]
+    return value
+
+class EventLog:
     """
-    Intelligent Traceability System powered by GenLayer AI capabilities
+    Non-blocking event queue drained into an EventSink by a background task.
+    
+    Producers only append to an in-memory queue; serialization and I/O happen
+    in the drain task, in batches of up to batch_size events. When
+    max_pending events are queued the overflow policy applies: "drop_oldest"
+    and "drop_newest" discard events (counted in dropped), while "block"
+    makes emit wait for the drain task to free space.
     """
     
-    def __init__(self):
-        self.products: Dict[str, ProductData] = {}
-        self.locations: Dict[str, List[LocationData]] = {}
-        self.alerts: List[Alert] = []
-        self.risk_models: Dict[str, Any] = {}
-        self.regulatory_apis = {}
-        self.weather_api_key = None
-        self.traffic_api_key = None
+    OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+    
+    def __init__(self, sink: Optional[EventSink] = None, max_pending: int = 10000,
+                 overflow: str = "drop_oldest", batch_size: int = 500, flush_on_shutdown: bool = True):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.sink = sink if sink is not None else StdoutEventSink()
+        self.max_pending = max_pending
+        self.overflow = overflow
+        self.batch_size = batch_size
+        self.flush_on_shutdown = flush_on_shutdown
+        self.emitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._pending = deque()
+        self._task = None
+        self._closing = False
+    
+    async def emit(self, event_type: str, data: Dict[str, Any]) -> bool:
+        """
+        Queue an event; returns False if it was dropped.
         
-    async def initialize_system(self, weather_api: str = None, traffic_api: str = None):
-        """Initialize external API connections and risk models"""
-        self.weather_api_key = weather_api
-        self.traffic_api_key = traffic_api
+        data is snapshotted (dicts and lists copied recursively) so later
+        changes by the caller do not alter the queued event.
+        """
+        data = _snapshot_payload(data)
+        self._ensure_worker()
+        if len(self._pending) >= self.max_pending:
+            if self.overflow == "drop_newest":
+                self.dropped += 1
+                return False
+            if self.overflow == "drop_oldest":
+                self._pending.popleft()
+                self.dropped += 1
+            else:
+                while len(self._pending) >= self.max_pending:
+                    self._space.clear()
+                    await self._space.wait()
+        self._pending.append((event_type, data, time.time()))
+        self.emitted += 1
+        self._idle.clear()
+        self._wakeup.set()
+        return True
+    
+    async def flush(self):
+        """Wait until every queued event has been handed to the sink"""
+        if self._task is None or self._task.done():
+            if not self._pending:
+                return
+            self._ensure_worker()
+        await self._idle.wait()
+    
+    async def shutdown(self):
+        """Stop the drain task, flushing or discarding queued events"""
+        if not self.flush_on_shutdown:
+            self.dropped += len(self._pending)
+            self._pending.clear()
+        if self._pending and (self._task is None or self._task.done()):
+            self._ensure_worker()
+        if self._task is not None and not self._task.done():
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+        self._task = None
+        self._closing = False
+        await self.sink.close()
+    
+    def _ensure_worker(self):
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._idle = asyncio.Event()
+        if not self._pending:
+            self._idle.set()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def _run(self):
+        while True:
+            if not self._pending:
+                self._idle.set()
+                if self._closing:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            self._space.set()
+            try:
+                await self.sink.write(batch)
+                self.written += len(batch)
+            except Exception:
+                self.failed += len(batch)
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash_encode(latitude: float, longitude: float, precision: int = 5) -> str:
+    """Encode a coordinate as a base32 geohash of the given length"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, bounds = (longitude, lon_range) if even else (latitude, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            bounds[0] = mid
+        else:
+            bits <<= 1
+            bounds[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+class TTLCache:
+    """
+    Bounded LRU cache with an optional per-entry time-to-live.
+    
+    get_or_load coalesces concurrent misses for the same key into a single
+    loader call; every waiter receives that call's result (or exception).
+    Invalidating a key that is being loaded detaches the load: its waiters
+    still get the result, but it is not cached and later misses load again.
+    """
+    
+    _MISSING = object()
+    
+    def __init__(self, max_entries: int = 10000, ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return self._lookup(key) is not self._MISSING
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a cached value, counting the hit or miss"""
+        value = self._lookup(key)
+        if value is self._MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+    
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entry if full"""
+        expires = self.clock() + self.ttl if self.ttl is not None else math.inf
+        self._entries[key] = (value, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key, loading it at most once on a miss"""
+        value = self._lookup(key)
+        if value is not self._MISSING:
+            self.hits += 1
+            return value
         
-        # Initialize AI risk prediction models
-        await self._load_risk_models()
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
         
-        # Setup regulatory API connections
-        await self._setup_regulatory_apis()
+        self.misses += 1
+        task = asyncio.ensure_future(loader())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finish_load(key, done))
+        return await asyncio.shield(task)
+    
+    def invalidate(self, key: Hashable) -> bool:
+        """Drop a single entry or in-flight load; returns whether there was one"""
+        cached = self._entries.pop(key, None) is not None
+        loading = self._inflight.pop(key, None) is not None
+        return cached or loading
+    
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry and in-flight load whose key matches predicate; returns the count"""
+        keys = {key for key in self._entries if predicate(key)}
+        keys.update(key for key in self._inflight if predicate(key))
+        for key in keys:
+            self._entries.pop(key, None)
+            self._inflight.pop(key, None)
+        return len(keys)
+    
+    def clear(self) -> int:
+        """Drop every entry and in-flight load; returns the count"""
+        removed = len(set(self._entries).union(self._inflight))
+        self._entries.clear()
+        self._inflight.clear()
+        return removed
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and current size"""
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+    
+    def _finish_load(self, key: Hashable, task: asyncio.Future):
+        if self._inflight.get(key) is not task:
+            # Invalidated while loading; the result may already be stale
+            return
+        del self._inflight[key]
+        if not task.cancelled() and task.exception() is None:
+            self.set(key, task.result())
+    
+    def _lookup(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return self._MISSING
+        value, expires = entry
+        if expires <= self.clock():
+            del self._entries[key]
+            self.expirations += 1
+            return self._MISSING
+        self._entries.move_to_end(key)
+        return value
+
+# Latency histogram bucket upper bounds in seconds (10 us .. 10 s)
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+# HELP text of the exported metric families
+METRIC_HELP = {
+    "method_duration_seconds": "Latency of public contract methods",
+    "stage_duration_seconds": "Latency of internal processing stages",
+    "external_fetch_duration_seconds": "Latency of external data source fetches, including timeouts",
+    "method_errors_total": "Public method calls that raised",
+    "readings_ingested_total": "Location readings stored",
+    "alerts_raised_total": "New alerts created",
+    "alerts_coalesced_total": "Repeated alerts folded into an open alert",
+    "alerts_suppressed_total": "New alerts dropped by the rate limit"
+}
+
+# Public methods timed by enable_metrics
+INSTRUMENTED_METHODS = (
+    "register_product", "register_products_bulk", "update_location", "update_locations_bulk",
+    "predict_delivery_risks", "verify_document", "verify_documents_bulk", "get_product_traceability", "query_natural_language",
+    "search_products", "recall_products", "acknowledge_alert", "resolve_alert",
+    "find_products_within_radius", "find_products_in_bbox", "find_nearest_products",
+    "get_history_root", "get_history_proof", "save_snapshot", "load_snapshot", "checkpoint"
+)
+
+# Internal stages timed inline (perf_counter deltas) while metrics are enabled
+INSTRUMENTED_STAGES = (
+    "validation", "regulatory_compliance", "store_location", "risk_analysis", "anomaly_detection",
+    "historical_analysis", "route_check", "alert_creation", "log_event"
+)
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with a running sum and count"""
+    
+    __slots__ = ("bounds", "counts", "sum", "count")
+    
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, seconds: float):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+    
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(upper bound, cumulative count) pairs ending with +Inf"""
+        total = 0
+        buckets = []
+        for bound, count in zip(list(self.bounds) + ["+Inf"], self.counts):
+            total += count
+            buckets.append((bound if isinstance(bound, str) else repr(bound), total))
+        return buckets
+
+class ContractMetrics:
+    """
+    Latency histograms and counters keyed by metric name and label pairs.
+    
+    Names follow Prometheus conventions: histograms are observed in
+    seconds and counters end in _total.
+    """
+    
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], LatencyHistogram] = {}
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+    
+    def histogram(self, name: str, labels: Tuple[Tuple[str, str], ...] = ()) -> LatencyHistogram:
+        key = (name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram(self.bounds)
+        return histogram
+    
+    def increment(self, name: str, labels: Tuple[Tuple[str, str], ...] = (), amount: float = 1):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + amount
+    
+    def to_dict(self) -> Dict[str, Any]:
+        histograms: Dict[str, List[Dict[str, Any]]] = {}
+        for (name, labels), histogram in self.histograms.items():
+            histograms.setdefault(name, []).append({
+                "labels": dict(labels),
+                "count": histogram.count,
+                "sum": histogram.sum,
+                "buckets": dict(histogram.cumulative())
+            })
+        counters: Dict[str, List[Dict[str, Any]]] = {}
+        for (name, labels), value in self.counters.items():
+            counters.setdefault(name, []).append({"labels": dict(labels), "value": value})
+        return {"histograms": histograms, "counters": counters}
+
+def _prometheus_labels(labels: Iterable[Tuple[str, Any]]) -> str:
+    """Render label pairs in Prometheus text format, escaping their values"""
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def score_risk_batch(temperature, humidity, shock_level):
+    """
+    Score many readings at once with the same rules as _analyze_current_risks.
+    
+    Takes parallel float sequences (NaN for a missing value) and returns
+    (levels, factor_masks, confidences): level codes indexing RISK_LEVEL_CODES,
+    bitmasks over RISK_FACTORS and the confidence of each reading. Uses NumPy
+    when available and a pure-Python loop otherwise; both apply the
+    confidence deductions in the same order as the scalar path, so results
+    are bit-for-bit identical.
+    """
+    if np is not None:
+        temperature = np.asarray(temperature, dtype=np.float64)
+        humidity = np.asarray(humidity, dtype=np.float64)
+        shock_level = np.asarray(shock_level, dtype=np.float64)
         
-        return "ChainAware Intelligent Traceability System initialized"
+        # NaN compares false, and the scalar path skips falsy (zero) values
+        temperature_risk = (temperature < TEMPERATURE_MIN) | (temperature > TEMPERATURE_MAX)
+        humidity_risk = (humidity != 0) & ((humidity < HUMIDITY_MIN) | (humidity > HUMIDITY_MAX))
+        shock_risk = shock_level > SHOCK_MAX
+        
+        confidence = np.full(temperature.shape, 0.9)
+        confidence = np.where(temperature_risk, confidence - 0.2, confidence)
+        confidence = np.where(humidity_risk, confidence - 0.15, confidence)
+        confidence = np.where(shock_risk, confidence - 0.25, confidence)
+        
+        masks = temperature_risk.astype(np.uint8) | (humidity_risk.astype(np.uint8) << 1) | (shock_risk.astype(np.uint8) << 2)
+        counts = temperature_risk.astype(np.int8) + humidity_risk + shock_risk
+        
+        levels = np.zeros(temperature.shape, dtype=np.int8)
+        levels[(counts >= 1) | (confidence < 0.8)] = 1
+        levels[(counts >= 2) | (confidence < 0.6)] = 2
+        return levels, masks, confidence
     
-    async def register_product(self, product_data: Dict[str, Any]) -> str:
+    levels = array("b")
+    masks = array("B")
+    confidences = array("d")
+    for temp, hum, shock in zip(temperature, humidity, shock_level):
+        mask = 0
+        count = 0
+        confidence = 0.9
+        if temp < TEMPERATURE_MIN or temp > TEMPERATURE_MAX:
+            mask |= 1
+            count += 1
+            confidence -= 0.2
+        if hum and (hum < HUMIDITY_MIN or hum > HUMIDITY_MAX):
+            mask |= 2
+            count += 1
+            confidence -= 0.15
+        if shock > SHOCK_MAX:
+            mask |= 4
+            count += 1
+            confidence -= 0.25
+        if count >= 2 or confidence < 0.6:
+            levels.append(2)
+        elif count >= 1 or confidence < 0.8:
+            levels.append(1)
+        else:
+            levels.append(0)
+        masks.append(mask)
+        confidences.append(confidence)
+    return levels, masks, confidences
+
+def risk_prediction_from_score(level_code: int, factor_mask: int, confidence: float) -> RiskPrediction:
+    """Build the RiskPrediction for one entry of a score_risk_batch result"""
+    level = RISK_LEVEL_CODES[int(level_code)]
+    return RiskPrediction(
+        level=level,
+        factors=[factor for bit, factor in enumerate(RISK_FACTORS) if int(factor_mask) >> bit & 1],
+        confidence=float(confidence),
+        recommendation=CURRENT_RISK_RECOMMENDATIONS[level],
+        predicted_time=datetime.now(timezone.utc)
+    )
+
+_SCORE_SHARD = struct.Struct("<I")                  # reading count; float64 columns follow
+
+def _taker(positions: Sequence[int]) -> Callable[[Sequence[Any]], Tuple[Any, ...]]:
+    """Gather the items at positions from a sequence as a tuple, in C"""
+    if len(positions) == 1:
+        position = positions[0]
+        return lambda values: (values[position],)
+    return itemgetter(*positions)
+
+def score_shard(payload: bytes) -> bytes:
+    """
+    Worker entry point: score_risk_batch over one shard packed by ScoringPool.
+    
+    payload is a reading count followed by the temperature, humidity and
+    shock columns of the shard's readings as float64. The result packs the
+    int8 levels, uint8 factor masks and float64 confidences in the same order.
+    """
+    (count,) = _SCORE_SHARD.unpack_from(payload)
+    columns = memoryview(payload)[_SCORE_SHARD.size:].cast("d")
+    levels, masks, confidences = score_risk_batch(columns[:count], columns[count:2 * count], columns[2 * count:])
+    return levels.tobytes() + masks.tobytes() + confidences.tobytes()
+
+def document_hash(document_data: Dict[str, Any]) -> str:
+    """SHA-256 of a document's canonical JSON form"""
+    return hashlib.sha256(json.dumps(document_data, sort_keys=True).encode()).hexdigest()
+
+def hash_documents(documents: List[Dict[str, Any]]) -> List[str]:
+    """Worker entry point: document_hash of every document in a shard"""
+    return [document_hash(document) for document in documents]
+
+class ScoringPool:
+    """
+    Worker processes that score readings and hash documents off the event loop.
+    
+    Batches are sharded by crc32 of their product ID modulo the worker
+    count, so a product's items always go to the same shard, in arrival
+    order. Each shard task receives only its own rows (packed float64
+    columns for readings, a pickled list for documents); the event loop
+    keeps the batch positions of every shard and scatters the results back
+    into preallocated arrays, so callers get exactly what the
+    single-process functions return. Batches under min_batch items are
+    processed inline.
+    
+    This is not a throughput feature. Only scoring or hashing moves to
+    the workers, and per reading that costs about as much as packing,
+    dispatching and scattering the shard, so the pool is no faster than
+    inline scoring (see the score_risk_batch_pool and
+    update_locations_bulk_parallel benchmarks). Its one use is keeping the
+    event loop responsive while a very large batch is scored.
+    """
+    
+    def __init__(self, workers: Optional[int] = None, min_batch: int = 1024, start_method: Optional[str] = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.min_batch = min_batch
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(start_method))
+        self.tasks = 0
+        self.items = 0
+        self._shard_cache: Dict[str, int] = {}
+    
+    def shard_of(self, key: str) -> int:
+        """Shard a product ID is assigned to"""
+        return zlib.crc32(key.encode("utf-8")) % self.workers
+    
+    async def score(self, product_ids: Sequence[str], temperature: Sequence[float], humidity: Sequence[float],
+                    shock_level: Sequence[float]) -> Tuple[Sequence[int], Sequence[int], Sequence[float]]:
+        """score_risk_batch over a batch, one worker task per shard"""
+        count = len(product_ids)
+        if count < self.min_batch:
+            return score_risk_batch(temperature, humidity, shock_level)
+        shards = self._shards(product_ids)
+        payloads = []
+        for positions in shards:
+            take = _taker(positions)
+            payloads.append(b"".join((
+                _SCORE_SHARD.pack(len(positions)),
+                array("d", take(temperature)).tobytes(),
+                array("d", take(humidity)).tobytes(),
+                array("d", take(shock_level)).tobytes()
+            )))
+        results = await self._map(score_shard, payloads, count)
+        
+        # Scatter each shard's results back to its batch positions
+        levels = array("b", bytes(count))
+        masks = array("B", bytes(count))
+        confidences = array("d", bytes(8 * count))
+        for positions, result in zip(shards, results):
+            size = len(positions)
+            shard_levels = array("b", result[:size])
+            shard_masks = array("B", result[size:2 * size])
+            shard_confidences = array("d", result[2 * size:])
+            for position, level, mask, confidence in zip(positions, shard_levels, shard_masks, shard_confidences):
+                levels[position] = level
+                masks[position] = mask
+                confidences[position] = confidence
+        return levels, masks, confidences
+    
+    async def hash_documents(self, keys: Sequence[str], documents: Sequence[Dict[str, Any]]) -> List[str]:
+        """document_hash of every document, sharded by key"""
+        if len(documents) < self.min_batch:
+            return hash_documents(documents)
+        shards = self._shards(keys)
+        results = await self._map(hash_documents, [list(_taker(positions)(documents)) for positions in shards], len(documents))
+        digests: List[Optional[str]] = [None] * len(documents)
+        for positions, shard_digests in zip(shards, results):
+            for position, digest in zip(positions, shard_digests):
+                digests[position] = digest
+        return digests
+    
+    def shutdown(self):
+        """Stop the worker processes"""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": self.workers, "min_batch": self.min_batch, "tasks": self.tasks, "items": self.items}
+    
+    def _shards(self, keys: Sequence[str]) -> List[List[int]]:
+        """Batch positions of each non-empty shard, in batch order"""
+        cache = self._shard_cache
+        if len(cache) > 1 << 20:
+            cache.clear()
+        for key in set(keys).difference(cache):
+            cache[key] = self.shard_of(key)
+        shards: List[List[int]] = [[] for _ in range(self.workers)]
+        appends = [positions.append for positions in shards]
+        for position, shard in enumerate(map(cache.__getitem__, keys)):
+            appends[shard](position)
+        return [positions for positions in shards if positions]
+    
+    async def _map(self, function: Callable, payloads: List[Any], items: int) -> List[Any]:
+        loop = asyncio.get_running_loop()
+        self.tasks += len(payloads)
+        self.items += items
+        return await asyncio.gather(*(loop.run_in_executor(self.executor, function, payload) for payload in payloads))
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two coordinates in kilometres"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+class SpatialIndex:
+    """
+    Uniform latitude/longitude grid over the latest position of each product.
+    
+    Updates move a product between cells in O(1). Radius and bounding-box
+    queries only visit the cells overlapping the query area, and k-nearest
+    queries grow a ring of cells until k candidates are found, then confirm
+    them with an exact radius query.
+    """
+    
+    def __init__(self, cell_degrees: float = 0.5):
+        self.cell_degrees = cell_degrees
+        self.lon_cells = math.ceil(360 / cell_degrees)
+        self.cells: Dict[Tuple[int, int], Dict[str, None]] = {}
+        self.positions: Dict[str, Tuple[float, float, Tuple[int, int]]] = {}
+        self.regions: Dict[str, List[Tuple[int, int]]] = {}
+    
+    def __len__(self) -> int:
+        return len(self.positions)
+    
+    def cell_of(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        """Grid cell containing a coordinate"""
+        return (
+            math.floor(latitude / self.cell_degrees),
+            math.floor(((longitude + 180) % 360) / self.cell_degrees)
+        )
+    
+    def update(self, key: str, latitude: float, longitude: float):
+        """Move a key to a new position"""
+        cell = self.cell_of(latitude, longitude)
+        previous = self.positions.get(key)
+        if previous is not None and previous[2] != cell:
+            self._discard(key, previous[2])
+        if previous is None or previous[2] != cell:
+            self.cells.setdefault(cell, {})[key] = None
+        self.positions[key] = (latitude, longitude, cell)
+    
+    def remove(self, key: str):
+        """Forget a key"""
+        previous = self.positions.pop(key, None)
+        if previous is not None:
+            self._discard(key, previous[2])
+    
+    def cover(self, key: str, min_lat: float, min_lon: float, max_lat: float, max_lon: float):
+        """Register a key in every cell overlapping a bounding box, without a position"""
+        self.uncover(key)
+        low_lat, low_lon = self.cell_of(min_lat, min_lon)
+        high_lat, high_lon = self.cell_of(max_lat, max_lon)
+        lon_span = (high_lon - low_lon) % self.lon_cells + 1
+        if min_lon <= max_lon and max_lon - min_lon >= 360 - self.cell_degrees:
+            lon_span = self.lon_cells
+        cells = [
+            (lat_cell, (low_lon + lon_offset) % self.lon_cells)
+            for lat_cell in range(low_lat, high_lat + 1)
+            for lon_offset in range(lon_span)
+        ]
+        for cell in cells:
+            self.cells.setdefault(cell, {})[key] = None
+        self.regions[key] = cells
+    
+    def uncover(self, key: str):
+        """Remove a key registered with cover"""
+        for cell in self.regions.pop(key, ()):
+            self._discard(key, cell)
+    
+    def keys_at(self, latitude: float, longitude: float) -> Iterable[str]:
+        """Keys registered in the cell containing a coordinate"""
+        return self.cells.get(self.cell_of(latitude, longitude), {}).keys()
+    
+    def position(self, key: str) -> Optional[Tuple[float, float]]:
+        """Latest (latitude, longitude) of a key"""
+        entry = self.positions.get(key)
+        return (entry[0], entry[1]) if entry else None
+    
+    def within_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[str]:
+        """Keys inside a bounding box; min_lon > max_lon crosses the antimeridian"""
+        crosses = min_lon > max_lon
+        matches = []
+        for key in self._keys_in_cells(min_lat, min_lon, max_lat, max_lon):
+            latitude, longitude, _ = self.positions[key]
+            if not min_lat <= latitude <= max_lat:
+                continue
+            if (longitude >= min_lon or longitude <= max_lon) if crosses else (min_lon <= longitude <= max_lon):
+                matches.append(key)
+        return matches
+    
+    def within_radius(self, latitude: float, longitude: float, radius_km: float) -> List[Tuple[str, float]]:
+        """(key, distance_km) pairs within radius_km, nearest first"""
+        min_lat, min_lon, max_lat, max_lon = _radius_bbox(latitude, longitude, radius_km)
+        matches = []
+        for key in self._keys_in_cells(min_lat, min_lon, max_lat, max_lon):
+            other_lat, other_lon, _ = self.positions[key]
+            distance = haversine_km(latitude, longitude, other_lat, other_lon)
+            if distance <= radius_km:
+                matches.append((key, distance))
+        matches.sort(key=lambda match: match[1])
+        return matches
+    
+    def nearest(self, latitude: float, longitude: float, k: int) -> List[Tuple[str, float]]:
+        """The k keys closest to a coordinate as (key, distance_km), nearest first"""
+        if k <= 0 or not self.positions:
+            return []
+        if k >= len(self.positions):
+            return self._all_by_distance(latitude, longitude)
+        
+        # Grow a ring of cells until it holds k candidates
+        center_lat, center_lon = self.cell_of(latitude, longitude)
+        distances = []
+        seen = 0
+        ring = 0
+        while len(distances) < k and seen < len(self.positions):
+            for cell in self._ring(center_lat, center_lon, ring):
+                for key in self.cells.get(cell, ()):
+                    other_lat, other_lon, _ = self.positions[key]
+                    distances.append(haversine_km(latitude, longitude, other_lat, other_lon))
+                    seen += 1
+            ring += 1
+            if ring > self.lon_cells:
+                break
+        if len(distances) < k:
+            return self._all_by_distance(latitude, longitude)[:k]
+        
+        # Cells beyond the ring may still hold closer keys; an exact radius query settles it
+        radius = heapq.nsmallest(k, distances)[-1]
+        return self.within_radius(latitude, longitude, radius)[:k]
+    
+    def _all_by_distance(self, latitude: float, longitude: float) -> List[Tuple[str, float]]:
+        return sorted(
+            ((key, haversine_km(latitude, longitude, entry[0], entry[1])) for key, entry in self.positions.items()),
+            key=lambda match: match[1]
+        )
+    
+    def _ring(self, center_lat: int, center_lon: int, ring: int) -> Iterable[Tuple[int, int]]:
+        if ring == 0:
+            yield (center_lat, center_lon % self.lon_cells)
+            return
+        for lat_cell in range(center_lat - ring, center_lat + ring + 1):
+            if abs(lat_cell - center_lat) == ring:
+                lon_offsets = range(-ring, ring + 1)
+            else:
+                lon_offsets = (-ring, ring)
+            for lon_offset in lon_offsets:
+                yield (lat_cell, (center_lon + lon_offset) % self.lon_cells)
+    
+    def _keys_in_cells(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> Iterable[str]:
+        low_lat, low_lon = self.cell_of(min_lat, min_lon)
+        high_lat, high_lon = self.cell_of(max_lat, max_lon)
+        lon_span = (high_lon - low_lon) % self.lon_cells + 1
+        if min_lon <= max_lon and max_lon - min_lon >= 360 - self.cell_degrees:
+            lon_span = self.lon_cells
+        
+        # Fall back to the occupied cells when the area spans more cells than exist
+        if (high_lat - low_lat + 1) * lon_span > len(self.cells):
+            for (lat_cell, lon_cell), keys in self.cells.items():
+                if low_lat <= lat_cell <= high_lat and (lon_cell - low_lon) % self.lon_cells < lon_span:
+                    yield from keys
+            return
+        
+        for lat_cell in range(low_lat, high_lat + 1):
+            for lon_offset in range(lon_span):
+                keys = self.cells.get((lat_cell, (low_lon + lon_offset) % self.lon_cells))
+                if keys:
+                    yield from keys
+    
+    def _discard(self, key: str, cell: Tuple[int, int]):
+        keys = self.cells.get(cell)
+        if keys is not None:
+            keys.pop(key, None)
+            if not keys:
+                del self.cells[cell]
+
+def _radius_bbox(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """Bounding box (min_lat, min_lon, max_lat, max_lon) enclosing a circle"""
+    lat_delta = radius_km / KM_PER_DEGREE
+    min_lat = max(-90.0, latitude - lat_delta)
+    max_lat = min(90.0, latitude + lat_delta)
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return min_lat, -180.0, max_lat, 180.0
+    lon_delta = lat_delta / math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if lon_delta >= 180.0:
+        return min_lat, -180.0, max_lat, 180.0
+    min_lon = (longitude - lon_delta + 180) % 360 - 180
+    max_lon = (longitude + lon_delta + 180) % 360 - 180
+    return min_lat, min_lon, max_lat, max_lon
+
+@dataclass
+class Geofence:
+    """Polygon or circular area whose boundary crossings are reported"""
+    id: str
+    polygon: Optional[List[Tuple[float, float]]] = None
+    center: Optional[Tuple[float, float]] = None
+    radius_km: Optional[float] = None
+    
+    def __post_init__(self):
+        if self.polygon:
+            # Unwrap longitudes so that no edge jumps across the antimeridian
+            self.vertices: List[Tuple[float, float]] = []
+            for latitude, longitude in self.polygon:
+                if self.vertices:
+                    previous = self.vertices[-1][1]
+                    longitude = previous + (longitude - previous + 180) % 360 - 180
+                self.vertices.append((latitude, longitude))
+            latitudes = [vertex[0] for vertex in self.vertices]
+            longitudes = [vertex[1] for vertex in self.vertices]
+            self.lon_range = (min(longitudes), max(longitudes))
+            if self.lon_range[1] - self.lon_range[0] >= 360:
+                self.bbox = (min(latitudes), -180.0, max(latitudes), 180.0)
+            else:
+                # min_lon > max_lon when the fence crosses the antimeridian, as for SpatialIndex
+                self.bbox = (min(latitudes), (self.lon_range[0] + 180) % 360 - 180,
+                             max(latitudes), (self.lon_range[1] + 180) % 360 - 180)
+        elif self.center is not None and self.radius_km is not None:
+            self.bbox = _radius_bbox(self.center[0], self.center[1], self.radius_km)
+        else:
+            raise ValueError("Geofence needs a polygon or a center and radius_km")
+    
+    def contains(self, latitude: float, longitude: float) -> bool:
+        """Whether a coordinate lies inside the geofence"""
+        if self.polygon:
+            min_lat, _, max_lat, _ = self.bbox
+            min_lon, max_lon = self.lon_range
+            longitude = min_lon + (longitude - min_lon) % 360  # same turn as the unwrapped vertices
+            if not (min_lat <= latitude <= max_lat and longitude <= max_lon):
+                return False
+            # Ray casting in the (longitude, latitude) plane
+            inside = False
+            previous_lat, previous_lon = self.vertices[-1]
+            for point_lat, point_lon in self.vertices:
+                if (point_lat > latitude) != (previous_lat > latitude):
+                    crossing = point_lon + (latitude - point_lat) * (previous_lon - point_lon) / (previous_lat - point_lat)
+                    if longitude < crossing:
+                        inside = not inside
+                previous_lat, previous_lon = point_lat, point_lon
+            return inside
+        return haversine_km(self.center[0], self.center[1], latitude, longitude) <= self.radius_km
+
+# Allowance on route chord bounds for floating-point rounding (1 mm)
+ROUTE_BOUND_MARGIN_KM = 1e-6
+# PlannedRoute.nearest stops looking for segments closer by less than this (1 m)
+ROUTE_DISTANCE_PRECISION_KM = 1e-3
+# Segments PlannedRoute.nearest walks from its hint, while they get closer, before the tree search
+ROUTE_HINT_STEPS = 16
+
+class PlannedRoute:
+    """
+    Planned polyline of (lat, lon) waypoints with a deviation tolerance.
+    
+    Segments are preprocessed into a tree over consecutive segment ranges.
+    Each node keeps the bounding box of its range and the chord from its
+    first to its last waypoint, with the largest lat/lon offset of the
+    range from that chord; the distance to the chord minus that slack is a
+    lower bound that stays tight on long straight stretches, where boxes
+    are loose. Distance queries descend the nearer child first and prune
+    nodes whose bound exceeds the best segment so far, so a reading visits
+    O(log n) nodes whether it is near the route or far off it. Distances
+    use an equirectangular projection around the reading, which is
+    accurate at corridor scale.
+    """
+    
+    def __init__(self, waypoints: Sequence[Tuple[float, float]], tolerance_km: float):
+        if len(waypoints) < 2:
+            raise ValueError("Route needs at least two waypoints")
+        if not tolerance_km > 0:
+            raise ValueError("tolerance_km must be positive")
+        self.waypoints = [(float(latitude), float(longitude)) for latitude, longitude in waypoints]
+        self.tolerance_km = tolerance_km
+        self.segments = len(self.waypoints) - 1
+        self.last_segment = 0
+        
+        # Unwrap longitudes so that no segment jumps across the antimeridian
+        self.latitudes = array("d")
+        self.longitudes = array("d")
+        self.distances = array("d", [0.0])
+        for latitude, longitude in self.waypoints:
+            if self.longitudes:
+                previous = self.longitudes[-1]
+                longitude = previous + (longitude - previous + 180) % 360 - 180
+                self.distances.append(self.distances[-1] + haversine_km(self.latitudes[-1], previous, latitude, longitude))
+            self.latitudes.append(latitude)
+            self.longitudes.append(longitude)
+        
+        # Leaves sit at [size, size + segments); padding leaves repeat the last segment
+        self.size = 1 << (self.segments - 1).bit_length()
+        boxes = [array("d", [0.0]) * (2 * self.size) for _ in range(4)]
+        min_lat, min_lon, max_lat, max_lon = boxes
+        first = self.first = array("q", [0]) * (2 * self.size)
+        last = self.last = array("q", [0]) * (2 * self.size)
+        slack_lat = self.slack_lat = array("d", [0.0]) * (2 * self.size)
+        slack_lon = self.slack_lon = array("d", [0.0]) * (2 * self.size)
+        for leaf in range(self.size):
+            segment = min(leaf, self.segments - 1)
+            node = self.size + leaf
+            first[node], last[node] = segment, segment + 1
+            min_lat[node] = min(self.latitudes[segment], self.latitudes[segment + 1])
+            max_lat[node] = max(self.latitudes[segment], self.latitudes[segment + 1])
+            min_lon[node] = min(self.longitudes[segment], self.longitudes[segment + 1])
+            max_lon[node] = max(self.longitudes[segment], self.longitudes[segment + 1])
+        for node in range(self.size - 1, 0, -1):
+            left, right = 2 * node, 2 * node + 1
+            min_lat[node] = min(min_lat[left], min_lat[right])
+            max_lat[node] = max(max_lat[left], max_lat[right])
+            min_lon[node] = min(min_lon[left], min_lon[right])
+            max_lon[node] = max(max_lon[left], max_lon[right])
+            first[node], last[node] = first[left], max(last[left], last[right])
+            # Every point of a child lies within the child's slack of its chord, whose
+            # endpoints lie within their own offset of this node's chord
+            for child in (left, right):
+                offset_lat = offset_lon = 0.0
+                for waypoint in (first[child], last[child]):
+                    if waypoint != first[node] and waypoint != last[node]:
+                        waypoint_lat, waypoint_lon = self._chord_offset(waypoint, first[node], last[node])
+                        offset_lat, offset_lon = max(offset_lat, waypoint_lat), max(offset_lon, waypoint_lon)
+                slack_lat[node] = max(slack_lat[node], slack_lat[child] + offset_lat)
+                slack_lon[node] = max(slack_lon[node], slack_lon[child] + offset_lon)
+        self.boxes = boxes
+    
+    @property
+    def length_km(self) -> float:
+        return self.distances[-1]
+    
+    def nearest(self, latitude: float, longitude: float, hint: Optional[int] = None) -> Tuple[float, int, float]:
         """
-        Register a new product with automatic verification using AI
+        (distance_km, segment, fraction along the segment) of the route point
+        closest to a coordinate, to within ROUTE_DISTANCE_PRECISION_KM.
+        
+        The search always starts from the root. The hint segment, usually
+        the one matched by the previous reading, and the segments after or
+        before it that get closer only seed the pruning bound, so a stale
+        hint costs pruning but never the right answer.
         """
-        try:
-            # Validate product data using AI
-            validation_result = await self._validate_product_data(product_data)
-            if not validation_result["valid"]:
-                raise Exception(f"Product validation failed: {validation_result['errors']}")
-            
-            # Generate unique product ID
-            product_id = self._generate_product_id(product_data)
-            
-            # Store product information
-            product = ProductData(
-                id=product_id,
-                name=product_data["name"],
-                category=product_data["category"],
-                origin=product_data["origin"],
-                manufacturer=product_data["manufacturer"],
-                production_date=datetime.fromisoformat(product_data["production_date"]),
-                batch_number=product_data["batch_number"],
-                specifications=product_data.get("specifications", {}),
-                regulatory_codes=product_data.get("regulatory_codes", []),
-                sensors_config=product_data.get("sensors_config", {})
-            )
-            
-            self.products[product_id] = product
-            
-            # Auto-verify regulatory compliance
-            compliance_check = await self._check_regulatory_compliance(product)
-            
-            # Log registration event
-            await self._log_event("PRODUCT_REGISTERED", {
-                "product_id": product_id,
-                "name": product["name"],
-                "compliance": compliance_check
-            })
-            
-            # Trigger initial risk assessment
-            await self._assess_initial_risks(product_id)
-            
-            return product_id
-            
-        except Exception as e:
-            await self._log_event("REGISTRATION_ERROR", {"error": str(e)})
-            raise Exception(f"Product registration failed: {str(e)}")
+        scale = math.cos(math.radians(latitude))
+        best, best_segment, best_fraction = math.inf, 0, 0.0
+        if hint is not None:
+            best_segment = min(max(hint, 0), self.segments - 1)
+            best, best_fraction = self._segment_distance(best_segment, latitude, longitude, scale)
+            # Readings advance a few segments at a time: follow the route while it gets closer
+            start = best_segment
+            for step in (1, -1):
+                stop = min(start + ROUTE_HINT_STEPS, self.segments - 1) if step > 0 else max(start - ROUTE_HINT_STEPS, 0)
+                for segment in range(start + step, stop + step, step):
+                    distance, fraction = self._segment_distance(segment, latitude, longitude, scale)
+                    if distance >= best:
+                        break
+                    best, best_segment, best_fraction = distance, segment, fraction
+                if best_segment != start:
+                    break
+        
+        # Branch and bound, nearer child first; bounds are rechecked when popped
+        size = self.size
+        stack = [(self._lower_bound(1, latitude, longitude, scale), 1)]
+        while stack:
+            bound, node = stack.pop()
+            if bound >= best - ROUTE_DISTANCE_PRECISION_KM:
+                continue
+            if node >= size:
+                segment = node - size
+                if segment < self.segments:
+                    distance, fraction = self._segment_distance(segment, latitude, longitude, scale)
+                    if distance < best:
+                        best, best_segment, best_fraction = distance, segment, fraction
+                continue
+            stack += self._children(node, latitude, longitude, scale)
+        return best, best_segment, best_fraction
     
-    async def update_location(self, product_id: str, location_data: Dict[str, Any]) -> bool:
+    def find_within(self, latitude: float, longitude: float, distance_km: float, hint: int = 0) -> Optional[int]:
         """
-        Update product location with IoT sensor data
+        A segment within distance_km of a coordinate, or None when there is
+        none.
+        
+        The hint segment and the one after it are tried first. The search
+        stops at the first segment in range and never descends into nodes
+        whose bound is beyond distance_km, so proving that a reading is off
+        the route costs no more than finding that it is on it.
         """
-        if product_id not in self.products:
-            raise Exception("Product not found")
+        scale = math.cos(math.radians(latitude))
+        hint = min(max(hint, 0), self.segments - 1)
+        for segment in (hint, hint + 1):
+            if segment < self.segments and self._segment_distance(segment, latitude, longitude, scale)[0] <= distance_km:
+                return segment
         
-        # Parse location data
-        location = LocationData(
-            latitude=location_data["latitude"],
-            longitude=location_data["longitude"],
-            timestamp=datetime.fromisoformat(location_data["timestamp"]),
-            temperature=location_data.get("temperature"),
-            humidity=location_data.get("humidity"),
-            pressure=location_data.get("pressure"),
-            shock_level=location_data.get("shock_level")
-        )
+        size = self.size
+        stack = [(self._lower_bound(1, latitude, longitude, scale), 1)]
+        while stack:
+            bound, node = stack.pop()
+            if bound > distance_km:
+                continue
+            if node >= size:
+                segment = node - size
+                if segment < self.segments and self._segment_distance(segment, latitude, longitude, scale)[0] <= distance_km:
+                    return segment
+                continue
+            stack += self._children(node, latitude, longitude, scale)
+        return None
+    
+    def progress_km(self, segment: int, fraction: float) -> float:
+        """Distance along the route to a point on one of its segments"""
+        start = self.distances[segment]
+        return start + fraction * (self.distances[segment + 1] - start)
+    
+    def _children(self, node: int, latitude: float, longitude: float, scale: float) -> List[Tuple[float, int]]:
+        """(bound, child) pairs of a node, the nearer child last so that it is popped first"""
+        left = (self._lower_bound(2 * node, latitude, longitude, scale), 2 * node)
+        right = (self._lower_bound(2 * node + 1, latitude, longitude, scale), 2 * node + 1)
+        return [right, left] if left[0] <= right[0] else [left, right]
+    
+    def _lower_bound(self, node: int, latitude: float, longitude: float, scale: float) -> float:
+        """Lower bound in km on the distance from a coordinate to the segments under a node"""
+        min_lat, min_lon, max_lat, max_lon = self.boxes
+        lat_gap = max(min_lat[node] - latitude, latitude - max_lat[node], 0.0)
+        west = min_lon[node]
+        if (longitude - west) % 360 <= max_lon[node] - west:
+            lon_gap = 0.0
+        else:
+            lon_gap = min((west - longitude) % 360, (longitude - max_lon[node]) % 360)
+        bound = math.hypot(lat_gap, lon_gap * scale) * KM_PER_DEGREE
+        if max_lon[node] - west < 90 and lon_gap <= 90:
+            # Within a quarter turn the reading is shifted by the same turn for the chord
+            # as for every segment under it, so the two projections agree
+            chord, _ = self._chord_distance(self.first[node], self.last[node], latitude, longitude, scale)
+            slack = math.hypot(self.slack_lat[node], self.slack_lon[node] * scale) * KM_PER_DEGREE
+            bound = max(bound, chord - slack - ROUTE_BOUND_MARGIN_KM)
+        return bound
+    
+    def _chord_offset(self, waypoint: int, start: int, end: int) -> Tuple[float, float]:
+        """(|lat|, |lon|) degree offsets of a waypoint from the closest point of the chord start-end"""
+        ay = self.latitudes[waypoint] - self.latitudes[start]
+        ax = self.longitudes[waypoint] - self.longitudes[start]
+        dy = self.latitudes[end] - self.latitudes[start]
+        dx = self.longitudes[end] - self.longitudes[start]
+        length = dx * dx + dy * dy
+        fraction = min(1.0, max(0.0, (ax * dx + ay * dy) / length)) if length else 0.0
+        return abs(ay - fraction * dy), abs(ax - fraction * dx)
+    
+    def _segment_distance(self, segment: int, latitude: float, longitude: float, scale: float) -> Tuple[float, float]:
+        return self._chord_distance(segment, segment + 1, latitude, longitude, scale)
+    
+    def _chord_distance(self, start: int, end: int, latitude: float, longitude: float, scale: float) -> Tuple[float, float]:
+        # Project with the reading at the origin, shifted next to the chord in unwrapped longitude
+        start_lon = self.longitudes[start]
+        offset = (longitude - start_lon + 180) % 360 - 180
+        ax = -offset * scale
+        ay = self.latitudes[start] - latitude
+        dx = (self.longitudes[end] - start_lon) * scale
+        dy = self.latitudes[end] - self.latitudes[start]
+        length = dx * dx + dy * dy
+        fraction = min(1.0, max(0.0, -(ax * dx + ay * dy) / length)) if length else 0.0
+        return math.hypot(ax + fraction * dx, ay + fraction * dy) * KM_PER_DEGREE, fraction
+
+class ProductIndex:
+    """
+    Secondary indexes over registered products.
+    
+    Equality indexes map each manufacturer, category, origin and batch
+    number, and each of a product's regulatory codes, to the IDs of its
+    products in registration order. Production dates are kept in a sorted
+    list of (UTC epoch microseconds, product_id) for range lookups by
+    binary search; new dates are buffered and merged in one sort on the
+    next lookup, so a bulk registration does not shift the list per product.
+    """
+    
+    FIELDS = ("manufacturer", "category", "origin", "batch_number")
+    MULTI_FIELDS = ("regulatory_codes",)  # list-valued; every element is indexed
+    VOCABULARY_FIELDS = ("manufacturer",)  # values recognized in natural-language queries
+    
+    def __init__(self):
+        self.by_field: Dict[str, Dict[str, Dict[str, None]]] = {
+            field: {} for field in self.FIELDS + self.MULTI_FIELDS
+        }
+        self.production_dates: List[Tuple[int, str]] = []
+        self._unsorted_dates: List[Tuple[int, str]] = []
+        self.vocabulary_version = 0  # bumped when a VOCABULARY_FIELDS value first appears or last disappears
+    
+    def add(self, product: ProductData):
+        """Index a product"""
+        for field, value in self._entries(product):
+            bucket = self.by_field[field].get(value)
+            if bucket is None:
+                bucket = self.by_field[field][value] = {}
+                if field in self.VOCABULARY_FIELDS:
+                    self.vocabulary_version += 1
+            bucket[product.id] = None
+        self._unsorted_dates.append((_epoch_us(product.production_date), product.id))
+    
+    def remove(self, product: ProductData):
+        """Drop a product from every index"""
+        for field, value in self._entries(product):
+            bucket = self.by_field[field].get(value)
+            if bucket is not None:
+                bucket.pop(product.id, None)
+                if not bucket:
+                    del self.by_field[field][value]
+                    if field in self.VOCABULARY_FIELDS:
+                        self.vocabulary_version += 1
+        entry = (_epoch_us(product.production_date), product.id)
+        dates = self._sorted_dates()
+        position = bisect_left(dates, entry)
+        if position < len(dates) and dates[position] == entry:
+            del dates[position]
+    
+    def lookup(self, field: str, value: Any) -> Dict[str, None]:
+        """IDs of products whose field equals value, in registration order"""
+        return self.by_field[field].get(value, {})
+    
+    def produced_between(self, start: Optional[datetime], end: Optional[datetime]) -> Iterable[str]:
+        """IDs of products produced in [start, end], in production date order"""
+        dates = self._sorted_dates()
+        low = 0 if start is None else bisect_left(dates, (_epoch_us(start), ""))
+        high = len(dates)
+        if end is not None:
+            high = bisect_left(dates, (_epoch_us(end) + 1, ""))
+        return (product_id for _, product_id in islice(dates, low, high))
+    
+    def _sorted_dates(self) -> List[Tuple[int, str]]:
+        if self._unsorted_dates:
+            # Timsort merges the sorted list with the new run in near-linear time
+            self.production_dates.extend(self._unsorted_dates)
+            self._unsorted_dates.clear()
+            self.production_dates.sort()
+        return self.production_dates
+    
+    def _entries(self, product: ProductData) -> Iterable[Tuple[str, Any]]:
+        for field in self.FIELDS:
+            yield field, getattr(product, field)
+        for field in self.MULTI_FIELDS:
+            for value in dict.fromkeys(getattr(product, field)):
+                yield field, value
+
+class LocationHistory:
+    """
+    Compact columnar store for a product's location readings.
+    
+    Each field lives in its own typed array so a reading costs a few dozen
+    bytes instead of a dataclass and a datetime object. Timestamps are kept
+    as UTC epoch microseconds (naive values are taken as UTC) plus the
+    original UTC offset in seconds, so the datetime can be rebuilt exactly.
+    Missing sensor values are stored as NaN.
+    
+    Readings normally arrive in time order, in which case the timestamp
+    column is itself the sorted index for range queries; out-of-order
+    arrivals switch to a lazily built sort permutation.
+    """
+    
+    # Column names and array typecodes, in snapshot order
+    COLUMNS = (
+        ("latitude", "d"), ("longitude", "d"), ("timestamp_us", "q"), ("utc_offset", "i"),
+        ("temperature", "d"), ("humidity", "d"), ("pressure", "d"), ("shock_level", "d")
+    )
+    
+    def __init__(self):
+        for name, typecode in self.COLUMNS:
+            setattr(self, name, array(typecode))
+        self._in_time_order = True
+        self._time_index_cache = None
+        self._read_only = False
+    
+    @classmethod
+    def from_buffers(cls, columns: Dict[str, memoryview], in_time_order: bool) -> "LocationHistory":
+        """
+        Wrap read-only column buffers (e.g. views into a memory-mapped
+        snapshot) without copying; they are copied into arrays on first append.
+        """
+        history = cls.__new__(cls)
+        for name, _ in cls.COLUMNS:
+            setattr(history, name, columns[name])
+        history._in_time_order = in_time_order
+        history._time_index_cache = None
+        history._read_only = True
+        return history
+    
+    def __len__(self) -> int:
+        return len(self.timestamp_us)
+    
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.get(index)
+    
+    def append(self, location: LocationData):
+        """
+        Append a reading (amortized O(1)).
         
-        # Store location data
-        if product_id not in self.locations:
-            self.locations[product_id] = []
-        self.locations[product_id].append(location)
+        Every field is converted before any column grows, so a reading that
+        fails conversion (TypeError/ValueError) leaves the columns aligned.
+        """
+        timestamp_us, offset = _datetime_parts(location.timestamp)
+        latitude = float(location.latitude)
+        longitude = float(location.longitude)
+        temperature = float(_to_column(location.temperature))
+        humidity = float(_to_column(location.humidity))
+        pressure = float(_to_column(location.pressure))
+        shock_level = float(_to_column(location.shock_level))
+        if self._read_only:
+            self._materialize()
+        if self._in_time_order and self.timestamp_us and timestamp_us < self.timestamp_us[-1]:
+            self._in_time_order = False
+        self._time_index_cache = None
+        self.latitude.append(latitude)
+        self.longitude.append(longitude)
+        self.timestamp_us.append(timestamp_us)
+        self.utc_offset.append(offset)
+        self.temperature.append(temperature)
+        self.humidity.append(humidity)
+        self.pressure.append(pressure)
+        self.shock_level.append(shock_level)
+    
+    def timestamp_at(self, index: int) -> datetime:
+        """Rebuild the original timestamp of a reading"""
+        return _datetime_from_parts(self.timestamp_us[index], self.utc_offset[index])
+    
+    def get(self, index: int) -> LocationData:
+        """Rebuild a single reading as LocationData"""
+        return LocationData(
+            latitude=self.latitude[index],
+            longitude=self.longitude[index],
+            timestamp=self.timestamp_at(index),
+            temperature=_from_column(self.temperature[index]),
+            humidity=_from_column(self.humidity[index]),
+            pressure=_from_column(self.pressure[index]),
+            shock_level=_from_column(self.shock_level[index])
+        )
+    
+    def latest(self) -> Optional[LocationData]:
+        """Most recent reading in O(1)"""
+        return self.get(len(self) - 1) if len(self) else None
+    
+    def rows_between(self, since: Optional[datetime] = None, until: Optional[datetime] = None) -> Sequence[int]:
+        """Row indexes with since <= timestamp <= until, in time order, found by binary search"""
+        order, timestamps = self._time_index()
+        low = 0 if since is None else bisect_left(timestamps, _epoch_us(since))
+        high = len(timestamps) if until is None else bisect_right(timestamps, _epoch_us(until))
+        return order[low:high]
+    
+    def bucket_summaries(self, rows: Sequence[int], bucket_seconds: float) -> List[Dict[str, Any]]:
+        """Min/max/mean of each column per time bucket over time-ordered rows"""
+        if not 0 < bucket_seconds < math.inf:
+            raise ValueError("bucket_seconds must be positive and finite")
+        bucket_us = max(1, int(bucket_seconds * 1_000_000))
+        summaries = []
+        current = None
+        members: List[int] = []
+        for row in rows:
+            bucket = self.timestamp_us[row] // bucket_us
+            if bucket != current and members:
+                summaries.append(self._summarize_bucket(current, bucket_us, members))
+                members = []
+            current = bucket
+            members.append(row)
+        if members:
+            summaries.append(self._summarize_bucket(current, bucket_us, members))
+        return summaries
+    
+    def simplify(self, rows: Sequence[int], tolerance_km: float) -> List[int]:
+        """Douglas-Peucker simplification of the track through time-ordered rows"""
+        if len(rows) < 3:
+            return list(rows)
+        
+        # Project onto a local equirectangular plane in kilometres
+        reference = math.cos(math.radians(sum(self.latitude[row] for row in rows) / len(rows)))
+        xs = [self.longitude[row] * KM_PER_DEGREE * reference for row in rows]
+        ys = [self.latitude[row] * KM_PER_DEGREE for row in rows]
+        
+        keep = bytearray(len(rows))
+        keep[0] = keep[-1] = 1
+        stack = [(0, len(rows) - 1)]
+        while stack:
+            first, last = stack.pop()
+            dx = xs[last] - xs[first]
+            dy = ys[last] - ys[first]
+            length = math.hypot(dx, dy)
+            farthest = None
+            farthest_distance = tolerance_km
+            for position in range(first + 1, last):
+                if length:
+                    distance = abs(dx * (ys[first] - ys[position]) - dy * (xs[first] - xs[position])) / length
+                else:
+                    distance = math.hypot(xs[position] - xs[first], ys[position] - ys[first])
+                if distance > farthest_distance:
+                    farthest = position
+                    farthest_distance = distance
+            if farthest is not None:
+                keep[farthest] = 1
+                stack.append((first, farthest))
+                stack.append((farthest, last))
+        return [row for row, kept in zip(rows, keep) if kept]
+    
+    def _summarize_bucket(self, bucket: int, bucket_us: int, rows: List[int]) -> Dict[str, Any]:
+        start = _EPOCH + timedelta(microseconds=bucket * bucket_us)
+        summary = {
+            "timestamp": start.replace(tzinfo=timezone.utc).isoformat(),
+            "bucket_seconds": bucket_us / 1_000_000,
+            "count": len(rows),
+            "latitude": sum(self.latitude[row] for row in rows) / len(rows),
+            "longitude": sum(self.longitude[row] for row in rows) / len(rows)
+        }
+        for name in ("temperature", "humidity", "pressure", "shock_level"):
+            column = getattr(self, name)
+            values = [column[row] for row in rows if column[row] == column[row]]
+            summary[name] = {
+                "min": min(values),
+                "max": max(values),
+                "mean": sum(values) / len(values)
+            } if values else None
+        return summary
+    
+    def _materialize(self):
+        """Copy read-only column buffers into growable arrays"""
+        for name, typecode in self.COLUMNS:
+            column = array(typecode)
+            column.frombytes(getattr(self, name).cast("B"))
+            setattr(self, name, column)
+        self._read_only = False
+    
+    def _time_index(self) -> Tuple[Sequence[int], Sequence[int]]:
+        """(row order, sorted timestamps) for binary search over time"""
+        if self._in_time_order:
+            return range(len(self)), self.timestamp_us
+        if self._time_index_cache is None:
+            order = array("q", sorted(range(len(self)), key=self.timestamp_us.__getitem__))
+            self._time_index_cache = (order, array("q", (self.timestamp_us[row] for row in order)))
+        return self._time_index_cache
+    
+    def to_dict(self, index: int) -> Dict[str, Any]:
+        """Serialize a reading the way get_product_traceability reports it"""
+        return {
+            "latitude": self.latitude[index],
+            "longitude": self.longitude[index],
+            "timestamp": self.timestamp_at(index).isoformat(),
+            "temperature": _from_column(self.temperature[index]),
+            "humidity": _from_column(self.humidity[index]),
+            "pressure": _from_column(self.pressure[index]),
+            "shock_level": _from_column(self.shock_level[index])
+        }
+
+class RunningStats:
+    """Welford running min/max/mean/variance of one sensor"""
+    
+    __slots__ = ("count", "mean", "m2", "minimum", "maximum")
+    
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+    
+    def add(self, value: float):
+        """Fold a value into the running statistics"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+    
+    @property
+    def variance(self) -> float:
+        """Population variance of the values seen so far"""
+        return self.m2 / self.count if self.count else 0.0
+    
+    def to_dict(self) -> Optional[Dict[str, float]]:
+        if not self.count:
+            return None
+        return {
+            "count": self.count,
+            "min": self.minimum,
+            "max": self.maximum,
+            "mean": self.mean,
+            "variance": self.variance
+        }
+
+class ProductStats:
+    """
+    Running state behind a product's traceability score and sensor summaries.
+    
+    Updated on each reading, alert creation and alert resolution so that
+    both can be read in O(1). Time out of range is accumulated per sensor by
+    charging the interval between consecutive readings to the earlier one.
+    """
+    
+    SENSORS = ("temperature", "humidity", "shock_level")
+    
+    def __init__(self):
+        self.readings = 0
+        self.alerts = 0
+        self.resolved_alerts = 0
+        self.sensors: Dict[str, RunningStats] = {name: RunningStats() for name in self.SENSORS}
+        self.seconds_out_of_range: Dict[str, float] = {name: 0.0 for name in self.SENSORS}
+        self.tracked_seconds = 0.0
+        self.last_timestamp_us: Optional[int] = None
+        self.last_out_of_range: Dict[str, bool] = {name: False for name in self.SENSORS}
+    
+    def add_reading(self, timestamp_us: int, temperature: Optional[float], humidity: Optional[float],
+                    shock_level: Optional[float]):
+        """Fold a reading into the running aggregates"""
+        self.readings += 1
+        if self.last_timestamp_us is not None and timestamp_us > self.last_timestamp_us:
+            elapsed = (timestamp_us - self.last_timestamp_us) / 1_000_000
+            self.tracked_seconds += elapsed
+            for name in self.SENSORS:
+                if self.last_out_of_range[name]:
+                    self.seconds_out_of_range[name] += elapsed
+        if self.last_timestamp_us is None or timestamp_us >= self.last_timestamp_us:
+            self.last_timestamp_us = timestamp_us
+        
+        for name, value in zip(self.SENSORS, (temperature, humidity, shock_level)):
+            if value is not None and value == value:
+                self.sensors[name].add(value)
+        self.last_out_of_range = {
+            "temperature": bool(temperature) and (temperature < TEMPERATURE_MIN or temperature > TEMPERATURE_MAX),
+            "humidity": bool(humidity) and (humidity < HUMIDITY_MIN or humidity > HUMIDITY_MAX),
+            "shock_level": bool(shock_level) and shock_level > SHOCK_MAX
+        }
+    
+    def out_of_range_ratio(self, sensor: str) -> float:
+        """Share of tracked time the sensor spent outside its thresholds"""
+        return self.seconds_out_of_range[sensor] / self.tracked_seconds if self.tracked_seconds else 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "readings": self.readings,
+            "alerts": self.alerts,
+            "resolved_alerts": self.resolved_alerts,
+            "tracked_seconds": self.tracked_seconds,
+            "sensors": {name: stats.to_dict() for name, stats in self.sensors.items()},
+            "seconds_out_of_range": dict(self.seconds_out_of_range)
+        }
+
+class SensorAnomalyDetector:
+    """
+    Streaming drift and spike detector for one sensor of one product.
+    
+    Tracks an exponentially weighted mean and variance (EWMA) and runs a
+    two-sided CUSUM over the standardized residuals, so slow trends are
+    caught before any fixed threshold is crossed. Each update is O(1) with
+    constant memory. The standard deviation is floored at noise_floor so
+    quantized or constant readings do not produce huge scores.
+    """
+    
+    __slots__ = ("alpha", "slack", "drift_threshold", "spike_z", "warmup", "noise_floor",
+                 "count", "mean", "variance", "cusum_high", "cusum_low")
+    
+    def __init__(self, noise_floor: float, alpha: float = 0.1, slack: float = 0.5,
+                 drift_threshold: float = 5.0, spike_z: float = 4.0, warmup: int = 10):
+        self.alpha = alpha
+        self.slack = slack
+        self.drift_threshold = drift_threshold
+        self.spike_z = spike_z
+        self.warmup = warmup
+        self.noise_floor = noise_floor
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+        self.cusum_high = 0.0
+        self.cusum_low = 0.0
+    
+    def update(self, value: float) -> Optional[str]:
+        """Fold in a reading; returns "spike", "drift" or None"""
+        self.count += 1
+        if self.count == 1:
+            self.mean = value
+            return None
+        
+        anomaly = None
+        deviation = value - self.mean
+        if self.count > self.warmup:
+            z = deviation / max(math.sqrt(self.variance), self.noise_floor)
+            self.cusum_high = max(0.0, self.cusum_high + z - self.slack)
+            self.cusum_low = max(0.0, self.cusum_low - z - self.slack)
+            if abs(z) > self.spike_z:
+                anomaly = "spike"
+            elif self.cusum_high > self.drift_threshold or self.cusum_low > self.drift_threshold:
+                anomaly = "drift"
+                self.cusum_high = self.cusum_low = 0.0
+        
+        increment = self.alpha * deviation
+        self.mean += increment
+        self.variance = (1 - self.alpha) * (self.variance + deviation * increment)
+        return anomaly
+
+_EPOCH = datetime(1970, 1, 1)
+NAIVE_OFFSET = -(2 ** 31)  # UTC offset sentinel for naive timestamps
+
+def _datetime_parts(value: datetime) -> Tuple[int, int]:
+    """(UTC epoch microseconds, UTC offset seconds or NAIVE_OFFSET) of a datetime"""
+    offset = value.utcoffset()
+    return _epoch_us(value), NAIVE_OFFSET if offset is None else int(offset.total_seconds())
+
+def _datetime_from_parts(timestamp_us: int, offset: int) -> datetime:
+    """Rebuild a datetime from _datetime_parts output"""
+    utc = _EPOCH + timedelta(microseconds=timestamp_us)
+    if offset == NAIVE_OFFSET:
+        return utc
+    delta = timedelta(seconds=offset)
+    return (utc + delta).replace(tzinfo=timezone(delta))
+
+def _epoch_us(value: datetime) -> int:
+    """UTC epoch microseconds of a datetime, taking naive values as UTC"""
+    offset = value.utcoffset()
+    if offset is not None:
+        value = value.replace(tzinfo=None) - offset
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+async def _iterate(items: Union[Iterable[Any], AsyncIterable[Any]]):
+    """Iterate a plain or async iterable uniformly"""
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+def _cursor_offset(cursor: Optional[str]) -> int:
+    """Offset encoded in a pagination cursor; None or "" is the first page"""
+    if not cursor:
+        return 0
+    if not isinstance(cursor, str) or not (cursor.isascii() and cursor.isdigit()):
+        raise Exception("invalid cursor")
+    return int(cursor)
+
+def _to_column(value: Optional[float]) -> float:
+    """Encode an optional sensor value for a float column"""
+    return math.nan if value is None else value
+
+def _from_column(value: float) -> Optional[float]:
+    """Decode a float column value, mapping NaN back to None"""
+    return None if value != value else value
+
+# Share of tracked time out of range that counts as a historical risk
+HISTORICAL_EXCURSION_RATIO = 0.1
+
+HISTORICAL_RISK_FACTORS = {
+    "temperature": "historical_temperature_excursions",
+    "humidity": "historical_humidity_excursions",
+    "shock_level": "historical_shock_exposure"
+}
+
+# Streaming anomaly detection: factor prefix and noise floor per sensor
+ANOMALY_SENSORS = {
+    "temperature": ("temperature", 0.5),
+    "humidity": ("humidity", 1.0),
+    "shock_level": ("shock", 0.5)
+}
+
+# Fields reported for a product by default
+PRODUCT_SUMMARY_FIELDS = (
+    "id", "name", "category", "origin", "manufacturer",
+    "production_date", "batch_number", "specifications", "regulatory_codes", "status"
+)
+PRODUCT_FIELDS = frozenset(field.name for field in dataclass_fields(ProductData))
+
+# Filters accepted by search_products
+SEARCH_FILTERS = ("manufacturer", "category", "origin", "batch_number", "produced_after", "produced_before")
+
+# Streaming export: CSV rows share one header and are told apart by record_type
+EXPORT_RECORD_TYPES = ("product", "location", "alert")
+EXPORT_CSV_COLUMNS = (
+    ("record_type", "product_id")
+    + tuple(field for field in PRODUCT_SUMMARY_FIELDS if field != "id")
+    + ("latitude", "longitude", "timestamp", "temperature", "humidity", "pressure", "shock_level")
+    + ("alert_id", "alert_type", "level", "message", "acknowledged", "resolution", "count", "last_seen")
+)
+
+# Binary snapshot layout: header, then 8-byte aligned tagged sections
+SNAPSHOT_MAGIC = b"CHAWSNAP"
+SNAPSHOT_VERSION = 3
+_SNAPSHOT_HEADER = struct.Struct("<8sHHI")          # magic, version, flags, section count
+_SNAPSHOT_SECTION = struct.Struct("<4sIQ")          # tag, reserved, payload length
+_SNAPSHOT_PRODUCT = struct.Struct("<9IqiBxxx")      # 9 string refs, production date, status
+_SNAPSHOT_PRODUCT_V1 = struct.Struct("<9Iqi")       # version 1 products had no status
+_SNAPSHOT_LOCATIONS = struct.Struct("<IBxxxQ")      # product ref, in time order, row count
+_SNAPSHOT_HISTORY_TREE = struct.Struct("<IxxxxQ")   # product ref, leaf count; levels follow (version 3+)
+_SNAPSHOT_ALERT = struct.Struct("<IBBIIqiqqIBIddqidddd")  # first/last seen share the timestamp's offset
+_SNAPSHOT_STATS = struct.Struct("<IqqqdqBBB" + "qdddd" * 3 + "ddd")
+_NO_STRING = 0xFFFFFFFF
+_NO_TIME = -(2 ** 63)
+_NO_LOCATION = LocationData(latitude=math.nan, longitude=math.nan, timestamp=_EPOCH)
+ALERT_TYPE_CODES = tuple(AlertType)
+PRODUCT_STATUS_CODES = tuple(ProductStatus)
+
+class StringTable:
+    """Interns strings as u32 references for the snapshot format"""
+    
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.strings: List[str] = []
+    
+    def intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return _NO_STRING
+        reference = self.index.get(value)
+        if reference is None:
+            reference = self.index[value] = len(self.strings)
+            self.strings.append(value)
+        return reference
+    
+    def encode(self) -> bytes:
+        parts = [struct.pack("<I", len(self.strings))]
+        for value in self.strings:
+            data = value.encode("utf-8")
+            parts.append(struct.pack("<I", len(data)))
+            parts.append(data)
+        return b"".join(parts)
+    
+    @staticmethod
+    def decode(buffer: memoryview) -> List[Optional[str]]:
+        (count,) = struct.unpack_from("<I", buffer, 0)
+        offset = 4
+        strings = []
+        for _ in range(count):
+            (length,) = struct.unpack_from("<I", buffer, offset)
+            offset += 4
+            strings.append(str(buffer[offset:offset + length], "utf-8"))
+            offset += length
+        return strings
+
+def _padding(length: int) -> int:
+    """Bytes needed to pad length to a multiple of 8"""
+    return -length % 8
+
+def _write_snapshot_section(file, tag: bytes, payload: bytes):
+    file.write(_SNAPSHOT_SECTION.pack(tag, 0, len(payload)))
+    file.write(payload)
+    file.write(b"\0" * _padding(len(payload)))
+
+class SnapshotBuffer:
+    """
+    File-like collector for a serialized snapshot.
+    
+    Chunks are copied as they are written, so state can keep changing on
+    the loop while save() writes, fsyncs and renames the file in a thread.
+    """
+    
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.size = 0
+    
+    def write(self, data):
+        chunk = bytes(data)
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+    
+    def save(self, path: str):
+        """Write the snapshot next to path and rename it into place"""
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.writelines(self.chunks)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+
+def _map_file(path: str) -> mmap.mmap:
+    with open(path, "rb") as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _optional_datetime_parts(value: Optional[datetime]) -> Tuple[int, int]:
+    return _datetime_parts(value) if value is not None else (_NO_TIME, 0)
+
+def _optional_datetime_from_parts(timestamp_us: int, offset: int) -> Optional[datetime]:
+    return None if timestamp_us == _NO_TIME else _datetime_from_parts(timestamp_us, offset)
+
+# Write-ahead log: numbered segment files of length- and CRC-framed records
+WAL_SEGMENT_PATTERN = re.compile(r"^wal-(\d{12})\.log$")
+WAL_CHECKPOINT_PATTERN = re.compile(r"^checkpoint-(\d{12})\.snap$")
+_WAL_RECORD = struct.Struct("<BxxxII")              # record type, payload length, crc32
+_WAL_LOCATION = struct.Struct("<ddqidddd")          # same layout as a LocationHistory row
+WAL_PRODUCT, WAL_LOCATION, WAL_ALERT = 1, 2, 3
+
+class WriteAheadLog:
+    """
+    Segmented append-only log with group commit.
+    
+    Records are buffered on the event loop and handed to a dedicated writer
+    thread in groups: at most fsync_interval seconds after the first
+    unsynced record (immediately when fsync_interval is 0), so that bursts
+    of mutations share one disk flush and the loop never waits on fsync.
+    Segments roll over once they exceed segment_bytes. A failed write is
+    kept in failure and raised by the next append or flush.
+    """
+    
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024, fsync_interval: float = 0.01):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        existing = self.list_segments(directory)
+        checkpoints = self.list_segments(directory, WAL_CHECKPOINT_PATTERN)
+        # Never append after a possibly torn tail, nor below the latest
+        # checkpoint (recovery only replays segments from it onwards)
+        self.segment = max(existing[-1] + 1 if existing else 0, checkpoints[-1] if checkpoints else 0)
+        self.records = 0
+        self.commits = 0
+        self.bytes_written = 0
+        self.failure: Optional[BaseException] = None
+        self._buffer = bytearray()
+        self._segment_size = 0
+        self._commit_handle: Optional[asyncio.TimerHandle] = None
+        # Segment numbers are assigned on the loop; files are only touched by the writer
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wal-writer")
+        self._last_write: Optional[Future] = None
+        self._file = None
+        self._file_segment = -1
+    
+    @staticmethod
+    def segment_path(directory: str, segment: int) -> str:
+        return os.path.join(directory, f"wal-{segment:012d}.log")
+    
+    @staticmethod
+    def checkpoint_path(directory: str, segment: int) -> str:
+        return os.path.join(directory, f"checkpoint-{segment:012d}.snap")
+    
+    @staticmethod
+    def list_segments(directory: str, pattern: re.Pattern = WAL_SEGMENT_PATTERN) -> List[int]:
+        """Sorted numbers of the segment (or checkpoint) files in directory"""
+        if not os.path.isdir(directory):
+            return []
+        return sorted(int(match.group(1)) for match in map(pattern.match, os.listdir(directory)) if match)
+    
+    @staticmethod
+    def read_segment(path: str) -> Iterable[Tuple[int, bytes]]:
+        """Yield (record type, payload) up to the first torn or corrupt record"""
+        with open(path, "rb") as file:
+            data = file.read()
+        offset = 0
+        while offset + _WAL_RECORD.size <= len(data):
+            record_type, length, checksum = _WAL_RECORD.unpack_from(data, offset)
+            start = offset + _WAL_RECORD.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                return
+            yield record_type, payload
+            offset = start + length
+    
+    def append(self, record_type: int, payload: bytes):
+        """Buffer a record and schedule the group commit that makes it durable"""
+        self._raise_failure()
+        self._buffer += _WAL_RECORD.pack(record_type, len(payload), zlib.crc32(payload))
+        self._buffer += payload
+        self.records += 1
+        if self.fsync_interval <= 0:
+            self.commit()
+        elif self._commit_handle is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                self.commit()
+                return
+            self._commit_handle = loop.call_later(self.fsync_interval, self.commit)
+    
+    def commit(self):
+        """Hand all buffered records to the writer thread, which writes and fsyncs them"""
+        if self._commit_handle is not None:
+            self._commit_handle.cancel()
+            self._commit_handle = None
+        if not self._buffer:
+            return
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        self._submit(self._write, self.segment, data)
+        self._segment_size += len(data)
+        if self._segment_size >= self.segment_bytes:
+            self.rotate()
+    
+    async def flush(self):
+        """Commit and wait until every record appended so far is on disk"""
+        self.commit()
+        if self._last_write is not None:
+            try:
+                await asyncio.wrap_future(self._last_write)
+            except Exception:
+                pass  # Kept in self.failure
+        self._raise_failure()
+    
+    def rotate(self) -> int:
+        """Commit, close the current segment and return the number of the next one"""
+        self.commit()
+        if self._segment_size:
+            self._submit(self._close_file)
+            self.segment += 1
+            self._segment_size = 0
+        return self.segment
+    
+    async def truncate_before(self, segment: int) -> int:
+        """Delete segments and checkpoints older than segment; returns segments removed"""
+        return await asyncio.wrap_future(self._writer.submit(self._remove_before, segment))
+    
+    async def close(self):
+        """Sync all records, close the segment and stop the writer thread"""
+        try:
+            await self.flush()
+        finally:
+            await asyncio.wrap_future(self._writer.submit(self._close_file))
+            self._writer.shutdown()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "segment": self.segment,
+            "records": self.records,
+            "commits": self.commits,
+            "bytes_written": self.bytes_written,
+            "pending_bytes": len(self._buffer),
+            "failure": repr(self.failure) if self.failure is not None else None
+        }
+    
+    def _raise_failure(self):
+        if self.failure is not None:
+            raise Exception(f"Write-ahead log write failed: {self.failure!r}")
+    
+    def _submit(self, function: Callable, *args) -> Future:
+        future = self._writer.submit(function, *args)
+        future.add_done_callback(self._record_failure)
+        self._last_write = future
+        return future
+    
+    def _record_failure(self, future: Future):
+        if self.failure is None and future.exception() is not None:
+            self.failure = future.exception()
+    
+    # Writer thread
+    def _write(self, segment: int, data: bytes):
+        if self._file_segment != segment:
+            self._close_file()
+            self._file = open(self.segment_path(self.directory, segment), "ab")
+            self._file_segment = segment
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.bytes_written += len(data)
+        self.commits += 1
+    
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._file_segment = -1
+    
+    def _remove_before(self, segment: int) -> int:
+        removed = 0
+        for number in self.list_segments(self.directory):
+            if number < segment:
+                os.remove(self.segment_path(self.directory, number))
+                removed += 1
+        for number in self.list_segments(self.directory, WAL_CHECKPOINT_PATTERN):
+            if number < segment:
+                os.remove(self.checkpoint_path(self.directory, number))
+        return removed
+
+def _synced(method):
+    """Return from a mutating contract method only once its log records are on disk, when every record is synced"""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        result = await method(self, *args, **kwargs)
+        if self.wal is not None and self.wal.fsync_interval <= 0:
+            await self.wal.flush()
+        return result
+    return wrapper
+
+def _location_from_record(values: Tuple) -> LocationData:
+    latitude, longitude, timestamp_us, offset, temperature, humidity, pressure, shock_level = values
+    return LocationData(
+        latitude=latitude,
+        longitude=longitude,
+        timestamp=_datetime_from_parts(timestamp_us, offset),
+        temperature=_from_column(temperature),
+        humidity=_from_column(humidity),
+        pressure=_from_column(pressure),
+        shock_level=_from_column(shock_level)
+    )
+
+def _location_to_record(location: LocationData) -> Tuple:
+    return (
+        location.latitude, location.longitude, *_datetime_parts(location.timestamp),
+        _to_column(location.temperature), _to_column(location.humidity),
+        _to_column(location.pressure), _to_column(location.shock_level)
+    )
+
+def _optional_isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+def _optional_fromisoformat(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value is not None else None
+
+# Merkle commitments: domain-separated SHA-256 over leaves, nodes and peaks
+HASH_SIZE = 32
+_MERKLE_LEAF, _MERKLE_NODE, _MERKLE_PEAK, _MERKLE_ROOT = b"\x00", b"\x01", b"\x02", b"\x03"
+
+def reading_leaf_hash(location: LocationData) -> bytes:
+    """Leaf hash of a reading over its canonical binary row"""
+    return hashlib.sha256(_MERKLE_LEAF + _WAL_LOCATION.pack(*_location_to_record(location))).digest()
+
+def _merkle_parent(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(_MERKLE_NODE + left + right).digest()
+
+def _bag_peaks(peaks: Sequence[bytes], size: int) -> bytes:
+    """Fold peaks (highest first) right to left and bind the leaf count"""
+    bagged = b""
+    for peak in reversed(peaks):
+        bagged = hashlib.sha256(_MERKLE_PEAK + peak + bagged).digest() if bagged else peak
+    return hashlib.sha256(_MERKLE_ROOT + struct.pack("<Q", size) + bagged).digest()
+
+class MerkleMountainRange:
+    """
+    Append-only Merkle commitment over a product's readings.
+    
+    levels[h] holds the hashes of the complete subtrees of 2**h leaves in
+    order (size >> h of them), so an append hashes at most log2(n) new
+    parents and the root is the bag of the current peaks. Levels restored
+    from a snapshot are read-only views until the next append.
+    """
+    
+    def __init__(self):
+        self.levels: List[Union[bytearray, memoryview]] = []
+        self.size = 0
+    
+    @classmethod
+    def from_buffers(cls, levels: List[memoryview], size: int) -> "MerkleMountainRange":
+        tree = cls()
+        tree.levels = levels
+        tree.size = size
+        return tree
+    
+    def append(self, leaf: bytes):
+        """Add a leaf hash and the parents it completes"""
+        if self.levels and not isinstance(self.levels[0], bytearray):
+            self.levels = [bytearray(level) for level in self.levels]
+        self.size += 1
+        node = leaf
+        height = 0
+        while True:
+            if height == len(self.levels):
+                self.levels.append(bytearray())
+            level = self.levels[height]
+            level += node
+            if (self.size >> height) & 1:
+                return
+            node = _merkle_parent(bytes(level[-2 * HASH_SIZE:-HASH_SIZE]), node)
+            height += 1
+    
+    def node(self, height: int, index: int) -> bytes:
+        return bytes(self.levels[height][index * HASH_SIZE:(index + 1) * HASH_SIZE])
+    
+    def peaks(self) -> List[bytes]:
+        """Roots of the perfect subtrees covering all leaves, highest first"""
+        return [
+            self.node(height, (self.size >> height) - 1)
+            for height in reversed(range(self.size.bit_length()))
+            if (self.size >> height) & 1
+        ]
+    
+    def root(self) -> bytes:
+        return _bag_peaks(self.peaks(), self.size)
+    
+    def proof(self, index: int) -> Dict[str, Any]:
+        """Sibling path from leaf index up to its peak, plus all peaks"""
+        if not 0 <= index < self.size:
+            raise Exception("Reading index out of range")
+        siblings = []
+        height, position = 0, index
+        while (position ^ 1) < (self.size >> height):
+            siblings.append(self.node(height, position ^ 1).hex())
+            position >>= 1
+            height += 1
+        return {
+            "index": index,
+            "leaf_count": self.size,
+            "siblings": siblings,
+            "peaks": [peak.hex() for peak in self.peaks()]
+        }
+
+def verify_history_proof(reading: Dict[str, Any], proof: Dict[str, Any], root: str) -> bool:
+    """
+    Check that a reading, as reported by get_product_traceability, is
+    committed to by a history root, using a proof from get_history_proof.
+    """
+    location = LocationData(**{**reading, "timestamp": datetime.fromisoformat(reading["timestamp"])})
+    node = reading_leaf_hash(location)
+    index, size = proof["index"], proof["leaf_count"]
+    if not 0 <= index < size:
+        return False
+    for height, sibling in enumerate(proof["siblings"]):
+        sibling = bytes.fromhex(sibling)
+        node = _merkle_parent(sibling, node) if (index >> height) & 1 else _merkle_parent(node, sibling)
+    
+    # The path must end at the peak of the mountain holding the leaf
+    height = len(proof["siblings"])
+    heights = [h for h in reversed(range(size.bit_length())) if (size >> h) & 1]
+    peaks = [bytes.fromhex(peak) for peak in proof["peaks"]]
+    if len(peaks) != len(heights) or height not in heights or peaks[heights.index(height)] != node:
+        return False
+    if (index >> height) != (size >> height) - 1:
+        return False
+    return _bag_peaks(peaks, size).hex() == root
+
+def normalize_text(text: str) -> str:
+    """Lowercase and strip accents so that Spanish terms match with or without them"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(character for character in decomposed if not unicodedata.combining(character))
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over normalized keyword phrases.
+    
+    find() reports every whole-word occurrence of every phrase in one pass
+    over the text, whatever the number of phrases.
+    """
+    
+    def __init__(self, phrases: Dict[str, List[Tuple[str, Any]]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[int, List[Tuple[str, Any]]]]] = [[]]
+        
+        # Trie of the phrases
+        for phrase, payloads in phrases.items():
+            state = 0
+            for character in phrase:
+                next_state = self.goto[state].get(character)
+                if next_state is None:
+                    next_state = self.goto[state][character] = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = next_state
+            self.output[state].append((len(phrase), payloads))
+        
+        # Failure links, breadth first
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for character, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and character not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                candidate = self.goto[fallback].get(character, 0)
+                # Children of the root fail back to the root itself
+                self.fail[next_state] = candidate if candidate != next_state else 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+    
+    def find(self, text: str) -> List[Tuple[int, int, List[Tuple[str, Any]]]]:
+        """(start, end, payloads) of whole-word phrase matches in normalized text"""
+        matches = []
+        state = 0
+        for position, character in enumerate(text):
+            while state and character not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(character, 0)
+            for length, payloads in self.output[state]:
+                start, end = position + 1 - length, position + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    matches.append((start, end, payloads))
+        return matches
+
+# Query vocabulary, English and Spanish, written without accents
+QUERY_INTENT_TERMS = {
+    "ALERT_QUERY": ("alert", "alerts", "warning", "warnings", "alarm", "alarms", "notification",
+                    "alerta", "alertas", "aviso", "avisos", "alarma", "alarmas"),
+    "LOCATION_QUERY": ("where", "location", "locations", "located", "position", "positions", "near", "nearby",
+                       "donde", "ubicacion", "ubicaciones", "localizacion", "posicion", "posiciones", "cerca"),
+    "RISK_QUERY": ("risk", "risks", "risky", "danger", "dangerous", "hazard",
+                   "riesgo", "riesgos", "peligro", "peligros", "peligroso", "peligrosos"),
+    "PRODUCT_SEARCH": ("product", "products", "item", "items", "batch", "lot", "shipment", "shipments",
+                       "producto", "productos", "articulo", "articulos", "lote", "lotes", "envio", "envios")
+}
+# The first intent found in this order wins: "where is product X" asks for a location
+QUERY_INTENT_PRIORITY = ("ALERT_QUERY", "LOCATION_QUERY", "RISK_QUERY", "PRODUCT_SEARCH")
+
+QUERY_LEVEL_TERMS = {
+    RiskLevel.LOW: ("low", "bajo", "baja", "bajos", "bajas"),
+    RiskLevel.MEDIUM: ("medium", "moderate", "medio", "media", "moderado", "moderada"),
+    RiskLevel.HIGH: ("high", "alto", "alta", "altos", "altas", "elevado", "elevada"),
+    RiskLevel.CRITICAL: ("critical", "critico", "critica", "criticos", "criticas", "severe", "grave", "graves")
+}
+
+# Relative periods: (days back to the start, length in days, or None for "until now")
+QUERY_PERIOD_TERMS = {
+    "today": (0, None), "hoy": (0, None),
+    "yesterday": (1, 1), "ayer": (1, 1),
+    "this week": ("week", None), "esta semana": ("week", None),
+    "last 7 days": (7, None), "ultimos 7 dias": (7, None)
+}
+
+QUERY_ENTITY_PATTERN = re.compile(r"\b(?:(?P<product_id>[0-9a-f]{16})|(?P<date>\d{4}-\d{2}-\d{2}))\b")
+
+def build_query_matcher(manufacturers: Iterable[str] = ()) -> KeywordMatcher:
+    """Compile the query vocabulary plus the given manufacturer names"""
+    phrases: Dict[str, List[Tuple[str, Any]]] = {}
+    for intent, terms in QUERY_INTENT_TERMS.items():
+        for term in terms:
+            phrases.setdefault(term, []).append(("intent", intent))
+    for level, terms in QUERY_LEVEL_TERMS.items():
+        for term in terms:
+            phrases.setdefault(term, []).append(("level", level))
+    for term in QUERY_PERIOD_TERMS:
+        phrases.setdefault(term, []).append(("period", term))
+    for manufacturer in manufacturers:
+        normalized = normalize_text(manufacturer).strip()
+        if normalized:
+            phrases.setdefault(normalized, []).append(("manufacturer", manufacturer))
+    return KeywordMatcher(phrases)
+
+def parse_query(matcher: KeywordMatcher, query: str) -> Dict[str, Any]:
+    """
+    Classify a query and extract its entities: intent, candidate product
+    IDs, manufacturer, risk levels, relative period and explicit dates.
+    """
+    text = normalize_text(query)
+    intents = set()
+    levels: List[RiskLevel] = []
+    manufacturer = None
+    manufacturer_length = 0
+    period = None
+    for start, end, payloads in matcher.find(text):
+        for kind, value in payloads:
+            if kind == "intent":
+                intents.add(value)
+            elif kind == "level" and value not in levels:
+                levels.append(value)
+            elif kind == "period":
+                period = value
+            elif kind == "manufacturer" and end - start > manufacturer_length:
+                # The longest name wins over names it contains
+                manufacturer, manufacturer_length = value, end - start
+    
+    product_ids = []
+    dates = []
+    for match in QUERY_ENTITY_PATTERN.finditer(text):
+        if match.group("product_id"):
+            if match.group("product_id") not in product_ids:
+                product_ids.append(match.group("product_id"))
+        else:
+            try:
+                dates.append(datetime.fromisoformat(match.group("date")).replace(tzinfo=timezone.utc))
+            except ValueError:
+                pass
+    
+    intent = next((name for name in QUERY_INTENT_PRIORITY if name in intents), None)
+    if intent is None and (product_ids or manufacturer):
+        intent = "PRODUCT_SEARCH"
+    return {
+        "type": intent or "GENERAL_QUERY",
+        "product_ids": tuple(product_ids),
+        "manufacturer": manufacturer,
+        "risk_levels": tuple(levels),
+        "period": period,
+        "dates": tuple(dates)
+    }
+
+def _query_time_range(period: Optional[str], dates: Sequence[datetime],
+                      now: datetime) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Resolve a parsed period or explicit dates to a UTC [since, until] range"""
+    if dates:
+        since = min(dates)
+        until = max(dates) + timedelta(days=1) - timedelta(microseconds=1)
+        return since, until
+    if period is None:
+        return None, None
+    days_back, length = QUERY_PERIOD_TERMS[period]
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    since = midnight - timedelta(days=now.weekday() if days_back == "week" else days_back)
+    until = since + timedelta(days=length) - timedelta(microseconds=1) if length else None
+    return since, until
+
+@intelligent_contract
+class ChainAwareTraceability:
+    """
+    Intelligent Traceability System powered by GenLayer AI capabilities
+    """
+    
+    def __init__(self):
+        self._clear_state()
+        self.anomaly_detection_enabled = True
+        self.anomaly_parameters: Dict[str, float] = {}
+        self.max_closed_alerts = 10000
+        self.alert_rate_limit: Optional[Tuple[int, float]] = (20, 3600.0)
+        self.alert_rate_limits: Dict[str, Optional[Tuple[int, float]]] = {}
+        self.risk_models: Dict[str, Any] = {}
+        self.regulatory_apis = {}
+        self.weather_api_key = None
+        self.traffic_api_key = None
+        self.event_log = EventLog()
+        self.external_cache = TTLCache(max_entries=10000, ttl=900.0)
+        self.cache_geohash_precision = 5
+        self.cache_time_bucket_seconds = 900
+        self.source_timeouts: Dict[str, float] = {
+            "weather": 2.0,
+            "traffic": 2.0,
+            "historical": 2.0,
+            "regulatory_database": 5.0,
+            "fraud_analysis": 5.0
+        }
+        self.regulatory_format_cache = TTLCache(max_entries=4096)
+        self.regulatory_compliance_cache = TTLCache(max_entries=4096)
+        self.wal: Optional[WriteAheadLog] = None
+        self._replaying = False
+        self._checkpoint_task: Optional[asyncio.Task] = None
+        self.checkpoint_failures = 0
+        self.last_checkpoint_error: Optional[str] = None
+        self.metrics: Optional[ContractMetrics] = None
+        self._instrumented = False
+        self._stage_timers: Optional[Dict[str, LatencyHistogram]] = None
+        self.scoring_pool: Optional[ScoringPool] = None
+        
+    async def initialize_system(self, weather_api: str = None, traffic_api: str = None):
+        """Initialize external API connections and risk models"""
+        self.weather_api_key = weather_api
+        self.traffic_api_key = traffic_api
+        
+        # Initialize AI risk prediction models
+        await self._load_risk_models()
+        
+        # Setup regulatory API connections
+        await self._setup_regulatory_apis()
+        
+        return "ChainAware Intelligent Traceability System initialized"
+    
+    async def configure_event_sink(self, sink: EventSink, max_pending: int = 10000,
+                                   overflow: str = "drop_oldest", flush_on_shutdown: bool = True):
+        """Route system events to a new sink, flushing the current one first"""
+        event_log = EventLog(sink, max_pending=max_pending, overflow=overflow, flush_on_shutdown=flush_on_shutdown)
+        await self.event_log.shutdown()
+        self.event_log = event_log
+    
+    def configure_external_cache(self, ttl_seconds: float = 900.0, max_entries: int = 10000,
+                                 geohash_precision: int = 5, time_bucket_seconds: int = 900):
+        """Replace the weather/traffic lookup cache with new limits"""
+        self.external_cache = TTLCache(max_entries=max_entries, ttl=ttl_seconds)
+        self.cache_geohash_precision = geohash_precision
+        self.cache_time_bucket_seconds = time_bucket_seconds
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters of the external data cache"""
+        return self.external_cache.stats()
+    
+    def invalidate_regulatory_cache(self, codes: Optional[Iterable[str]] = None, category: Optional[str] = None) -> int:
+        """
+        Drop cached regulatory verdicts after a regulation change.
+        
+        With no arguments every cached verdict is dropped. Otherwise only
+        compliance verdicts for the given codes and/or category are dropped,
+        along with the format verdicts of the given codes. Returns the number
+        of entries removed; verdicts still being fetched count too and are
+        not cached when they arrive.
+        """
+        if codes is None and category is None:
+            return self.regulatory_format_cache.clear() + self.regulatory_compliance_cache.clear()
+        
+        code_set = set(codes) if codes is not None else None
+        removed = self.regulatory_compliance_cache.invalidate_where(
+            lambda key: (code_set is None or key[0] in code_set) and (category is None or key[1] == category)
+        )
+        if code_set is not None:
+            removed += sum(1 for code in code_set if self.regulatory_format_cache.invalidate(code))
+        return removed
+    
+    async def save_snapshot(self, path: str) -> Dict[str, Any]:
+        """
+        Write products, location histories, alerts, statistics and geofences
+        to path in the compact versioned binary snapshot format.
+        
+        Strings are interned, enums stored as small ints and location
+        histories written as raw column arrays. The file is written next to
+        path and renamed into place, so a crash never leaves a partial
+        snapshot behind. State is serialized on the loop; the file write
+        and fsync run in a thread.
+        """
+        buffer = SnapshotBuffer()
+        summary = self._write_snapshot(buffer)
+        return await self._store_snapshot(path, buffer, summary)
+    
+    async def load_snapshot(self, path: str) -> Dict[str, Any]:
+        """
+        Replace all contract state with a snapshot written by save_snapshot.
+        
+        The file is memory-mapped and location columns are used in place, so
+        histories are only paged in (and copied on their next append) when
+        touched. Streaming anomaly detectors restart from a clean state.
+        """
+        buffer = await asyncio.to_thread(_map_file, path)
+        summary = self._read_snapshot(buffer)
+        if self.wal is not None:
+            # The log no longer describes this state; restart it from a checkpoint
+            await self.checkpoint()
+        return summary
+    
+    async def enable_durability(self, directory: str, segment_bytes: int = 64 * 1024 * 1024,
+                                fsync_interval: float = 0.01,
+                                checkpoint_interval: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Recover from and then journal to a write-ahead log in directory.
+        
+        The latest checkpoint in directory is loaded and only the log
+        segments written after it are replayed; replay applies logged alert
+        records as they were and never raises new alerts or events. From
+        then on product registrations, readings and alert changes are
+        appended to the log and fsynced in groups every fsync_interval
+        seconds by a writer thread. With fsync_interval 0 every record is
+        synced and mutating methods return only once their records are on
+        disk; otherwise mutations made less than fsync_interval ago may be
+        lost on a crash. With checkpoint_interval set, a checkpoint is taken
+        periodically so old segments can be deleted; failures are counted,
+        logged as CHECKPOINT_ERROR events and retried at the next interval.
+        """
+        if self.wal is not None:
+            await self.disable_durability()
+        
+        # Load the latest checkpoint and replay the tail of the log
+        recovery = await self._recover(directory)
+        
+        self.wal = WriteAheadLog(directory, segment_bytes=segment_bytes, fsync_interval=fsync_interval)
+        if recovery["checkpoint"] is None and not recovery["records"]:
+            # Make state that predates the log durable
+            await self.checkpoint()
+        if checkpoint_interval:
+            self._checkpoint_task = asyncio.ensure_future(self._checkpoint_periodically(checkpoint_interval))
+        return recovery
+    
+    async def disable_durability(self):
+        """Commit pending log records and stop journaling"""
+        if self._checkpoint_task is not None:
+            self._checkpoint_task.cancel()
+            self._checkpoint_task = None
+        if self.wal is not None:
+            wal, self.wal = self.wal, None
+            await wal.close()
+    
+    async def checkpoint(self) -> Dict[str, Any]:
+        """Snapshot the current state and delete the log segments it covers"""
+        if self.wal is None:
+            raise Exception("Durability is not enabled")
+        wal = self.wal
+        # Rotate and serialize without yielding, so the snapshot holds
+        # exactly the records of the segments before the new one
+        segment = wal.rotate()
+        buffer = SnapshotBuffer()
+        summary = self._write_snapshot(buffer)
+        summary = await self._store_snapshot(WriteAheadLog.checkpoint_path(wal.directory, segment), buffer, summary)
+        summary["segments_removed"] = await wal.truncate_before(segment)
+        return summary
+    
+    def get_durability_stats(self) -> Optional[Dict[str, Any]]:
+        """Write-ahead log counters, or None when durability is off"""
+        if self.wal is None:
+            return None
+        stats = self.wal.stats()
+        stats["checkpoint_failures"] = self.checkpoint_failures
+        stats["last_checkpoint_error"] = self.last_checkpoint_error
+        return stats
+    
+    def enable_metrics(self, reset: bool = False):
+        """
+        Time public methods and internal stages into fixed-bucket histograms
+        and count readings, alerts and errors.
+        
+        Public methods get timing wrappers installed on this instance only
+        and removed by disable_metrics. Internal stages are timed inline with
+        perf_counter deltas, so the hot path gains no extra coroutine per
+        stage and costs one clock read per stage while off. Recorded data
+        survives disable/enable unless reset is set.
+        """
+        if self.metrics is None or reset:
+            self.metrics = ContractMetrics()
+            if self._instrumented:
+                self.disable_metrics()
+        if self._instrumented:
+            return
+        for name in INSTRUMENTED_METHODS:
+            self._instrument(name)
+        self._stage_timers = {
+            stage: self.metrics.histogram("stage_duration_seconds", (("stage", stage),))
+            for stage in INSTRUMENTED_STAGES
+        }
+        self._instrumented = True
+    
+    def disable_metrics(self):
+        """Remove the timing wrappers, keeping the data recorded so far"""
+        for name in INSTRUMENTED_METHODS:
+            self.__dict__.pop(name, None)
+        self._stage_timers = None
+        self._instrumented = False
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Recorded histograms and counters, plus the cache, event and log counters kept anyway"""
+        metrics = self.metrics.to_dict() if self.metrics is not None else {"histograms": {}, "counters": {}}
+        metrics["enabled"] = self._instrumented
+        metrics["caches"] = {name: cache.stats() for name, cache in self._metric_caches()}
+        metrics["events"] = {
+            "emitted": self.event_log.emitted,
+            "written": self.event_log.written,
+            "dropped": self.event_log.dropped,
+            "failed": self.event_log.failed
+        }
+        metrics["durability"] = self.get_durability_stats()
+        return metrics
+    
+    def get_metrics_prometheus(self) -> str:
+        """get_metrics in the Prometheus text exposition format"""
+        lines = []
+        
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP chainaware_{name} {help_text}")
+            lines.append(f"# TYPE chainaware_{name} {kind}")
+        
+        if self.metrics is not None:
+            histograms: Dict[str, List[Tuple[Tuple[Tuple[str, str], ...], LatencyHistogram]]] = {}
+            for (name, labels), histogram in self.metrics.histograms.items():
+                histograms.setdefault(name, []).append((labels, histogram))
+            for name, series in histograms.items():
+                family(name, "histogram", METRIC_HELP.get(name, name))
+                for labels, histogram in series:
+                    for bound, count in histogram.cumulative():
+                        lines.append(f"chainaware_{name}_bucket{_prometheus_labels(labels + (('le', bound),))} {count}")
+                    lines.append(f"chainaware_{name}_sum{_prometheus_labels(labels)} {histogram.sum!r}")
+                    lines.append(f"chainaware_{name}_count{_prometheus_labels(labels)} {histogram.count}")
+            
+            counters: Dict[str, List[Tuple[Tuple[Tuple[str, str], ...], float]]] = {}
+            for (name, labels), value in self.metrics.counters.items():
+                counters.setdefault(name, []).append((labels, value))
+            for name, series in counters.items():
+                family(name, "counter", METRIC_HELP.get(name, name))
+                for labels, value in series:
+                    lines.append(f"chainaware_{name}{_prometheus_labels(labels)} {value}")
+        
+        caches = list(self._metric_caches())
+        for counter in ("hits", "misses", "coalesced", "evictions", "expirations"):
+            family(f"cache_{counter}_total", "counter", f"Cache {counter}")
+            for cache_name, cache in caches:
+                lines.append(f"chainaware_cache_{counter}_total{_prometheus_labels((('cache', cache_name),))} {getattr(cache, counter)}")
+        family("cache_entries", "gauge", "Entries currently cached")
+        for cache_name, cache in caches:
+            lines.append(f"chainaware_cache_entries{_prometheus_labels((('cache', cache_name),))} {len(cache)}")
+        
+        for counter in ("emitted", "written", "dropped", "failed"):
+            family(f"events_{counter}_total", "counter", f"Events {counter} by the event log")
+            lines.append(f"chainaware_events_{counter}_total {getattr(self.event_log, counter)}")
+        
+        return "\n".join(lines) + "\n"
+    
+    async def shutdown(self):
+        """Flush pending events and log records and release sink resources"""
+        await self.disable_durability()
+        self.disable_parallel_scoring()
+        await self.event_log.shutdown()
+    
+    def enable_parallel_scoring(self, workers: Optional[int] = None, min_batch: int = 1024,
+                                start_method: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Start a ScoringPool of workers processes (one per CPU by default)
+        for batch risk scoring and document hashing.
+        
+        The pool is opt-in per call: update_locations_bulk and
+        verify_documents_bulk only use it when called with
+        use_scoring_pool=True, and only for batches of at least min_batch
+        items. Results are identical to single-process mode; validation,
+        storage, alerts and events stay on the event loop in arrival order.
+        It keeps the loop free while a large batch is scored but does not
+        raise ingestion throughput; see ScoringPool.
+        """
+        self.disable_parallel_scoring()
+        self.scoring_pool = ScoringPool(workers, min_batch=min_batch, start_method=start_method)
+        return self.scoring_pool.stats()
+    
+    def disable_parallel_scoring(self):
+        """Stop the worker processes and score batches in-process again"""
+        if self.scoring_pool is not None:
+            self.scoring_pool.shutdown()
+            self.scoring_pool = None
+    
+    def get_parallel_scoring_stats(self) -> Optional[Dict[str, Any]]:
+        """Worker count and tasks dispatched, or None when parallel scoring is off"""
+        return self.scoring_pool.stats() if self.scoring_pool is not None else None
+    
+    @_synced
+    async def register_product(self, product_data: Dict[str, Any]) -> str:
+        """
+        Register a new product with automatic verification using AI
+        """
+        try:
+            # Validate product data using AI
+            validation_result = await self._validate_product_data(product_data)
+            if not validation_result["valid"]:
+                raise Exception(f"Product validation failed: {validation_result['errors']}")
+            
+            # Generate unique product ID
+            product_id = self._generate_product_id(product_data)
+            
+            # Store product information
+            product = self._build_product(product_id, product_data)
+            self._store_product(product)
+            self._journal_product(product)
+            
+            # Auto-verify regulatory compliance
+            compliance_check = await self._check_regulatory_compliance(product)
+            
+            # Log registration event
+            await self._log_event("PRODUCT_REGISTERED", {
+                "product_id": product_id,
+                "name": product.name,
+                "compliance": compliance_check
+            })
+            
+            # Trigger initial risk assessment
+            await self._assess_initial_risks(product_id)
+            
+            return product_id
+            
+        except Exception as e:
+            await self._log_event("REGISTRATION_ERROR", {"error": str(e)})
+            raise Exception(f"Product registration failed: {str(e)}")
+    
+    @_synced
+    async def register_products_bulk(self, products: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+                                     batch_size: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Register many products from an iterable or async stream of product dicts.
+        
+        Records are validated in batches of batch_size. Regulatory checks are
+        deduplicated across each batch, and product IDs that collide within
+        the batch or with already registered products are rejected. One
+        summary event is logged per batch, and every record gets its own
+        success/error result without aborting the rest.
+        """
+        results: List[Dict[str, Any]] = []
+        batch: List[Dict[str, Any]] = []
+        
+        async for product_data in _iterate(products):
+            batch.append(product_data)
+            if len(batch) >= batch_size:
+                results.extend(await self._register_product_batch(batch, len(results)))
+                batch = []
+        if batch:
+            results.extend(await self._register_product_batch(batch, len(results)))
+        
+        return results
+    
+    async def search_products(self, manufacturer: Optional[str] = None, category: Optional[str] = None,
+                              origin: Optional[str] = None, batch_number: Optional[str] = None,
+                              produced_after: Optional[Union[datetime, str]] = None,
+                              produced_before: Optional[Union[datetime, str]] = None,
+                              fields: Optional[List[str]] = None, limit: int = 50,
+                              cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Search products through the secondary indexes.
+        
+        Equality filters are intersected starting from the smallest matching
+        index entry, and production dates are range-scanned by binary search,
+        so the cost follows the matches rather than the catalog size. Results
+        come in pages of at most limit; pass the returned next_cursor to get
+        the next page. fields restricts each result to those product fields.
+        """
+        if limit < 1:
+            raise Exception("limit must be at least 1")
+        
+        candidates = self._matching_product_ids(
+            {"manufacturer": manufacturer, "category": category, "origin": origin, "batch_number": batch_number},
+            produced_after, produced_before
+        )
+        
+        offset = _cursor_offset(cursor)
+        page = list(islice(candidates, offset, offset + limit + 1))
+        has_more = len(page) > limit
+        page = page[:limit]
+        
+        return {
+            "products": [self._product_to_dict(self.products[product_id], fields) for product_id in page],
+            "count": len(page),
+            "next_cursor": str(offset + limit) if has_more else None
+        }
+    
+    @_synced
+    async def recall_products(self, batch_number: Optional[str] = None, manufacturer: Optional[str] = None,
+                              regulatory_code: Optional[str] = None, reason: str = "Product recall") -> Dict[str, Any]:
+        """
+        Recall every product of a batch, manufacturer and/or regulatory code.
+        
+        Affected products are resolved through the secondary indexes, so the
+        cost follows the affected set rather than the catalog. Each product
+        not yet recalled is marked RECALLED and gets a critical regulatory
+        violation alert that bypasses the alert rate limit. Returns the
+        affected products with their latest known positions.
+        """
+        if batch_number is None and manufacturer is None and regulatory_code is None:
+            raise Exception("A batch number, manufacturer or regulatory code is required")
+        
+        product_ids = list(self._matching_product_ids({
+            "batch_number": batch_number, "manufacturer": manufacturer, "regulatory_codes": regulatory_code
+        }))
+        
+        recalled = 0
+        affected = []
+        for product_id in product_ids:
+            product = self.products[product_id]
+            if product.status != ProductStatus.RECALLED:
+                # Mark the product and alert on it once
+                product.status = ProductStatus.RECALLED
+                self._journal_product(product)
+                history = self.locations.get(product_id)
+                await self._raise_alert(
+                    product_id,
+                    AlertType.REGULATORY_VIOLATION,
+                    RiskLevel.CRITICAL,
+                    f"Product {product_id} recalled: {reason}",
+                    history.latest() if history else None,
+                    rate_limited=False
+                )
+                recalled += 1
+            latitude, longitude = self.spatial_index.position(product_id) or (None, None)
+            affected.append({"product_id": product_id, "latitude": latitude, "longitude": longitude})
+        
+        await self._log_event("PRODUCTS_RECALLED", {
+            "batch_number": batch_number,
+            "manufacturer": manufacturer,
+            "regulatory_code": regulatory_code,
+            "reason": reason,
+            "affected": len(product_ids),
+            "recalled": recalled
+        })
+        
+        return {"affected": len(product_ids), "recalled": recalled, "products": affected}
+    
+    @_synced
+    async def acknowledge_alert(self, alert_id: str) -> bool:
+        """Mark an alert as seen by an operator"""
+        alert = self.alerts.get(alert_id)
+        if alert is None:
+            raise Exception("Alert not found")
+        was_open = alert.is_open
+        alert.acknowledged = True
+        if was_open:
+            self._close_alert(alert)
+        self._journal_alert(alert)
+        await self._log_event("ALERT_ACKNOWLEDGED", {"alert_id": alert_id, "product_id": alert.product_id})
+        return True
+    
+    @_synced
+    async def resolve_alert(self, alert_id: str, resolution: str) -> bool:
+        """Record how an alert was resolved"""
+        alert = self.alerts.get(alert_id)
+        if alert is None:
+            raise Exception("Alert not found")
+        if not resolution:
+            raise Exception("Resolution is required")
+        if not alert.resolution and alert.product_id is not None:
+            self._get_product_stats(alert.product_id).resolved_alerts += 1
+        was_open = alert.is_open
+        alert.resolution = resolution
+        alert.acknowledged = True
+        if was_open:
+            self._close_alert(alert)
+        self._journal_alert(alert)
+        await self._log_event("ALERT_RESOLVED", {"alert_id": alert_id, "product_id": alert.product_id})
+        return True
+    
+    def configure_alert_policy(self, rate_limit: Optional[Tuple[int, float]] = (20, 3600.0),
+                               max_closed_alerts: int = 10000):
+        """
+        Set the default per-product rate limit on new alerts
+        ((max_alerts, window_seconds), or None for unlimited; 0 suppresses
+        every new alert) and how many acknowledged/resolved alerts are
+        retained before the oldest are evicted.
+        """
+        if rate_limit is not None and rate_limit[0] < 0:
+            raise Exception("max_alerts must not be negative")
+        self.alert_rate_limit = rate_limit
+        self.max_closed_alerts = max_closed_alerts
+        while len(self.closed_alerts) > self.max_closed_alerts:
+            self._evict_alert(self.closed_alerts.popleft())
+    
+    def set_alert_rate_limit(self, product_id: str, max_alerts: Optional[int], window_seconds: float = 3600.0):
+        """Override the alert rate limit of one product (max_alerts=None for unlimited, 0 to suppress all)"""
+        if max_alerts is not None and max_alerts < 0:
+            raise Exception("max_alerts must not be negative")
+        self.alert_rate_limits[product_id] = None if max_alerts is None else (max_alerts, window_seconds)
+    
+    async def get_sensor_statistics(self, product_id: str) -> Dict[str, Any]:
+        """Rolling sensor aggregates and score components of a product"""
+        if product_id not in self.products:
+            raise Exception("Product not found")
+        return self._get_product_stats(product_id).to_dict()
+    
+    def configure_anomaly_detection(self, enabled: bool = True, **parameters: float):
+        """
+        Enable or tune streaming anomaly detection on sensor readings.
+        
+        parameters are passed to SensorAnomalyDetector (alpha, slack,
+        drift_threshold, spike_z, warmup). Existing detector state is reset.
+        """
+        self.anomaly_detection_enabled = enabled
+        self.anomaly_parameters = dict(parameters)
+        self.anomaly_detectors = {}
+    
+    def add_geofence(self, geofence_id: str, polygon: Optional[List[Tuple[float, float]]] = None,
+                     center: Optional[Tuple[float, float]] = None, radius_km: Optional[float] = None) -> Geofence:
+        """
+        Define a polygon ((lat, lon) vertices) or circular geofence.
+        
+        Each new reading is checked against the geofences whose bounding box
+        covers its grid cell, and GEOFENCE_ENTERED / GEOFENCE_EXITED events
+        are logged on boundary crossings.
+        """
+        self.remove_geofence(geofence_id)
+        geofence = Geofence(id=geofence_id, polygon=polygon, center=center, radius_km=radius_km)
+        self.geofences[geofence_id] = geofence
+        self.geofence_cells.cover(geofence_id, *geofence.bbox)
+        return geofence
+    
+    def remove_geofence(self, geofence_id: str) -> bool:
+        """Delete a geofence; products inside it are no longer tracked as members"""
+        if self.geofences.pop(geofence_id, None) is None:
+            return False
+        self.geofence_cells.uncover(geofence_id)
+        for memberships in self.geofence_memberships.values():
+            memberships.pop(geofence_id, None)
+        return True
+    
+    def set_planned_route(self, product_id: str, waypoints: List[Tuple[float, float]],
+                          tolerance_km: float = 5.0) -> Dict[str, Any]:
+        """
+        Attach a planned route ((lat, lon) waypoints) to a product.
+        
+        Each new reading is checked against the route's segment tree and a
+        ROUTE_DEVIATION alert is raised when it lies more than tolerance_km
+        from the route (HIGH beyond twice the tolerance, MEDIUM otherwise).
+        """
+        if product_id not in self.products:
+            raise Exception("Product not found")
+        route = PlannedRoute(waypoints, tolerance_km)
+        self.planned_routes[product_id] = route
+        return {
+            "product_id": product_id,
+            "waypoints": len(route.waypoints),
+            "length_km": route.length_km,
+            "tolerance_km": route.tolerance_km
+        }
+    
+    def remove_planned_route(self, product_id: str) -> bool:
+        """Stop checking a product's readings against its planned route"""
+        return self.planned_routes.pop(product_id, None) is not None
+    
+    async def get_route_status(self, product_id: str) -> Dict[str, Any]:
+        """Distance of a product's latest position from its planned route and progress along it"""
+        route = self.planned_routes.get(product_id)
+        if route is None:
+            raise Exception("Planned route not found")
+        status = {
+            "product_id": product_id,
+            "length_km": route.length_km,
+            "tolerance_km": route.tolerance_km,
+            "distance_km": None,
+            "progress_km": None,
+            "on_route": None
+        }
+        position = self.spatial_index.position(product_id)
+        if position is not None:
+            distance, segment, fraction = route.nearest(*position, route.last_segment)
+            status["distance_km"] = distance
+            status["progress_km"] = route.progress_km(segment, fraction)
+            status["on_route"] = distance <= route.tolerance_km
+        return status
+    
+    async def find_products_within_radius(self, latitude: float, longitude: float, radius_km: float,
+                                          limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Products whose latest position lies within radius_km, nearest first"""
+        matches = self.spatial_index.within_radius(latitude, longitude, radius_km)
+        return [self._position_entry(product_id, distance) for product_id, distance in matches[:limit]]
+    
+    async def find_products_in_bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[Dict[str, Any]]:
+        """Products whose latest position lies inside a bounding box"""
+        return [self._position_entry(product_id) for product_id in self.spatial_index.within_bbox(min_lat, min_lon, max_lat, max_lon)]
+    
+    async def find_nearest_products(self, latitude: float, longitude: float, k: int = 10) -> List[Dict[str, Any]]:
+        """The k products whose latest position is closest to a coordinate"""
+        return [self._position_entry(product_id, distance) for product_id, distance in self.spatial_index.nearest(latitude, longitude, k)]
+    
+    async def find_products_in_geofence(self, geofence_id: str) -> List[Dict[str, Any]]:
+        """Products whose latest position lies inside a geofence"""
+        geofence = self.geofences.get(geofence_id)
+        if geofence is None:
+            raise Exception("Geofence not found")
+        return [
+            self._position_entry(product_id)
+            for product_id in self.spatial_index.within_bbox(*geofence.bbox)
+            if geofence.contains(*self.spatial_index.position(product_id))
+        ]
+    
+    @_synced
+    async def update_location(self, product_id: str, location_data: Dict[str, Any]) -> bool:
+        """
+        Update product location with IoT sensor data
+        """
+        if product_id not in self.products:
+            raise Exception("Product not found")
+        
+        # Parse location data
+        location = self._parse_location_data(location_data)
+        
+        # Store, analyze and raise alerts for the reading
+        risk_assessment, _ = await self._record_location(product_id, location)
+        
+        # Log location update
+        await self._log_event("LOCATION_UPDATED", {
+            "product_id": product_id,
+            "location": {"lat": location.latitude, "lng": location.longitude},
+            "risk_level": risk_assessment.level.value
+        })
+        
+        return True
+    
+    @_synced
+    async def update_locations_bulk(self, readings: Iterable[Tuple[str, Dict[str, Any]]],
+                                    use_scoring_pool: bool = False) -> List[Dict[str, Any]]:
+        """
+        Ingest a batch of IoT sensor readings, possibly for many products.
+        
+        Readings are validated first, risk-scored together with
+        score_risk_batch, then stored in order with the same alerting as
+        update_location. A single summary event is logged for the whole
+        batch. Invalid readings are reported per item without aborting the
+        rest of the batch. With use_scoring_pool and parallel scoring
+        enabled, the scoring step runs in the worker processes.
+        """
+        results: List[Optional[Dict[str, Any]]] = []
+        pending: List[Tuple[int, str, LocationData]] = []
+        
+        # Validate and parse every reading
+        for index, (product_id, location_data) in enumerate(readings):
+            try:
+                if product_id not in self.products:
+                    raise Exception("Product not found")
+                location = self._parse_location_data(location_data)
+            except KeyError as e:
+                results.append(self._bulk_error(index, product_id, f"Missing location field: {e.args[0]}"))
+                continue
+            except Exception as e:
+                results.append(self._bulk_error(index, product_id, str(e)))
+                continue
+            results.append(None)
+            pending.append((index, product_id, location))
+        
+        # Score the whole batch at once, sharded across worker processes when asked to
+        columns = (
+            [_to_column(location.temperature) for _, _, location in pending],
+            [_to_column(location.humidity) for _, _, location in pending],
+            [_to_column(location.shock_level) for _, _, location in pending]
+        )
+        if use_scoring_pool and self.scoring_pool is not None:
+            levels, masks, confidences = await self.scoring_pool.score([product_id for _, product_id, _ in pending], *columns)
+        else:
+            levels, masks, confidences = score_risk_batch(*columns)
         
-        # AI-powered analysis of current conditions
-        risk_assessment = await self._analyze_current_risks(product_id, location)
+        risk_counts: Dict[str, int] = {}
+        alerts_raised = 0
+        accepted = 0
         
-        # Generate intelligent alerts if needed
-        if risk_assessment.level in [RiskLevel.HIGH, RiskLevel.CRITICAL]:
-            alert = Alert(
-                id=self._generate_alert_id(),
-                type=risk_assessment.factors[0] if risk_assessment.factors else AlertType.QUALITY_RISK,
-                level=risk_assessment.level,
-                message=f"Risk detected for {product_id}: {risk_assessment.recommendation}",
-                location=location,
-                timestamp=datetime.now(timezone.utc)
-            )
-            self.alerts.append(alert)
+        # Store readings and raise alerts in arrival order; a failure only affects its own item
+        for position, (index, product_id, location) in enumerate(pending):
+            risk_assessment = risk_prediction_from_score(levels[position], masks[position], confidences[position])
+            try:
+                risk_assessment, alert = await self._record_location(product_id, location, risk_assessment)
+            except Exception as e:
+                results[index] = self._bulk_error(index, product_id, str(e))
+                continue
+            accepted += 1
+            
+            level = risk_assessment.level.value
+            risk_counts[level] = risk_counts.get(level, 0) + 1
+            if alert:
+                alerts_raised += 1
+            
+            results[index] = {
+                "index": index,
+                "product_id": product_id,
+                "success": True,
+                "risk_level": level,
+                "alert_id": alert.id if alert else None
+            }
         
-        # Log location update
-        await self._log_event("LOCATION_UPDATED", {
-            "product_id": product_id,
-            "location": {"lat": location.latitude, "lng": location.longitude},
-            "risk_level": risk_assessment.level.value
+        # Log a single summary event for the batch
+        await self._log_event("LOCATIONS_BULK_UPDATED", {
+            "received": len(results),
+            "accepted": accepted,
+            "rejected": len(results) - accepted,
+            "alerts_raised": alerts_raised,
+            "risk_levels": risk_counts
         })
         
-        return True
+        return results
     
     async def predict_delivery_risks(self, product_id: str, destination: Dict[str, float]) -> RiskPrediction:
         """
@@ -222,9 +3110,21 @@ class ChainAwareTraceability:
         if not current_location:
             raise Exception("No location data available")
         
-        # Fetch real-time external data
-        weather_data = await self._get_weather_data(current_location, destination)
-        traffic_data = await self._get_traffic_data(current_location, destination)
+        # Fetch real-time external data and historical patterns concurrently
+        degraded_factors: List[str] = []
+        weather_data, traffic_data, historical_risks = await asyncio.gather(
+            self._fetch_source(
+                "weather",
+                self._get_cached_external_data("weather", current_location, destination, self._get_weather_data),
+                degraded_factors
+            ),
+            self._fetch_source(
+                "traffic",
+                self._get_cached_external_data("traffic", current_location, destination, self._get_traffic_data),
+                degraded_factors
+            ),
+            self._fetch_source("historical", self._analyze_historical_patterns(product_id), degraded_factors)
+        )
         
         # Use AI to analyze patterns and predict risks
         risk_factors = []
@@ -245,8 +3145,11 @@ class ChainAwareTraceability:
                 confidence -= 0.15
         
         # Historical data analysis
-        historical_risks = await self._analyze_historical_patterns(product_id)
-        risk_factors.extend(historical_risks)
+        if historical_risks:
+            risk_factors.extend(historical_risks)
+        
+        # Sources that timed out or failed count as unknown risks
+        risk_factors.extend(degraded_factors)
         
         # Determine risk level
         if len(risk_factors) >= 3 or confidence < 0.4:
@@ -274,87 +3177,80 @@ class ChainAwareTraceability:
         AI-powered document verification for certificates and compliance
         """
         # Simulate AI document analysis
-        document_hash = hashlib.sha256(
-            json.dumps(document_data, sort_keys=True).encode()
-        ).hexdigest()
+        result = await self._check_document(document_data, document_hash(document_data))
         
-        # Check against regulatory databases
-        regulatory_check = await self._verify_regulatory_database(document_data)
+        # Log verification
+        await self._log_event("DOCUMENT_VERIFIED", result)
         
-        # AI fraud detection
-        fraud_score = await self._analyze_document_fraud_risk(document_data)
+        return result
+    
+    async def verify_documents_bulk(self, documents: Iterable[Dict[str, Any]],
+                                    use_scoring_pool: bool = False) -> List[Dict[str, Any]]:
+        """
+        Verify many documents with the same checks as verify_document.
         
-        # Generate verification result
-        result = {
-            "document_hash": document_hash,
-            "verified": fraud_score < 0.3,  # Threshold for verification
-            "fraud_score": fraud_score,
-            "regulatory_status": regulatory_check,
-            "verification_timestamp": datetime.now(timezone.utc).isoformat(),
-            "issues": []
-        }
+        With use_scoring_pool and parallel scoring enabled, documents are
+        hashed in the worker processes, sharded by their product_id. A
+        single summary event is logged for the whole batch.
+        """
+        documents = list(documents)
+        if use_scoring_pool and self.scoring_pool is not None:
+            keys = [str(document.get("product_id", position)) for position, document in enumerate(documents)]
+            digests = await self.scoring_pool.hash_documents(keys, documents)
+        else:
+            digests = hash_documents(documents)
         
-        if fraud_score > 0.7:
-            result["issues"].append("High fraud risk detected")
-        if not regulatory_check.get("valid", False):
-            result["issues"].append("Regulatory verification failed")
+        results = await asyncio.gather(*(
+            self._check_document(document, digest) for document, digest in zip(documents, digests)
+        ))
         
-        # Log verification
-        await self._log_event("DOCUMENT_VERIFIED", result)
+        # Log a single summary event for the batch
+        await self._log_event("DOCUMENTS_BULK_VERIFIED", {
+            "received": len(results),
+            "verified": sum(1 for result in results if result["verified"]),
+            "with_issues": sum(1 for result in results if result["issues"])
+        })
         
-        return result
+        return list(results)
     
-    async def get_product_traceability(self, product_id: str) -> Dict[str, Any]:
+    async def get_product_traceability(self, product_id: str, since: Optional[Union[datetime, str]] = None,
+                                       until: Optional[Union[datetime, str]] = None, limit: Optional[int] = None,
+                                       cursor: Optional[str] = None, downsample: Optional[str] = None,
+                                       every: int = 1, bucket_seconds: float = 3600.0,
+                                       tolerance_km: float = 0.1) -> Dict[str, Any]:
         """
-        Get complete product traceability data
+        Get product traceability data.
+        
+        location_history can be restricted to [since, until] (located by
+        binary search on timestamps), reduced with a downsampling mode, and
+        paginated with limit/cursor (next page in location_cursor):
+        
+        - "nth": every Nth reading (every)
+        - "bucket": min/max/mean per time bucket (bucket_seconds)
+        - "douglas_peucker": track simplification (tolerance_km)
+        
+        Without arguments the full history is returned.
         """
         if product_id not in self.products:
             raise Exception("Product not found")
         
         product = self.products[product_id]
-        locations = self.locations.get(product_id, [])
+        history = self.locations.get(product_id) or LocationHistory()
+        location_history, location_cursor = self._select_location_history(
+            history, since, until, limit, cursor, downsample, every, bucket_seconds, tolerance_km
+        )
         
         # Get related alerts
-        product_alerts = [alert for alert in self.alerts if alert.id.startswith(product_id)]
+        product_alerts = self._get_product_alerts(product_id)
         
         # Get current risk assessment
         current_risk = await self._get_current_risk_assessment(product_id)
         
         return {
-            "product": {
-                "id": product.id,
-                "name": product.name,
-                "category": product.category,
-                "origin": product.origin,
-                "manufacturer": product.manufacturer,
-                "production_date": product.production_date.isoformat(),
-                "batch_number": product.batch_number,
-                "specifications": product.specifications,
-                "regulatory_codes": product.regulatory_codes
-            },
-            "location_history": [
-                {
-                    "latitude": loc.latitude,
-                    "longitude": loc.longitude,
-                    "timestamp": loc.timestamp.isoformat(),
-                    "temperature": loc.temperature,
-                    "humidity": loc.humidity,
-                    "pressure": loc.pressure,
-                    "shock_level": loc.shock_level
-                }
-                for loc in locations
-            ],
-            "alerts": [
-                {
-                    "id": alert.id,
-                    "type": alert.type.value,
-                    "level": alert.level.value,
-                    "message": alert.message,
-                    "timestamp": alert.timestamp.isoformat(),
-                    "acknowledged": alert.acknowledged
-                }
-                for alert in product_alerts
-            ],
+            "product": self._product_to_dict(product),
+            "location_history": location_history,
+            "location_cursor": location_cursor,
+            "alerts": [self._alert_to_dict(alert) for alert in product_alerts],
             "current_risk": {
                 "level": current_risk.level.value,
                 "factors": current_risk.factors,
@@ -364,6 +3260,100 @@ class ChainAwareTraceability:
             "traceability_score": await self._calculate_traceability_score(product_id)
         }
     
+    async def get_history_root(self, product_id: str) -> Dict[str, Any]:
+        """Merkle root committing to every reading of a product, in arrival order"""
+        if product_id not in self.products:
+            raise Exception("Product not found")
+        tree = self.history_trees.get(product_id) or MerkleMountainRange()
+        return {"product_id": product_id, "root": tree.root().hex(), "readings": tree.size}
+    
+    async def get_history_proof(self, product_id: str, index: int) -> Dict[str, Any]:
+        """
+        Inclusion proof for the reading at arrival index, checkable against
+        get_history_root with verify_history_proof without the full history.
+        """
+        if product_id not in self.products:
+            raise Exception("Product not found")
+        tree = self.history_trees.get(product_id) or MerkleMountainRange()
+        proof = tree.proof(index)
+        proof["product_id"] = product_id
+        proof["reading"] = self.locations[product_id].to_dict(index)
+        proof["root"] = tree.root().hex()
+        return proof
+    
+    async def export_traceability(self, format: str = "ndjson", batch_number: Optional[str] = None,
+                                  manufacturer: Optional[str] = None,
+                                  produced_after: Optional[Union[datetime, str]] = None,
+                                  produced_before: Optional[Union[datetime, str]] = None,
+                                  since: Optional[Union[datetime, str]] = None,
+                                  until: Optional[Union[datetime, str]] = None,
+                                  record_types: Iterable[str] = EXPORT_RECORD_TYPES) -> AsyncIterable[str]:
+        """
+        Stream an audit dump as NDJSON or CSV lines.
+        
+        Products are selected through the secondary indexes by batch number,
+        manufacturer and production date range; each product line is
+        followed by its readings and alerts between since and until. CSV
+        output starts with a header and has a record_type column. Rows are
+        serialized one at a time straight from the location columns, so
+        memory stays flat however many readings are exported.
+        """
+        if format not in ("ndjson", "csv"):
+            raise Exception(f"Unknown export format: {format}")
+        record_types = set(record_types)
+        unknown = record_types.difference(EXPORT_RECORD_TYPES)
+        if unknown:
+            raise Exception(f"Unknown export record types: {sorted(unknown)}")
+        if isinstance(since, str):
+            since = datetime.fromisoformat(since)
+        if isinstance(until, str):
+            until = datetime.fromisoformat(until)
+        since_us = _epoch_us(since) if since is not None else -math.inf
+        until_us = _epoch_us(until) if until is not None else math.inf
+        
+        if format == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, EXPORT_CSV_COLUMNS, restval="", lineterminator="\n")
+            writer.writeheader()
+            
+            def serialize(record: Dict[str, Any]) -> str:
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerow({
+                    column: "" if value is None else json.dumps(value) if isinstance(value, (dict, list)) else value
+                    for column, value in record.items()
+                })
+                return buffer.getvalue()
+            
+            yield buffer.getvalue()
+        else:
+            def serialize(record: Dict[str, Any]) -> str:
+                return json.dumps(record) + "\n"
+        
+        # Resolve IDs up front so products registered mid-export cannot break iteration
+        product_ids = list(self._matching_product_ids(
+            {"batch_number": batch_number, "manufacturer": manufacturer}, produced_after, produced_before
+        ))
+        
+        for product_id in product_ids:
+            product = self.products.get(product_id)
+            if product is None:
+                continue
+            if "product" in record_types:
+                record = self._product_to_dict(product)
+                del record["id"]
+                yield serialize({"record_type": "product", "product_id": product_id, **record})
+            
+            history = self.locations.get(product_id)
+            if "location" in record_types and history is not None:
+                for row in history.rows_between(since, until):
+                    yield serialize({"record_type": "location", "product_id": product_id, **history.to_dict(row)})
+            
+            if "alert" in record_types:
+                for alert in list(self.alerts_by_product.get(product_id, {}).values()):
+                    if since_us <= _epoch_us(alert.timestamp) <= until_us:
+                        yield serialize({"record_type": "alert", "product_id": product_id, **self._export_alert(alert)})
+    
     async def query_natural_language(self, query: str) -> Dict[str, Any]:
         """
         Process natural language queries about products and shipments
@@ -393,6 +3383,7 @@ class ChainAwareTraceability:
     # Private helper methods for AI processing
     async def _validate_product_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """AI-powered product data validation"""
+        started = time.perf_counter()
         errors = []
         
         # Check required fields
@@ -410,69 +3401,125 @@ class ChainAwareTraceability:
         # AI regulatory code validation
         if "regulatory_codes" in data:
             for code in data["regulatory_codes"]:
-                if not await self._validate_regulatory_code(code):
+                if not await self._is_valid_regulatory_code(code):
                     errors.append(f"Invalid regulatory code: {code}")
         
+        timers = self._stage_timers
+        if timers is not None:
+            timers["validation"].observe(time.perf_counter() - started)
         return {"valid": len(errors) == 0, "errors": errors}
     
     async def _check_regulatory_compliance(self, product: ProductData) -> Dict[str, Any]:
         """Check regulatory compliance using AI"""
-        compliance_results = []
+        started = time.perf_counter()
+        # Verify every code concurrently, sharing cached verdicts
+        verdicts = await asyncio.gather(*(
+            self._is_regulatory_compliant(code, product.category) for code in product.regulatory_codes
+        ))
+        timers = self._stage_timers
+        if timers is not None:
+            timers["regulatory_compliance"].observe(time.perf_counter() - started)
+        return self._compliance_report(product.regulatory_codes, verdicts)
+    
+    async def _check_document(self, document_data: Dict[str, Any], document_hash: str) -> Dict[str, Any]:
+        """Regulatory and fraud checks of a hashed document"""
+        # Check against regulatory databases and run AI fraud detection concurrently
+        degraded_factors: List[str] = []
+        regulatory_check, fraud_score = await asyncio.gather(
+            self._fetch_source("regulatory_database", self._verify_regulatory_database(document_data), degraded_factors),
+            self._fetch_source("fraud_analysis", self._analyze_document_fraud_risk(document_data), degraded_factors)
+        )
+        if regulatory_check is None:
+            regulatory_check = {"valid": False, "source": "unavailable"}
+        
+        # Generate verification result
+        result = {
+            "document_hash": document_hash,
+            "verified": fraud_score is not None and fraud_score < 0.3,  # Threshold for verification
+            "fraud_score": fraud_score,
+            "regulatory_status": regulatory_check,
+            "verification_timestamp": datetime.now(timezone.utc).isoformat(),
+            "issues": [],
+            "degraded_factors": degraded_factors
+        }
+        
+        if fraud_score is None:
+            result["issues"].append("Fraud analysis unavailable")
+        elif fraud_score > 0.7:
+            result["issues"].append("High fraud risk detected")
+        if not regulatory_check.get("valid", False):
+            result["issues"].append("Regulatory verification failed")
         
-        for code in product.regulatory_codes:
-            # Simulate regulatory check
-            is_valid = await self._verify_regulatory_api(code, product.category)
-            compliance_results.append({
+        return result
+    
+    def _compliance_report(self, codes: List[str], verdicts: Iterable[bool]) -> Dict[str, Any]:
+        """Summarize per-code compliance verdicts"""
+        compliance_results = [
+            {
                 "code": code,
                 "valid": is_valid,
                 "source": "AI_Regulatory_Verification"
-            })
+            }
+            for code, is_valid in zip(codes, verdicts)
+        ]
         
         return {
             "overall_compliant": all(result["valid"] for result in compliance_results),
             "details": compliance_results
         }
     
+    async def _is_valid_regulatory_code(self, code: str) -> bool:
+        """Format validity of a regulatory code, memoized per code"""
+        return await self.regulatory_format_cache.get_or_load(code, lambda: self._validate_regulatory_code(code))
+    
+    async def _is_regulatory_compliant(self, code: str, category: str) -> bool:
+        """Compliance verdict for a code in a category, memoized per (code, category)"""
+        return await self.regulatory_compliance_cache.get_or_load(
+            (code, category), lambda: self._verify_regulatory_api(code, category)
+        )
+    
     async def _analyze_current_risks(self, product_id: str, location: LocationData) -> RiskPrediction:
         """AI-powered real-time risk analysis"""
+        started = time.perf_counter()
         risk_factors = []
         confidence = 0.9
         
         # Temperature risk analysis
         if location.temperature:
-            if location.temperature < 0 or location.temperature > 40:
+            if location.temperature < TEMPERATURE_MIN or location.temperature > TEMPERATURE_MAX:
                 risk_factors.append("temperature_extreme")
                 confidence -= 0.2
         
         # Humidity risk analysis
         if location.humidity:
-            if location.humidity < 30 or location.humidity > 80:
+            if location.humidity < HUMIDITY_MIN or location.humidity > HUMIDITY_MAX:
                 risk_factors.append("humidity_extreme")
                 confidence -= 0.15
         
         # Shock/vibration analysis
-        if location.shock_level and location.shock_level > 5:
+        if location.shock_level and location.shock_level > SHOCK_MAX:
             risk_factors.append("excessive_shock")
             confidence -= 0.25
         
         # Determine risk level
         if len(risk_factors) >= 2 or confidence < 0.6:
             level = RiskLevel.HIGH
-            recommendation = "Immediate attention required - conditions may affect product quality"
         elif len(risk_factors) >= 1 or confidence < 0.8:
             level = RiskLevel.MEDIUM
-            recommendation = "Monitor conditions closely"
         else:
             level = RiskLevel.LOW
-            recommendation = "Conditions are within acceptable range"
         
-        return RiskPrediction(
+        prediction = RiskPrediction(
             level=level,
             factors=risk_factors,
             confidence=confidence,
-            recommendation=recommendation,
+            recommendation=CURRENT_RISK_RECOMMENDATIONS[level],
             predicted_time=datetime.now(timezone.utc)
         )
+        timers = self._stage_timers
+        if timers is not None:
+            timers["risk_analysis"].observe(time.perf_counter() - started)
+        return prediction
     
     async def _get_weather_data(self, origin: LocationData, destination: Dict[str, float]) -> Dict[str, Any]:
         """Fetch real-time weather data (simulated)"""
@@ -493,35 +3540,984 @@ class ChainAwareTraceability:
             "incidents": hash(str(datetime.now().hour)) % 5
         }
     
+    async def _fetch_source(self, source: str, awaitable: Awaitable[Any], degraded_factors: List[str]) -> Any:
+        """Await one data source within its timeout, recording a factor instead of failing"""
+        started = time.perf_counter()
+        result = None
+        try:
+            result = await asyncio.wait_for(awaitable, self.source_timeouts.get(source))
+        except asyncio.TimeoutError:
+            degraded_factors.append(f"{source}_timeout")
+        except Exception:
+            degraded_factors.append(f"{source}_unavailable")
+        if self._stage_timers is not None:
+            self.metrics.histogram("external_fetch_duration_seconds", (("source", source),)).observe(
+                time.perf_counter() - started
+            )
+        return result
+    
+    async def _get_cached_external_data(self, source: str, origin: LocationData, destination: Dict[str, float],
+                                        fetch: Callable[[LocationData, Dict[str, float]], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Serve an external lookup from cache, keyed by geohash cells and time bucket"""
+        key = (
+            source,
+            geohash_encode(origin.latitude, origin.longitude, self.cache_geohash_precision),
+            self._destination_cache_key(destination),
+            int(time.time() // self.cache_time_bucket_seconds)
+        )
+        return await self.external_cache.get_or_load(key, lambda: fetch(origin, destination))
+    
+    def _destination_cache_key(self, destination: Dict[str, float]) -> Hashable:
+        """Geohash cell of a destination, or its raw items if it has no coordinates"""
+        latitude = destination.get("latitude", destination.get("lat"))
+        longitude = destination.get("longitude", destination.get("lng", destination.get("lon")))
+        if latitude is None or longitude is None:
+            return tuple(sorted(destination.items()))
+        return geohash_encode(latitude, longitude, self.cache_geohash_precision)
+    
     async def _interpret_query_intent(self, query: str) -> Dict[str, Any]:
-        """AI-powered natural language query interpretation"""
-        query_lower = query.lower()
+        """
+        Classify a query and extract its entities in one pass of the
+        compiled keyword matcher, recompiled only when the manufacturer
+        vocabulary may have changed. Parses are cached per query and
+        vocabulary version; relative periods resolve at call time.
+        """
+        version = self.product_index.vocabulary_version
+        if version != self._query_matcher_version:
+            self._query_matcher = build_query_matcher(self.product_index.by_field["manufacturer"])
+            self._query_matcher_version = version
         
-        # Simple intent detection (in real implementation, this would use NLP)
-        if "product" in query_lower or "item" in query_lower:
-            return {
-                "type": "PRODUCT_SEARCH",
-                "parameters": {"query": query}
-            }
-        elif "risk" in query_lower or "danger" in query_lower:
-            return {
-                "type": "RISK_QUERY",
-                "parameters": {"query": query}
+        key = (query, version)
+        parsed = self.query_cache.get(key)
+        if parsed is None:
+            parsed = parse_query(self._query_matcher, query)
+            self.query_cache.set(key, parsed)
+        
+        since, until = _query_time_range(parsed["period"], parsed["dates"], datetime.now(timezone.utc))
+        return {
+            "type": parsed["type"],
+            "parameters": {
+                "query": query,
+                "product_ids": [product_id for product_id in parsed["product_ids"] if product_id in self.products],
+                "manufacturer": parsed["manufacturer"],
+                "risk_levels": list(parsed["risk_levels"]),
+                "since": since,
+                "until": until
             }
-        elif "where" in query_lower or "location" in query_lower:
-            return {
-                "type": "LOCATION_QUERY",
-                "parameters": {"query": query}
+        }
+    
+    # Utility methods
+    def _write_snapshot(self, file) -> Dict[str, Any]:
+        """Serialize contract state into an open binary file"""
+        strings = StringTable()
+        
+        products = bytearray(struct.pack("<I", len(self.products)))
+        for product in self.products.values():
+            products += _SNAPSHOT_PRODUCT.pack(
+                strings.intern(product.id),
+                strings.intern(product.name),
+                strings.intern(product.category),
+                strings.intern(product.origin),
+                strings.intern(product.manufacturer),
+                strings.intern(product.batch_number),
+                strings.intern(json.dumps(product.specifications)),
+                strings.intern(json.dumps(product.regulatory_codes)),
+                strings.intern(json.dumps(product.sensors_config)),
+                *_datetime_parts(product.production_date),
+                PRODUCT_STATUS_CODES.index(product.status)
+            )
+        
+        alerts = bytearray(struct.pack("<I", len(self.alerts)))
+        for alert in self.alerts.values():
+            location = alert.location or _NO_LOCATION
+            alerts += _SNAPSHOT_ALERT.pack(
+                strings.intern(alert.id),
+                ALERT_TYPE_CODES.index(alert.type),
+                RISK_LEVEL_CODES.index(alert.level),
+                strings.intern(alert.message),
+                strings.intern(alert.product_id),
+                *_datetime_parts(alert.timestamp),
+                _optional_datetime_parts(alert.first_seen)[0],
+                _optional_datetime_parts(alert.last_seen)[0],
+                alert.count,
+                alert.acknowledged,
+                strings.intern(alert.resolution),
+                location.latitude,
+                location.longitude,
+                *(_datetime_parts(location.timestamp) if alert.location is not None else (_NO_TIME, 0)),
+                _to_column(location.temperature),
+                _to_column(location.humidity),
+                _to_column(location.pressure),
+                _to_column(location.shock_level)
+            )
+        
+        stats = bytearray(struct.pack("<I", len(self.product_stats)))
+        for product_id, product_stats in self.product_stats.items():
+            sensors = []
+            for name in ProductStats.SENSORS:
+                running = product_stats.sensors[name]
+                sensors += [running.count, running.mean, running.m2, running.minimum, running.maximum]
+            stats += _SNAPSHOT_STATS.pack(
+                strings.intern(product_id),
+                product_stats.readings,
+                product_stats.alerts,
+                product_stats.resolved_alerts,
+                product_stats.tracked_seconds,
+                _NO_TIME if product_stats.last_timestamp_us is None else product_stats.last_timestamp_us,
+                *(product_stats.last_out_of_range[name] for name in ProductStats.SENSORS),
+                *sensors,
+                *(product_stats.seconds_out_of_range[name] for name in ProductStats.SENSORS)
+            )
+        
+        meta = json.dumps({
+            "geofences": [
+                {"id": geofence.id, "polygon": geofence.polygon, "center": geofence.center, "radius_km": geofence.radius_km}
+                for geofence in self.geofences.values()
+            ],
+            "geofence_memberships": {product_id: list(members) for product_id, members in self.geofence_memberships.items()},
+            "planned_routes": {
+                product_id: {"waypoints": route.waypoints, "tolerance_km": route.tolerance_km}
+                for product_id, route in self.planned_routes.items()
+            },
+            "suppressed_alerts": self.suppressed_alerts
+        }).encode("utf-8")
+        
+        histories = [(strings.intern(product_id), history) for product_id, history in self.locations.items()]
+        trees = [(strings.intern(product_id), tree) for product_id, tree in self.history_trees.items()]
+        
+        file.write(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, 7))
+        _write_snapshot_section(file, b"STRS", strings.encode())
+        _write_snapshot_section(file, b"PROD", bytes(products))
+        _write_snapshot_section(file, b"ALRT", bytes(alerts))
+        _write_snapshot_section(file, b"STAT", bytes(stats))
+        _write_snapshot_section(file, b"META", meta)
+        
+        # Location columns are written straight from their arrays
+        column_sizes = [
+            [len(history) * array(typecode).itemsize for _, typecode in LocationHistory.COLUMNS]
+            for _, history in histories
+        ]
+        length = 8 + sum(
+            _SNAPSHOT_LOCATIONS.size + sum(size + _padding(size) for size in sizes)
+            for sizes in column_sizes
+        )
+        file.write(_SNAPSHOT_SECTION.pack(b"LOCS", 0, length))
+        file.write(struct.pack("<Q", len(histories)))
+        for (reference, history), sizes in zip(histories, column_sizes):
+            file.write(_SNAPSHOT_LOCATIONS.pack(reference, history._in_time_order, len(history)))
+            for (name, _), size in zip(LocationHistory.COLUMNS, sizes):
+                file.write(memoryview(getattr(history, name)).cast("B"))
+                file.write(b"\0" * _padding(size))
+        
+        # History tree levels are whole hashes, so already 8-byte aligned
+        length = 8 + sum(_SNAPSHOT_HISTORY_TREE.size + sum(len(level) for level in tree.levels) for _, tree in trees)
+        file.write(_SNAPSHOT_SECTION.pack(b"MMRS", 0, length))
+        file.write(struct.pack("<Q", len(trees)))
+        for reference, tree in trees:
+            file.write(_SNAPSHOT_HISTORY_TREE.pack(reference, tree.size))
+            for level in tree.levels:
+                file.write(level)
+        
+        return {
+            "products": len(self.products),
+            "readings": sum(len(history) for _, history in histories),
+            "alerts": len(self.alerts)
+        }
+    
+    def _read_snapshot(self, buffer: mmap.mmap) -> Dict[str, Any]:
+        """Restore contract state from a memory-mapped snapshot"""
+        view = memoryview(buffer)
+        magic, version, _, section_count = _SNAPSHOT_HEADER.unpack_from(view, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise Exception("Not a ChainAware snapshot")
+        if not 1 <= version <= SNAPSHOT_VERSION:
+            raise Exception(f"Unsupported snapshot version: {version}")
+        
+        sections: Dict[bytes, memoryview] = {}
+        offset = _SNAPSHOT_HEADER.size
+        for _ in range(section_count):
+            tag, _, length = _SNAPSHOT_SECTION.unpack_from(view, offset)
+            offset += _SNAPSHOT_SECTION.size
+            sections[tag] = view[offset:offset + length]
+            offset += length + _padding(length)
+        
+        self._clear_state()
+        self._snapshot_buffers.append(buffer)
+        strings = StringTable.decode(sections[b"STRS"])
+        
+        def string(reference: int) -> Optional[str]:
+            return None if reference == _NO_STRING else strings[reference]
+        
+        # Products and their secondary indexes
+        payload = sections[b"PROD"]
+        (count,) = struct.unpack_from("<I", payload, 0)
+        layout = _SNAPSHOT_PRODUCT if version >= 2 else _SNAPSHOT_PRODUCT_V1
+        for record in layout.iter_unpack(payload[4:4 + count * layout.size]):
+            self._store_product(ProductData(
+                id=string(record[0]),
+                name=string(record[1]),
+                category=string(record[2]),
+                origin=string(record[3]),
+                manufacturer=string(record[4]),
+                batch_number=string(record[5]),
+                specifications=json.loads(string(record[6])),
+                regulatory_codes=json.loads(string(record[7])),
+                sensors_config=json.loads(string(record[8])),
+                production_date=_datetime_from_parts(record[9], record[10]),
+                status=PRODUCT_STATUS_CODES[record[11]] if version >= 2 else ProductStatus.MANUFACTURED
+            ))
+        
+        # Alerts and their indexes; closed alerts re-enter retention in creation order
+        payload = sections[b"ALRT"]
+        (count,) = struct.unpack_from("<I", payload, 0)
+        for record in _SNAPSHOT_ALERT.iter_unpack(payload[4:4 + count * _SNAPSHOT_ALERT.size]):
+            timestamp = _datetime_from_parts(record[5], record[6])
+            alert = Alert(
+                id=string(record[0]),
+                type=ALERT_TYPE_CODES[record[1]],
+                level=RISK_LEVEL_CODES[record[2]],
+                message=string(record[3]),
+                product_id=string(record[4]),
+                timestamp=timestamp,
+                first_seen=_optional_datetime_from_parts(record[7], record[6]),
+                last_seen=_optional_datetime_from_parts(record[8], record[6]),
+                count=record[9],
+                acknowledged=bool(record[10]),
+                resolution=string(record[11]),
+                location=None if record[14] == _NO_TIME else LocationData(
+                    latitude=record[12],
+                    longitude=record[13],
+                    timestamp=_datetime_from_parts(record[14], record[15]),
+                    temperature=_from_column(record[16]),
+                    humidity=_from_column(record[17]),
+                    pressure=_from_column(record[18]),
+                    shock_level=_from_column(record[19])
+                )
+            )
+            self._index_alert(alert)
+            if not alert.is_open:
+                self.closed_alerts.append(alert.id)
+        
+        # Running statistics
+        payload = sections[b"STAT"]
+        (count,) = struct.unpack_from("<I", payload, 0)
+        for record in _SNAPSHOT_STATS.iter_unpack(payload[4:4 + count * _SNAPSHOT_STATS.size]):
+            product_stats = ProductStats()
+            product_stats.readings, product_stats.alerts, product_stats.resolved_alerts = record[1:4]
+            product_stats.tracked_seconds = record[4]
+            product_stats.last_timestamp_us = None if record[5] == _NO_TIME else record[5]
+            for position, name in enumerate(ProductStats.SENSORS):
+                product_stats.last_out_of_range[name] = bool(record[6 + position])
+                running = product_stats.sensors[name]
+                running.count, running.mean, running.m2, running.minimum, running.maximum = record[9 + position * 5:14 + position * 5]
+                product_stats.seconds_out_of_range[name] = record[24 + position]
+            self.product_stats[string(record[0])] = product_stats
+        
+        # Geofences, planned routes and suppression counters
+        meta = json.loads(str(sections[b"META"], "utf-8"))
+        for geofence in meta["geofences"]:
+            self.add_geofence(
+                geofence["id"],
+                polygon=[tuple(point) for point in geofence["polygon"]] if geofence["polygon"] else None,
+                center=tuple(geofence["center"]) if geofence["center"] else None,
+                radius_km=geofence["radius_km"]
+            )
+        self.geofence_memberships = {
+            product_id: dict.fromkeys(members) for product_id, members in meta["geofence_memberships"].items()
+        }
+        self.planned_routes = {
+            product_id: PlannedRoute([tuple(point) for point in route["waypoints"]], route["tolerance_km"])
+            for product_id, route in meta.get("planned_routes", {}).items()
+        }
+        self.suppressed_alerts = meta["suppressed_alerts"]
+        
+        # Location histories wrap the mapped columns without copying
+        payload = sections[b"LOCS"]
+        (count,) = struct.unpack_from("<Q", payload, 0)
+        offset = 8
+        readings = 0
+        for _ in range(count):
+            reference, in_time_order, rows = _SNAPSHOT_LOCATIONS.unpack_from(payload, offset)
+            offset += _SNAPSHOT_LOCATIONS.size
+            columns = {}
+            for name, typecode in LocationHistory.COLUMNS:
+                size = rows * array(typecode).itemsize
+                columns[name] = payload[offset:offset + size].cast(typecode)
+                offset += size + _padding(size)
+            history = LocationHistory.from_buffers(columns, bool(in_time_order))
+            product_id = string(reference)
+            self.locations[product_id] = history
+            if rows:
+                self.spatial_index.update(product_id, history.latitude[rows - 1], history.longitude[rows - 1])
+            readings += rows
+        
+        # History commitments; snapshots before version 3 rebuild them from the readings
+        if version >= 3:
+            payload = sections[b"MMRS"]
+            (count,) = struct.unpack_from("<Q", payload, 0)
+            offset = 8
+            for _ in range(count):
+                reference, size = _SNAPSHOT_HISTORY_TREE.unpack_from(payload, offset)
+                offset += _SNAPSHOT_HISTORY_TREE.size
+                levels = []
+                for height in range(size.bit_length()):
+                    length = (size >> height) * HASH_SIZE
+                    levels.append(payload[offset:offset + length])
+                    offset += length
+                self.history_trees[string(reference)] = MerkleMountainRange.from_buffers(levels, size)
+        else:
+            for product_id, history in self.locations.items():
+                tree = self.history_trees[product_id] = MerkleMountainRange()
+                for row in range(len(history)):
+                    tree.append(reading_leaf_hash(history.get(row)))
+        
+        return {"products": len(self.products), "readings": readings, "alerts": len(self.alerts)}
+    
+    async def _recover(self, directory: str) -> Dict[str, Any]:
+        """Load the latest checkpoint in directory and replay the log segments after it"""
+        checkpoints = WriteAheadLog.list_segments(directory, WAL_CHECKPOINT_PATTERN)
+        start = checkpoints[-1] if checkpoints else 0
+        segments = [segment for segment in WriteAheadLog.list_segments(directory) if segment >= start]
+        recovery = {"checkpoint": None, "segments": len(segments), "records": 0}
+        
+        if checkpoints:
+            recovery["checkpoint"] = WriteAheadLog.checkpoint_path(directory, start)
+            await self.load_snapshot(recovery["checkpoint"])
+        elif segments:
+            self._clear_state()
+        
+        self._replaying = True
+        try:
+            for segment in segments:
+                for record_type, payload in WriteAheadLog.read_segment(WriteAheadLog.segment_path(directory, segment)):
+                    await self._apply_wal_record(record_type, payload)
+                    recovery["records"] += 1
+        finally:
+            self._replaying = False
+        
+        recovery["products"] = len(self.products)
+        recovery["alerts"] = len(self.alerts)
+        return recovery
+    
+    async def _apply_wal_record(self, record_type: int, payload: bytes):
+        """Apply one logged mutation during recovery"""
+        if record_type == WAL_PRODUCT:
+            self._store_product(self._product_from_record(json.loads(payload)))
+        elif record_type == WAL_LOCATION:
+            (length,) = struct.unpack_from("<H", payload, 0)
+            product_id = payload[2:2 + length].decode("utf-8")
+            location = _location_from_record(_WAL_LOCATION.unpack_from(payload, 2 + length))
+            await self._store_location(product_id, location)
+        elif record_type == WAL_ALERT:
+            self._apply_alert_record(json.loads(payload))
+        else:
+            raise Exception(f"Unknown write-ahead log record type: {record_type}")
+    
+    def _apply_alert_record(self, record: Dict[str, Any]):
+        """Create or update an alert from its logged state"""
+        location = _location_from_record(tuple(record["location"])) if record["location"] is not None else None
+        level = RiskLevel(record["level"])
+        alert = self.alerts.get(record["id"])
+        if alert is None:
+            alert = Alert(
+                id=record["id"],
+                type=AlertType(record["type"]),
+                level=level,
+                message=record["message"],
+                location=location,
+                timestamp=datetime.fromisoformat(record["timestamp"]),
+                acknowledged=record["acknowledged"],
+                resolution=record["resolution"],
+                product_id=record["product_id"],
+                count=record["count"],
+                first_seen=_optional_fromisoformat(record["first_seen"]),
+                last_seen=_optional_fromisoformat(record["last_seen"])
+            )
+            self._add_alert(alert)
+            if not alert.is_open:
+                self._close_alert(alert)
+            return
+        
+        was_open = alert.is_open
+        if not alert.resolution and record["resolution"] and alert.product_id is not None:
+            self._get_product_stats(alert.product_id).resolved_alerts += 1
+        if level != alert.level:
+            del self.alerts_by_level[alert.level][alert.id]
+            self.alerts_by_level[level][alert.id] = alert
+            alert.level = level
+        alert.message = record["message"]
+        alert.location = location
+        alert.acknowledged = record["acknowledged"]
+        alert.resolution = record["resolution"]
+        alert.count = record["count"]
+        alert.last_seen = _optional_fromisoformat(record["last_seen"])
+        if was_open and not alert.is_open:
+            self._close_alert(alert)
+    
+    def _journal_product(self, product: ProductData):
+        """Log a product registration, unless durability is off or the log is being replayed"""
+        if self.wal is not None and not self._replaying:
+            self.wal.append(WAL_PRODUCT, json.dumps(self._product_record(product)).encode("utf-8"))
+    
+    def _journal_location(self, product_id: str, location: LocationData):
+        """Log a reading as a length-prefixed product ID followed by the binary row"""
+        if self.wal is None or self._replaying:
+            return
+        encoded = product_id.encode("utf-8")
+        self.wal.append(WAL_LOCATION, struct.pack("<H", len(encoded)) + encoded
+                        + _WAL_LOCATION.pack(*_location_to_record(location)))
+    
+    def _journal_alert(self, alert: Alert):
+        """Log the full current state of a new or changed alert"""
+        if self.wal is None or self._replaying:
+            return
+        record = {
+            "id": alert.id,
+            "type": alert.type.value,
+            "level": alert.level.value,
+            "message": alert.message,
+            "location": _location_to_record(alert.location) if alert.location is not None else None,
+            "timestamp": alert.timestamp.isoformat(),
+            "acknowledged": alert.acknowledged,
+            "resolution": alert.resolution,
+            "product_id": alert.product_id,
+            "count": alert.count,
+            "first_seen": _optional_isoformat(alert.first_seen),
+            "last_seen": _optional_isoformat(alert.last_seen)
+        }
+        self.wal.append(WAL_ALERT, json.dumps(record).encode("utf-8"))
+    
+    def _product_record(self, product: ProductData) -> Dict[str, Any]:
+        record = {field.name: getattr(product, field.name) for field in dataclass_fields(ProductData)}
+        record["production_date"] = product.production_date.isoformat()
+        record["status"] = product.status.value
+        return record
+    
+    def _product_from_record(self, record: Dict[str, Any]) -> ProductData:
+        record = dict(record)
+        record["production_date"] = datetime.fromisoformat(record["production_date"])
+        record["status"] = ProductStatus(record["status"])
+        return ProductData(**record)
+    
+    async def _checkpoint_periodically(self, interval: float):
+        """Background task taking a checkpoint every interval seconds"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.checkpoint()
+            except Exception as e:
+                self.checkpoint_failures += 1
+                self.last_checkpoint_error = str(e)
+                await self._log_event("CHECKPOINT_ERROR", {"error": str(e)})
+    
+    async def _store_snapshot(self, path: str, buffer: SnapshotBuffer, summary: Dict[str, Any]) -> Dict[str, Any]:
+        """Write a serialized snapshot to path from a thread"""
+        await asyncio.to_thread(buffer.save, path)
+        summary["path"] = path
+        summary["bytes"] = buffer.size
+        return summary
+    
+    def _clear_state(self):
+        """Reset all products, readings, alerts and the structures derived from them"""
+        self.products: Dict[str, ProductData] = {}
+        self.product_index = ProductIndex()
+        self.locations: Dict[str, LocationHistory] = {}
+        self.history_trees: Dict[str, MerkleMountainRange] = {}
+        self.spatial_index = SpatialIndex()
+        self.geofences: Dict[str, Geofence] = {}
+        self.geofence_cells = SpatialIndex()
+        self.geofence_memberships: Dict[str, Dict[str, None]] = {}
+        self.planned_routes: Dict[str, PlannedRoute] = {}
+        self.product_stats: Dict[str, ProductStats] = {}
+        self.anomaly_detectors: Dict[str, Dict[str, SensorAnomalyDetector]] = {}
+        self.alerts: Dict[str, Alert] = {}
+        self.alerts_by_product: Dict[str, Dict[str, Alert]] = {}
+        self.alerts_by_level: Dict[RiskLevel, Dict[str, Alert]] = {level: {} for level in RiskLevel}
+        self.open_alerts: Dict[Tuple[str, AlertType], Alert] = {}
+        self.closed_alerts: deque = deque()
+        self.suppressed_alerts: Dict[str, int] = {}
+        self._recent_alert_times: Dict[str, deque] = {}
+        self._snapshot_buffers: List[mmap.mmap] = []
+        self.query_cache = TTLCache(max_entries=1024)
+        self._query_matcher = build_query_matcher()
+        self._query_matcher_version = self.product_index.vocabulary_version
+    
+    def _build_product(self, product_id: str, product_data: Dict[str, Any]) -> ProductData:
+        """Build a ProductData from validated registration data"""
+        return ProductData(
+            id=product_id,
+            name=product_data["name"],
+            category=product_data["category"],
+            origin=product_data["origin"],
+            manufacturer=product_data["manufacturer"],
+            production_date=datetime.fromisoformat(product_data["production_date"]),
+            batch_number=product_data["batch_number"],
+            specifications=product_data.get("specifications", {}),
+            regulatory_codes=product_data.get("regulatory_codes", []),
+            sensors_config=product_data.get("sensors_config", {})
+        )
+    
+    def _store_product(self, product: ProductData):
+        """Store a registered product and keep the secondary indexes current"""
+        previous = self.products.get(product.id)
+        if previous is not None:
+            self.product_index.remove(previous)
+        self.products[product.id] = product
+        self.product_index.add(product)
+    
+    def _matching_product_ids(self, filters: Dict[str, Optional[str]],
+                              produced_after: Optional[Union[datetime, str]] = None,
+                              produced_before: Optional[Union[datetime, str]] = None) -> Iterable[str]:
+        """Lazily resolve product IDs matching equality filters and a production date range"""
+        if isinstance(produced_after, str):
+            produced_after = datetime.fromisoformat(produced_after)
+        if isinstance(produced_before, str):
+            produced_before = datetime.fromisoformat(produced_before)
+        
+        equality = {field: value for field, value in filters.items() if value is not None}
+        date_filtered = produced_after is not None or produced_before is not None
+        
+        if equality:
+            # Drive from the smallest index entry and probe the others
+            buckets = sorted((self.product_index.lookup(field, value) for field, value in equality.items()), key=len)
+            candidates = (product_id for product_id in buckets[0] if all(product_id in bucket for bucket in buckets[1:]))
+            if date_filtered:
+                low = _epoch_us(produced_after) if produced_after is not None else -math.inf
+                high = _epoch_us(produced_before) if produced_before is not None else math.inf
+                candidates = (
+                    product_id for product_id in candidates
+                    if low <= _epoch_us(self.products[product_id].production_date) <= high
+                )
+            return candidates
+        if date_filtered:
+            return self.product_index.produced_between(produced_after, produced_before)
+        return iter(self.products)
+    
+    def _product_to_dict(self, product: ProductData, fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Serialize a product, optionally projecting only the given fields"""
+        if fields is None:
+            fields = PRODUCT_SUMMARY_FIELDS
+        result = {}
+        for field in fields:
+            if field not in PRODUCT_FIELDS:
+                raise Exception(f"Unknown product field: {field}")
+            value = getattr(product, field)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            elif isinstance(value, Enum):
+                value = value.value
+            result[field] = value
+        return result
+    
+    async def _register_product_batch(self, batch: List[Dict[str, Any]], offset: int) -> List[Dict[str, Any]]:
+        """Validate, deduplicate and store one batch of register_products_bulk"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(batch)
+        accepted: List[Tuple[int, ProductData]] = []
+        batch_ids = set()
+        
+        # Validate records and reject duplicate IDs
+        for position, product_data in enumerate(batch):
+            index = offset + position
+            product_id = None
+            try:
+                validation_result = await self._validate_product_data(product_data)
+                if not validation_result["valid"]:
+                    raise Exception(f"Product validation failed: {validation_result['errors']}")
+                product_id = self._generate_product_id(product_data)
+                if product_id in self.products:
+                    raise Exception(f"Duplicate product ID: {product_id} is already registered")
+                if product_id in batch_ids:
+                    raise Exception(f"Duplicate product ID: {product_id} appears earlier in the batch")
+                product = self._build_product(product_id, product_data)
+            except KeyError as e:
+                results[position] = self._bulk_error(index, product_id, f"Missing required field: {e.args[0]}")
+                continue
+            except Exception as e:
+                results[position] = self._bulk_error(index, product_id, str(e))
+                continue
+            batch_ids.add(product_id)
+            accepted.append((position, product))
+        
+        # Verify each distinct (code, category) pair once for the whole batch
+        pairs = list({(code, product.category) for _, product in accepted for code in product.regulatory_codes})
+        verdicts = dict(zip(pairs, await asyncio.gather(*(
+            self._is_regulatory_compliant(code, category) for code, category in pairs
+        ))))
+        
+        # Store products and report compliance
+        non_compliant = 0
+        for position, product in accepted:
+            self._store_product(product)
+            self._journal_product(product)
+            compliance_check = self._compliance_report(
+                product.regulatory_codes,
+                (verdicts[(code, product.category)] for code in product.regulatory_codes)
+            )
+            if not compliance_check["overall_compliant"]:
+                non_compliant += 1
+            await self._assess_initial_risks(product.id)
+            results[position] = {
+                "index": offset + position,
+                "product_id": product.id,
+                "success": True,
+                "compliance": compliance_check
             }
-        elif "alert" in query_lower or "warning" in query_lower:
-            return {
-                "type": "ALERT_QUERY",
-                "parameters": {"query": query}
+        
+        # Log a single summary event for the batch
+        await self._log_event("PRODUCTS_BULK_REGISTERED", {
+            "received": len(batch),
+            "registered": len(accepted),
+            "failed": len(batch) - len(accepted),
+            "non_compliant": non_compliant,
+            "regulatory_checks": len(pairs)
+        })
+        
+        return results
+    
+    def _parse_location_data(self, location_data: Dict[str, Any]) -> LocationData:
+        """Build a LocationData from a raw IoT reading, validating its numeric fields"""
+        latitude = self._parse_reading_number(location_data, "latitude", required=True)
+        longitude = self._parse_reading_number(location_data, "longitude", required=True)
+        if not -90.0 <= latitude <= 90.0 or not -180.0 <= longitude <= 180.0:
+            raise Exception("Coordinates out of range")
+        return LocationData(
+            latitude=latitude,
+            longitude=longitude,
+            timestamp=datetime.fromisoformat(location_data["timestamp"]),
+            temperature=self._parse_reading_number(location_data, "temperature"),
+            humidity=self._parse_reading_number(location_data, "humidity"),
+            pressure=self._parse_reading_number(location_data, "pressure"),
+            shock_level=self._parse_reading_number(location_data, "shock_level")
+        )
+    
+    def _parse_reading_number(self, location_data: Dict[str, Any], field: str, required: bool = False) -> Optional[float]:
+        """A finite numeric reading field as float; None when an optional field is absent"""
+        value = location_data[field] if required else location_data.get(field)
+        if value is None and not required:
+            return None
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise Exception(f"Invalid location field: {field}")
+        return float(value)
+    
+    async def _record_location(self, product_id: str, location: LocationData,
+                               risk_assessment: Optional[RiskPrediction] = None) -> Tuple[RiskPrediction, Optional[Alert]]:
+        """Store a parsed reading, analyze its risks and raise an alert if needed"""
+        # Store location data
+        await self._store_location(product_id, location)
+        
+        # Compare the reading against the planned route corridor
+        route = self.planned_routes.get(product_id)
+        if route is not None:
+            await self._check_route(product_id, route, location)
+        
+        # AI-powered analysis of current conditions, unless already batch-scored
+        if risk_assessment is None:
+            risk_assessment = await self._analyze_current_risks(product_id, location)
+        
+        # Streaming drift/spike detection on top of the fixed thresholds
+        if self.anomaly_detection_enabled:
+            anomalies = self._detect_anomalies(product_id, location)
+            if anomalies:
+                risk_assessment.factors.extend(anomalies)
+                if risk_assessment.level == RiskLevel.LOW:
+                    risk_assessment.level = RiskLevel.MEDIUM
+                    risk_assessment.recommendation = CURRENT_RISK_RECOMMENDATIONS[RiskLevel.MEDIUM]
+        
+        # Generate intelligent alerts if needed
+        alert = None
+        if risk_assessment.level in [RiskLevel.HIGH, RiskLevel.CRITICAL]:
+            alert_type = AlertType.QUALITY_RISK
+            if risk_assessment.factors:
+                alert_type = FACTOR_ALERT_TYPES.get(risk_assessment.factors[0], AlertType.QUALITY_RISK)
+            alert = await self._raise_alert(
+                product_id,
+                alert_type,
+                risk_assessment.level,
+                f"Risk detected for {product_id}: {risk_assessment.recommendation}",
+                location
+            )
+        
+        return risk_assessment, alert
+    
+    async def _store_location(self, product_id: str, location: LocationData):
+        """Store a reading and update the indexes, statistics and geofence memberships derived from it"""
+        started = time.perf_counter()
+        if product_id not in self.locations:
+            self.locations[product_id] = LocationHistory()
+        self.locations[product_id].append(location)
+        self._journal_location(product_id, location)
+        if product_id not in self.history_trees:
+            self.history_trees[product_id] = MerkleMountainRange()
+        self.history_trees[product_id].append(reading_leaf_hash(location))
+        self.spatial_index.update(product_id, location.latitude, location.longitude)
+        self._get_product_stats(product_id).add_reading(
+            _epoch_us(location.timestamp), location.temperature, location.humidity, location.shock_level
+        )
+        if self.geofences or product_id in self.geofence_memberships:
+            await self._check_geofences(product_id, location)
+        timers = self._stage_timers
+        if timers is not None:
+            timers["store_location"].observe(time.perf_counter() - started)
+            self.metrics.increment("readings_ingested_total")
+    
+    async def _raise_alert(self, product_id: str, alert_type: AlertType, level: RiskLevel, message: str,
+                           location: Optional[LocationData], rate_limited: bool = True) -> Optional[Alert]:
+        """
+        Raise an alert, coalescing repeats into the open alert of the same type.
+        
+        Repeats bump count and last_seen, and escalate the level if worse.
+        New alerts are subject to the product's rate limit; suppressed ones
+        are counted in suppressed_alerts and None is returned.
+        """
+        started = time.perf_counter()
+        alert = self._put_alert(product_id, alert_type, level, message, location, rate_limited)
+        timers = self._stage_timers
+        if timers is not None:
+            timers["alert_creation"].observe(time.perf_counter() - started)
+            self._count_alert(alert)
+        return alert
+    
+    def _put_alert(self, product_id: str, alert_type: AlertType, level: RiskLevel, message: str,
+                   location: Optional[LocationData], rate_limited: bool) -> Optional[Alert]:
+        """Coalesce into the open alert of the same type or add a new one, subject to the rate limit"""
+        now = datetime.now(timezone.utc)
+        key = (product_id, alert_type)
+        
+        existing = self.open_alerts.get(key)
+        if existing is not None:
+            existing.count += 1
+            existing.last_seen = now
+            existing.location = location
+            if RISK_LEVEL_CODES.index(level) > RISK_LEVEL_CODES.index(existing.level):
+                del self.alerts_by_level[existing.level][existing.id]
+                existing.level = level
+                existing.message = message
+                self.alerts_by_level[level][existing.id] = existing
+            self._journal_alert(existing)
+            return existing
+        
+        if rate_limited and not self._allow_new_alert(product_id):
+            self.suppressed_alerts[product_id] = self.suppressed_alerts.get(product_id, 0) + 1
+            return None
+        
+        alert = Alert(
+            id=self._generate_alert_id(),
+            type=alert_type,
+            level=level,
+            message=message,
+            location=location,
+            timestamp=now,
+            product_id=product_id,
+            first_seen=now,
+            last_seen=now
+        )
+        self._add_alert(alert)
+        self._journal_alert(alert)
+        return alert
+    
+    def _allow_new_alert(self, product_id: str) -> bool:
+        """Sliding-window rate limit on new alerts per product"""
+        limit = self.alert_rate_limits.get(product_id, self.alert_rate_limit)
+        if limit is None:
+            return True
+        max_alerts, window_seconds = limit
+        if max_alerts < 1:
+            return False
+        now = time.monotonic()
+        recent = self._recent_alert_times.get(product_id)
+        if recent is None or recent.maxlen != max_alerts:
+            recent = self._recent_alert_times[product_id] = deque(recent or (), maxlen=max_alerts)
+        if len(recent) >= max_alerts and now - recent[0] < window_seconds:
+            return False
+        recent.append(now)
+        return True
+    
+    def _close_alert(self, alert: Alert):
+        """Move an alert that just became closed into bounded retention"""
+        key = (alert.product_id, alert.type)
+        if self.open_alerts.get(key) is alert:
+            del self.open_alerts[key]
+        self.closed_alerts.append(alert.id)
+        while len(self.closed_alerts) > self.max_closed_alerts:
+            self._evict_alert(self.closed_alerts.popleft())
+    
+    def _evict_alert(self, alert_id: str):
+        """Forget a closed alert; per-product statistics keep counting it"""
+        alert = self.alerts.pop(alert_id, None)
+        if alert is None:
+            return
+        self.alerts_by_level[alert.level].pop(alert_id, None)
+        product_alerts = self.alerts_by_product.get(alert.product_id)
+        if product_alerts is not None:
+            product_alerts.pop(alert_id, None)
+            if not product_alerts:
+                del self.alerts_by_product[alert.product_id]
+    
+    async def _check_route(self, product_id: str, route: PlannedRoute, location: LocationData):
+        """Raise a ROUTE_DEVIATION alert when a reading lies outside the planned route corridor"""
+        started = time.perf_counter()
+        segment = route.find_within(location.latitude, location.longitude, route.tolerance_km, route.last_segment)
+        if segment is not None:
+            route.last_segment = segment
+        else:
+            # Only an off-route reading needs its exact distance, for the alert level and text
+            distance, route.last_segment, _ = route.nearest(location.latitude, location.longitude, route.last_segment)
+            level = RiskLevel.HIGH if distance > 2 * route.tolerance_km else RiskLevel.MEDIUM
+            await self._raise_alert(
+                product_id,
+                AlertType.ROUTE_DEVIATION,
+                level,
+                f"{product_id} is {distance:.1f} km off its planned route (tolerance {route.tolerance_km:g} km)",
+                location
+            )
+        timers = self._stage_timers
+        if timers is not None:
+            timers["route_check"].observe(time.perf_counter() - started)
+    
+    async def _check_geofences(self, product_id: str, location: LocationData):
+        """Log geofence enter/exit transitions caused by a new reading"""
+        previous = self.geofence_memberships.get(product_id, {})
+        candidates = self.geofence_cells.keys_at(location.latitude, location.longitude) | previous.keys()
+        current = {
+            geofence_id: None
+            for geofence_id in candidates
+            if geofence_id in self.geofences and self.geofences[geofence_id].contains(location.latitude, location.longitude)
+        }
+        
+        for geofence_id in current.keys() - previous.keys():
+            await self._log_event("GEOFENCE_ENTERED", {"product_id": product_id, "geofence_id": geofence_id})
+        for geofence_id in previous.keys() - current.keys():
+            await self._log_event("GEOFENCE_EXITED", {"product_id": product_id, "geofence_id": geofence_id})
+        
+        if current:
+            self.geofence_memberships[product_id] = current
+        else:
+            self.geofence_memberships.pop(product_id, None)
+    
+    def _position_entry(self, product_id: str, distance_km: Optional[float] = None) -> Dict[str, Any]:
+        """Latest position of a product as reported by spatial queries"""
+        latitude, longitude = self.spatial_index.position(product_id)
+        entry = {"product_id": product_id, "latitude": latitude, "longitude": longitude}
+        if distance_km is not None:
+            entry["distance_km"] = distance_km
+        return entry
+    
+    def _select_location_history(self, history: LocationHistory, since: Optional[Union[datetime, str]],
+                                 until: Optional[Union[datetime, str]], limit: Optional[int], cursor: Optional[str],
+                                 downsample: Optional[str], every: int, bucket_seconds: float,
+                                 tolerance_km: float) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Range-select, downsample and paginate a location history"""
+        if limit is not None and limit < 1:
+            raise Exception("limit must be at least 1")
+        if isinstance(since, str):
+            since = datetime.fromisoformat(since)
+        if isinstance(until, str):
+            until = datetime.fromisoformat(until)
+        rows = history.rows_between(since, until)
+        
+        if downsample is None:
+            selected = rows
+        elif downsample == "nth":
+            selected = rows[::max(1, every)]
+        elif downsample == "douglas_peucker":
+            selected = history.simplify(rows, tolerance_km)
+        elif downsample == "bucket":
+            selected = history.bucket_summaries(rows, bucket_seconds)
+        else:
+            raise Exception(f"Unknown downsampling mode: {downsample}")
+        
+        offset = _cursor_offset(cursor)
+        end = len(selected) if limit is None else min(len(selected), offset + limit)
+        page = selected[offset:end]
+        next_cursor = str(end) if end < len(selected) else None
+        
+        if downsample == "bucket":
+            return list(page), next_cursor
+        return [history.to_dict(row) for row in page], next_cursor
+    
+    def _add_alert(self, alert: Alert):
+        """Store a new alert and count it in the product statistics"""
+        self._index_alert(alert)
+        if alert.product_id is not None:
+            stats = self._get_product_stats(alert.product_id)
+            stats.alerts += 1
+            if alert.resolution:
+                stats.resolved_alerts += 1
+    
+    def _index_alert(self, alert: Alert):
+        """Store an alert and keep the product, severity and open-alert indexes current"""
+        self.alerts[alert.id] = alert
+        if alert.is_open:
+            self.open_alerts[(alert.product_id, alert.type)] = alert
+        if alert.product_id is not None:
+            self.alerts_by_product.setdefault(alert.product_id, {})[alert.id] = alert
+        self.alerts_by_level[alert.level][alert.id] = alert
+    
+    def _detect_anomalies(self, product_id: str, location: LocationData) -> List[str]:
+        """Update the product's sensor detectors and return any anomaly factors"""
+        started = time.perf_counter()
+        detectors = self.anomaly_detectors.get(product_id)
+        if detectors is None:
+            detectors = self.anomaly_detectors[product_id] = {
+                sensor: SensorAnomalyDetector(noise_floor, **self.anomaly_parameters)
+                for sensor, (_, noise_floor) in ANOMALY_SENSORS.items()
             }
         
-        return {"type": "GENERAL_QUERY", "parameters": {"query": query}}
+        factors = []
+        for sensor, (prefix, _) in ANOMALY_SENSORS.items():
+            value = getattr(location, sensor)
+            if value is None:
+                continue
+            anomaly = detectors[sensor].update(value)
+            if anomaly:
+                factors.append(f"{prefix}_{anomaly}")
+        timers = self._stage_timers
+        if timers is not None:
+            timers["anomaly_detection"].observe(time.perf_counter() - started)
+        return factors
+    
+    def _alert_to_dict(self, alert: Alert) -> Dict[str, Any]:
+        """Serialize an alert for traceability responses"""
+        return {
+            "id": alert.id,
+            "type": alert.type.value,
+            "level": alert.level.value,
+            "message": alert.message,
+            "timestamp": alert.timestamp.isoformat(),
+            "acknowledged": alert.acknowledged,
+            "count": alert.count,
+            "last_seen": alert.last_seen.isoformat() if alert.last_seen else None
+        }
+    
+    def _export_alert(self, alert: Alert) -> Dict[str, Any]:
+        """Alert columns of an export row"""
+        return {
+            "alert_id": alert.id,
+            "alert_type": alert.type.value,
+            "level": alert.level.value,
+            "message": alert.message,
+            "timestamp": alert.timestamp.isoformat(),
+            "acknowledged": alert.acknowledged,
+            "resolution": alert.resolution,
+            "count": alert.count,
+            "last_seen": _optional_isoformat(alert.last_seen)
+        }
+    
+    def _get_product_stats(self, product_id: str) -> ProductStats:
+        """Running statistics of a product, created on first use"""
+        stats = self.product_stats.get(product_id)
+        if stats is None:
+            stats = self.product_stats[product_id] = ProductStats()
+        return stats
+    
+    def _get_product_alerts(self, product_id: str) -> List[Alert]:
+        """Alerts raised for a product, in creation order"""
+        return list(self.alerts_by_product.get(product_id, {}).values())
+    
+    def _bulk_error(self, index: int, key: Optional[str], error: str) -> Dict[str, Any]:
+        """Build a per-item failure entry for bulk operations"""
+        return {"index": index, "product_id": key, "success": False, "error": error}
     
-    # Utility methods
     def _generate_product_id(self, data: Dict[str, Any]) -> str:
         """Generate unique product ID"""
         content = f"{data['name']}{data['batch_number']}{data['production_date']}"
@@ -534,8 +4530,8 @@ class ChainAwareTraceability:
     
     async def _get_latest_location(self, product_id: str) -> Optional[LocationData]:
         """Get most recent location for product"""
-        locations = self.locations.get(product_id, [])
-        return locations[-1] if locations else None
+        history = self.locations.get(product_id)
+        return history.latest() if history else None
     
     async def _calculate_traceability_score(self, product_id: str) -> float:
         """Calculate overall traceability score"""
@@ -555,17 +4551,15 @@ class ChainAwareTraceability:
             score += 15.0
         
         # Location tracking completeness
-        location_count = len(self.locations.get(product_id, []))
-        if location_count > 0:
-            score += min(30.0, location_count * 2.0)  # Max 30 points for tracking
+        stats = self._get_product_stats(product_id)
+        if stats.readings > 0:
+            score += min(30.0, stats.readings * 2.0)  # Max 30 points for tracking
         
         # Alert response
-        product_alerts = [alert for alert in self.alerts if alert.id.startswith(product_id)]
-        if not product_alerts:
+        if not stats.alerts:
             score += 20.0  # Bonus for no alerts
         else:
-            resolved_alerts = sum(1 for alert in product_alerts if alert.resolution)
-            score += (resolved_alerts / len(product_alerts)) * 20.0
+            score += (stats.resolved_alerts / stats.alerts) * 20.0
         
         return min(score, max_score)
     
@@ -584,7 +4578,7 @@ class ChainAwareTraceability:
     
     async def _validate_regulatory_code(self, code: str) -> bool:
         """Validate regulatory code format"""
-        return bool(re.match(r'^[A-Z0-9-]+$', code))
+        return bool(REGULATORY_CODE_PATTERN.match(code))
     
     async def _analyze_document_fraud_risk(self, document: Dict[str, Any]) -> float:
         """Analyze document for fraud risk"""
@@ -615,24 +4609,138 @@ class ChainAwareTraceability:
     
     async def _analyze_historical_patterns(self, product_id: str) -> List[str]:
         """Analyze historical risk patterns"""
-        return []  # Simplified for demo
+        started = time.perf_counter()
+        risks = []
+        stats = self.product_stats.get(product_id)
+        if stats is not None:
+            risks = [
+                factor for sensor, factor in HISTORICAL_RISK_FACTORS.items()
+                if stats.out_of_range_ratio(sensor) > HISTORICAL_EXCURSION_RATIO
+            ]
+            if stats.alerts > stats.resolved_alerts:
+                risks.append("unresolved_alerts")
+        timers = self._stage_timers
+        if timers is not None:
+            timers["historical_analysis"].observe(time.perf_counter() - started)
+        return risks
+    
+    def _instrument(self, name: str):
+        """Shadow one public method on this instance with a timing wrapper"""
+        function = getattr(type(self), name).__get__(self, type(self))
+        metrics = self.metrics
+        clock = time.perf_counter
+        observe = metrics.histogram("method_duration_seconds", (("method", name),)).observe
+        error_labels = (("method", name),)
+        
+        @functools.wraps(function)
+        async def timed(*args, **kwargs):
+            started = clock()
+            try:
+                return await function(*args, **kwargs)
+            except Exception:
+                metrics.increment("method_errors_total", error_labels)
+                raise
+            finally:
+                observe(clock() - started)
+        
+        setattr(self, name, timed)
+    
+    def _count_alert(self, alert: Optional[Alert]):
+        if alert is None:
+            self.metrics.increment("alerts_suppressed_total")
+        elif alert.count == 1:
+            self.metrics.increment("alerts_raised_total")
+        else:
+            self.metrics.increment("alerts_coalesced_total")
+    
+    def _metric_caches(self) -> Iterable[Tuple[str, TTLCache]]:
+        return (
+            ("external", self.external_cache),
+            ("regulatory_format", self.regulatory_format_cache),
+            ("regulatory_compliance", self.regulatory_compliance_cache),
+            ("query", self.query_cache)
+        )
     
     async def _log_event(self, event_type: str, data: Dict[str, Any]):
         """Log system events"""
-        print(f"ChainAware Event: {event_type} - {json.dumps(data)}")
+        if self._replaying:
+            return
+        started = time.perf_counter()
+        await self.event_log.emit(event_type, data)
+        timers = self._stage_timers
+        if timers is not None:
+            timers["log_event"].observe(time.perf_counter() - started)
     
     async def _search_products(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """Search products based on criteria"""
-        return {"products": list(self.products.values()), "count": len(self.products)}
+        if parameters.get("product_ids"):
+            products = [
+                self._product_to_dict(self.products[product_id], parameters.get("fields"))
+                for product_id in parameters["product_ids"] if product_id in self.products
+            ]
+            return {"products": products, "count": len(products), "next_cursor": None}
+        filters = {key: parameters[key] for key in SEARCH_FILTERS if parameters.get(key) is not None}
+        return await self.search_products(
+            **filters,
+            fields=parameters.get("fields"),
+            limit=parameters.get("limit", 50),
+            cursor=parameters.get("cursor")
+        )
     
     async def _get_risk_information(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """Get risk-related information"""
-        return {"risks": [alert for alert in self.alerts if alert.level in [RiskLevel.HIGH, RiskLevel.CRITICAL]]}
+        risks, total = self._select_alerts(parameters, parameters.get("risk_levels") or [RiskLevel.HIGH, RiskLevel.CRITICAL])
+        return {"risks": risks, "count": len(risks), "total": total}
     
     async def _get_location_information(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """Get location information"""
-        return {"locations": self.locations}
+        if parameters.get("latitude") is not None and parameters.get("longitude") is not None:
+            if parameters.get("radius_km") is not None:
+                locations = await self.find_products_within_radius(
+                    parameters["latitude"], parameters["longitude"], parameters["radius_km"], parameters.get("limit")
+                )
+            else:
+                locations = await self.find_nearest_products(
+                    parameters["latitude"], parameters["longitude"], parameters.get("limit", 10)
+                )
+            return {"locations": locations, "count": len(locations)}
+        
+        product_ids = self._query_product_ids(parameters)
+        positions = self.spatial_index.positions
+        located = (product_id for product_id in (positions if product_ids is None else product_ids) if product_id in positions)
+        locations = [self._position_entry(product_id) for product_id in islice(located, parameters.get("limit", 100))]
+        return {"locations": locations, "count": len(locations)}
     
     async def _get_alert_information(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """Get alert information"""
-        return {"alerts": self.alerts, "count": len(self.alerts)}
\ No newline at end of file
+        alerts, total = self._select_alerts(parameters, parameters.get("risk_levels"))
+        return {"alerts": alerts, "count": len(alerts), "total": total}
+    
+    def _query_product_ids(self, parameters: Dict[str, Any]) -> Optional[Iterable[str]]:
+        """Products a query is about, from explicit IDs or a manufacturer; None means all"""
+        if parameters.get("product_ids"):
+            return parameters["product_ids"]
+        if parameters.get("manufacturer") is not None:
+            return self.product_index.lookup("manufacturer", parameters["manufacturer"])
+        return None
+    
+    def _select_alerts(self, parameters: Dict[str, Any],
+                       levels: Optional[Sequence[RiskLevel]]) -> Tuple[List[Dict[str, Any]], int]:
+        """Newest alerts matching a query's products, levels and time range, and the number matching"""
+        product_ids = self._query_product_ids(parameters)
+        if product_ids is not None:
+            candidates = (alert for product_id in product_ids for alert in self.alerts_by_product.get(product_id, {}).values())
+        elif levels:
+            candidates = (alert for level in levels for alert in self.alerts_by_level[level].values())
+        else:
+            candidates = iter(self.alerts.values())
+        
+        since, until = parameters.get("since"), parameters.get("until")
+        low = _epoch_us(since) if since is not None else -math.inf
+        high = _epoch_us(until) if until is not None else math.inf
+        matches = [
+            alert for alert in candidates
+            if (not levels or alert.level in levels) and low <= _epoch_us(alert.timestamp) <= high
+        ]
+        newest = heapq.nlargest(parameters.get("limit", 50), matches, key=lambda alert: _epoch_us(alert.timestamp))
+        return [{**self._alert_to_dict(alert), "product_id": alert.product_id} for alert in newest], len(matches)
@@ -0,0 +1,19 @@
+"""
+Shared fixtures for the ChainAware test suite.
+
+The contract is imported with a local stand-in for the `genlayer` module,
+as in the benchmark suite, so the tests run with plain CPython.
+"""
+
+import os
+import sys
+import types
+
+# Stand-in for the GenLayer runtime; only the contract decorator is needed
+if "genlayer" not in sys.modules:
+    genlayer = types.ModuleType("genlayer")
+    genlayer.intelligent_contract = lambda cls: cls
+    genlayer.__all__ = ["intelligent_contract"]
+    sys.modules["genlayer"] = genlayer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
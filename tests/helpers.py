@@ -0,0 +1,56 @@
+"""Data builders and async helpers shared by the tests"""
+
+import asyncio
+import functools
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict
+
+from chainaware_traceability import ChainAwareTraceability, NullEventSink
+
+START_TIME = datetime(2024, 1, 1)
+
+def product_data(index: int) -> Dict[str, Any]:
+    return {
+        "name": f"Product {index}",
+        "category": "food",
+        "origin": "ES",
+        "manufacturer": f"Manufacturer {index % 3}",
+        "production_date": (START_TIME + timedelta(minutes=index)).isoformat(),
+        "batch_number": f"B{index % 5:04d}",
+        "specifications": {"weight_kg": 1.5},
+        "regulatory_codes": ["FDA-21-CFR-11"]
+    }
+
+def reading(index: int, **overrides: Any) -> Dict[str, Any]:
+    data = {
+        "latitude": 40.0 + index * 0.001,
+        "longitude": -3.7 + index * 0.001,
+        "timestamp": (START_TIME + timedelta(seconds=index)).isoformat(),
+        "temperature": 4.0,
+        "humidity": 55.0,
+        "shock_level": 1.0
+    }
+    data.update(overrides)
+    return data
+
+async def new_contract() -> ChainAwareTraceability:
+    contract = ChainAwareTraceability()
+    await contract.configure_event_sink(NullEventSink())
+    return contract
+
+@asynccontextmanager
+async def running_contract() -> AsyncIterator[ChainAwareTraceability]:
+    """A fresh contract that is shut down when the block exits"""
+    contract = await new_contract()
+    try:
+        yield contract
+    finally:
+        await contract.shutdown()
+
+def async_test(function: Callable[..., Awaitable[Any]]) -> Callable[..., Any]:
+    """Run an async test function on a new event loop; fixtures and parametrize still apply"""
+    @functools.wraps(function)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return asyncio.run(function(*args, **kwargs))
+    return wrapper
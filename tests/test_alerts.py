@@ -0,0 +1,83 @@
+import pytest
+
+from chainaware_traceability import RiskLevel
+
+from helpers import async_test, product_data, reading, running_contract
+
+@async_test
+async def test_zero_rate_limit_suppresses_new_alerts():
+    async with running_contract() as contract:
+        product_id = await contract.register_product(product_data(0))
+        contract.set_alert_rate_limit(product_id, 0)
+        await contract.update_location(product_id, reading(0, temperature=45.0, shock_level=9.0))
+    assert not contract.alerts
+    assert contract.suppressed_alerts[product_id] == 1
+
+@async_test
+async def test_negative_rate_limit_is_rejected():
+    async with running_contract() as contract:
+        product_id = await contract.register_product(product_data(0))
+        with pytest.raises(Exception, match="must not be negative"):
+            contract.set_alert_rate_limit(product_id, -1)
+        with pytest.raises(Exception, match="must not be negative"):
+            contract.configure_alert_policy(rate_limit=(-1, 60.0))
+
+@async_test
+async def test_alert_indexes_follow_update_location():
+    async with running_contract() as contract:
+        hot, calm = [await contract.register_product(product_data(index)) for index in range(2)]
+        await contract.update_location(hot, reading(0, temperature=45.0, humidity=90.0))
+        await contract.update_location(calm, reading(0))
+
+        alerts = (await contract.get_product_traceability(hot))["alerts"]
+        assert [alert["level"] for alert in alerts] == ["high"]
+        assert (await contract.get_product_traceability(calm))["alerts"] == []
+        assert set(contract.alerts_by_product) == {hot}
+        assert list(contract.alerts_by_level[RiskLevel.HIGH]) == [alerts[0]["id"]]
+        assert contract.alerts[alerts[0]["id"]].product_id == hot
+
+@async_test
+async def test_repeats_coalesce_into_one_open_alert():
+    async with running_contract() as contract:
+        product_id = await contract.register_product(product_data(0))
+        for index in range(3):
+            await contract.update_location(product_id, reading(index, temperature=45.0, humidity=90.0))
+        (alert,) = contract.alerts.values()
+        first_seen, last_seen = alert.first_seen, alert.last_seen
+
+        # A worse occurrence escalates the open alert; a milder one keeps the worst level
+        await contract._raise_alert(product_id, alert.type, RiskLevel.CRITICAL, "Cold chain broken", None)
+        await contract._raise_alert(product_id, alert.type, RiskLevel.HIGH, "Still warm", None)
+        traceability = await contract.get_product_traceability(product_id)
+
+    assert len(contract.alerts) == 1
+    assert alert.count == 5
+    assert alert.first_seen == first_seen == alert.timestamp
+    assert last_seen >= first_seen and alert.last_seen >= last_seen
+    assert (alert.level, alert.message) == (RiskLevel.CRITICAL, "Cold chain broken")
+    assert list(contract.alerts_by_level[RiskLevel.CRITICAL]) == [alert.id]
+    assert not contract.alerts_by_level[RiskLevel.HIGH]
+    assert [(entry["count"], entry["level"]) for entry in traceability["alerts"]] == [(5, "critical")]
+
+@async_test
+async def test_closed_alerts_are_evicted_beyond_retention():
+    async with running_contract() as contract:
+        contract.configure_alert_policy(rate_limit=None, max_closed_alerts=2)
+        product_ids = [await contract.register_product(product_data(index)) for index in range(5)]
+        for product_id in product_ids:
+            await contract.update_location(product_id, reading(0, temperature=45.0, humidity=90.0))
+        alert_ids = [next(iter(contract.alerts_by_product[product_id])) for product_id in product_ids]
+
+        for alert_id in alert_ids[:4]:
+            await contract.resolve_alert(alert_id, "Handled")
+        stats = await contract.get_sensor_statistics(product_ids[0])
+
+        # Only the two most recently closed alerts and the open one remain
+        assert set(contract.alerts) == set(alert_ids[2:])
+        assert set(contract.alerts_by_product) == set(product_ids[2:])
+        assert (await contract.get_product_traceability(product_ids[0]))["alerts"] == []
+        assert (stats["alerts"], stats["resolved_alerts"]) == (1, 1)
+
+        # Shrinking retention evicts immediately; open alerts are never evicted
+        contract.configure_alert_policy(rate_limit=None, max_closed_alerts=0)
+        assert list(contract.alerts) == [alert_ids[4]]
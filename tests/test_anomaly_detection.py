@@ -0,0 +1,58 @@
+import random
+
+from chainaware_traceability import TEMPERATURE_MAX, SensorAnomalyDetector
+
+from helpers import async_test, product_data, reading, running_contract
+
+def drifting_temperatures(count, slope=0.05, noise=0.2):
+    generator = random.Random(3)
+    return [4.0 + slope * index + generator.gauss(0.0, noise) for index in range(count)]
+
+def noisy_temperatures(count, noise=0.3):
+    generator = random.Random(5)
+    return [4.0 + generator.gauss(0.0, noise) for _ in range(count)]
+
+async def record_factors(contract, product_id, temperatures):
+    """Feed readings through update_location and keep each reading's risk assessment"""
+    assessments = []
+    record_location = contract._record_location
+
+    async def recording(product_id, location, risk_assessment=None):
+        result = await record_location(product_id, location, risk_assessment)
+        assessments.append(result[0])
+        return result
+
+    contract._record_location = recording
+    for index, temperature in enumerate(temperatures):
+        await contract.update_location(product_id, reading(index, temperature=temperature))
+    return assessments
+
+def test_cusum_trips_on_slow_drift_well_inside_thresholds():
+    detector = SensorAnomalyDetector(noise_floor=0.5)
+    results = [detector.update(value) for value in drifting_temperatures(400)]
+    first = results.index("drift")
+    assert "spike" not in results[:first]
+    assert drifting_temperatures(400)[first] < TEMPERATURE_MAX / 4
+
+@async_test
+async def test_drift_raises_the_risk_level_before_the_threshold():
+    temperatures = drifting_temperatures(60)
+    async with running_contract() as contract:
+        product_id = await contract.register_product(product_data(0))
+        assessments = await record_factors(contract, product_id, temperatures)
+
+    flagged = [index for index, assessment in enumerate(assessments) if "temperature_drift" in assessment.factors]
+    assert flagged
+    assert all(temperature < TEMPERATURE_MAX for temperature in temperatures)
+    assert assessments[flagged[0]].level.value == "medium"
+    assert "temperature_extreme" not in assessments[flagged[0]].factors
+
+@async_test
+async def test_steady_noise_raises_no_anomaly():
+    async with running_contract() as contract:
+        product_id = await contract.register_product(product_data(0))
+        assessments = await record_factors(contract, product_id, noisy_temperatures(2000))
+        assert not contract.alerts
+
+    assert all(assessment.factors == [] for assessment in assessments)
+    assert {assessment.level.value for assessment in assessments} == {"low"}
@@ -0,0 +1,39 @@
+from chainaware_traceability import MemoryEventSink
+
+from helpers import async_test, product_data, running_contract
+
+async def stream(records):
+    for record in records:
+        yield record
+
+@async_test
+async def test_duplicates_are_rejected_within_and_across_batches():
+    calls = []
+
+    async def verify(code, category):
+        calls.append((code, category))
+        return True
+
+    missing_name = product_data(4)
+    del missing_name["name"]
+    records = [product_data(0), product_data(1), product_data(0), product_data(1), product_data(3), missing_name]
+
+    async with running_contract() as contract:
+        sink = MemoryEventSink()
+        await contract.configure_event_sink(sink)
+        contract._verify_regulatory_api = verify
+        results = await contract.register_products_bulk(stream(records), batch_size=3)
+        await contract.event_log.flush()
+
+    assert [result["index"] for result in results] == list(range(6))
+    assert [result["success"] for result in results] == [True, True, False, False, True, False]
+    assert results[2]["error"].endswith("appears earlier in the batch")
+    assert results[3]["error"].endswith("is already registered")
+    assert "Missing required field: name" in results[5]["error"]
+    assert results[2]["product_id"] == results[0]["product_id"]
+    assert set(contract.products) == {results[index]["product_id"] for index in (0, 1, 4)}
+
+    # One regulatory check per distinct (code, category) and one summary event per batch
+    assert calls == [("FDA-21-CFR-11", "food")]
+    summaries = [event["data"] for event in sink.events if event["event"] == "PRODUCTS_BULK_REGISTERED"]
+    assert [(summary["registered"], summary["failed"]) for summary in summaries] == [(2, 1), (1, 2)]
@@ -0,0 +1,115 @@
+import asyncio
+
+from chainaware_traceability import TTLCache
+
+from helpers import async_test, product_data, reading, running_contract
+
+@async_test
+async def test_invalidation_during_load_is_not_overwritten():
+    cache = TTLCache()
+    release = asyncio.Event()
+    verdicts = iter(["stale", "fresh"])
+
+    async def loader():
+        verdict = next(verdicts)
+        if verdict == "stale":
+            await release.wait()
+        return verdict
+
+    pending = asyncio.ensure_future(cache.get_or_load(("FDA", "food"), loader))
+    await asyncio.sleep(0)
+    assert cache.invalidate_where(lambda key: key[1] == "food") == 1
+    release.set()
+    assert await pending == "stale"
+    assert ("FDA", "food") not in cache
+    assert await cache.get_or_load(("FDA", "food"), loader) == "fresh"
+
+class StubProvider:
+    """Local provider stand-in that counts its calls"""
+
+    def __init__(self, delay: float = 0.0, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self, key="region"):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return {"key": key, "call": self.calls}
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@async_test
+async def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(ttl=60.0, clock=clock)
+    provider = StubProvider()
+
+    assert (await cache.get_or_load("region", provider))["call"] == 1
+    clock.now = 59.9
+    assert (await cache.get_or_load("region", provider))["call"] == 1
+    clock.now = 60.0
+    assert (await cache.get_or_load("region", provider))["call"] == 2
+    assert provider.calls == 2
+    assert cache.stats()["expirations"] == 1
+    assert (cache.hits, cache.misses) == (1, 2)
+
+@async_test
+async def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2)
+    provider = StubProvider()
+    for key in ("a", "b"):
+        await cache.get_or_load(key, lambda key=key: provider(key))
+    await cache.get_or_load("a", lambda: provider("a"))  # "b" is now the least recently used
+    await cache.get_or_load("c", lambda: provider("c"))
+
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.evictions == 1
+    await cache.get_or_load("b", lambda: provider("b"))
+    assert provider.calls == 4
+
+@async_test
+async def test_concurrent_identical_loads_share_one_call():
+    cache = TTLCache()
+    provider = StubProvider(delay=0.01)
+    results = await asyncio.gather(*(cache.get_or_load("region", provider) for _ in range(50)))
+
+    assert provider.calls == 1
+    assert all(result is results[0] for result in results)
+    assert (cache.misses, cache.coalesced) == (1, 49)
+
+@async_test
+async def test_errors_reach_every_waiter_and_are_not_cached():
+    cache = TTLCache()
+    provider = StubProvider(delay=0.01, error=ConnectionError("provider down"))
+    results = await asyncio.gather(*(cache.get_or_load("region", provider) for _ in range(3)),
+                                   return_exceptions=True)
+    assert provider.calls == 1
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert "region" not in cache
+
+    provider.error = None
+    assert (await cache.get_or_load("region", provider))["call"] == 2
+
+@async_test
+async def test_delivery_predictions_share_cached_lookups():
+    async with running_contract() as contract:
+        weather, traffic = StubProvider(), StubProvider()
+        contract._get_weather_data = lambda origin, destination: weather()
+        contract._get_traffic_data = lambda origin, destination: traffic()
+        product_ids = [await contract.register_product(product_data(index)) for index in range(2)]
+        for product_id in product_ids:
+            await contract.update_location(product_id, reading(0))
+        for product_id in product_ids * 2:
+            await contract.predict_delivery_risks(product_id, {"latitude": 48.85, "longitude": 2.35})
+        stats = contract.get_cache_stats()
+
+    assert (weather.calls, traffic.calls) == (1, 1)
+    assert (stats["misses"], stats["hits"]) == (2, 6)
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import time
+
+from chainaware_traceability import MemoryEventSink, SnapshotBuffer
+from helpers import async_test, product_data, reading, running_contract
+
+@async_test
+async def test_writes_after_checkpoint_and_restart_are_recovered(tmp_path):
+    async with running_contract() as contract:
+        await contract.enable_durability(str(tmp_path), fsync_interval=0)
+        first = await contract.register_product(product_data(0))
+        await contract.checkpoint()
+
+    # Restart, write, then crash without a checkpoint
+    async with running_contract() as restarted:
+        await restarted.enable_durability(str(tmp_path), fsync_interval=0)
+        second = await restarted.register_product(product_data(1))
+        await restarted.update_location(second, reading(0))
+
+    async with running_contract() as recovered:
+        recovery = await recovered.enable_durability(str(tmp_path), fsync_interval=0)
+        assert recovery["records"] == 2
+        assert set(recovered.products) == {first, second}
+        assert len(recovered.locations[second]) == 1
+
+@async_test
+async def test_synced_writes_do_not_block_the_loop(tmp_path, monkeypatch):
+    async with running_contract() as contract:
+        await contract.enable_durability(str(tmp_path), fsync_interval=0)
+        product_id = await contract.register_product(product_data(0))
+
+        fsync = os.fsync
+        def slow_fsync(descriptor):
+            time.sleep(0.05)
+            fsync(descriptor)
+        monkeypatch.setattr(os, "fsync", slow_fsync)
+
+        ticks = 0
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+        ticker = asyncio.ensure_future(tick())
+        await contract.update_location(product_id, reading(0))
+        ticker.cancel()
+
+        # The loop kept running during the fsync, and the call still returned only once synced
+        stats = contract.get_durability_stats()
+        assert ticks >= 3
+        assert stats["commits"] == stats["records"] and stats["pending_bytes"] == 0
+
+@async_test
+async def test_failed_periodic_checkpoint_is_reported_and_retried(tmp_path, monkeypatch):
+    async with running_contract() as contract:
+        sink = MemoryEventSink()
+        await contract.configure_event_sink(sink)
+        await contract.enable_durability(str(tmp_path), fsync_interval=0, checkpoint_interval=0.01)
+
+        def full_disk(self, path):
+            raise OSError("No space left on device")
+        monkeypatch.setattr(SnapshotBuffer, "save", full_disk)
+        await asyncio.sleep(0.05)
+        await contract.event_log.flush()
+
+        stats = contract.get_durability_stats()
+        assert stats["checkpoint_failures"] >= 2
+        assert stats["last_checkpoint_error"] == "No space left on device"
+        assert any(event["event"] == "CHECKPOINT_ERROR" for event in sink.events)
+        assert not contract._checkpoint_task.done()
@@ -0,0 +1,48 @@
+import asyncio
+import io
+import sys
+import time
+
+from chainaware_traceability import MemoryEventSink, StdoutEventSink
+
+from helpers import async_test, running_contract
+
+@async_test
+async def test_logged_event_is_not_changed_by_caller_mutation():
+    async with running_contract() as contract:
+        sink = MemoryEventSink()
+        await contract.configure_event_sink(sink)
+        result = await contract.verify_document({"type": "certificate", "number": 1})
+        result["verified"] = "tampered"
+        result["issues"].append("tampered")
+        await contract.event_log.flush()
+
+    event = sink.events[0]
+    assert event["data"]["verified"] != "tampered"
+    assert "tampered" not in event["data"]["issues"]
+
+class SlowStdout(io.StringIO):
+    """A terminal that takes a while to accept each write"""
+
+    def write(self, text):
+        time.sleep(0.2)
+        return super().write(text)
+
+@async_test
+async def test_stdout_sink_does_not_block_the_event_loop(monkeypatch):
+    stdout = SlowStdout()
+    monkeypatch.setattr(sys, "stdout", stdout)
+    async with running_contract() as contract:
+        await contract.configure_event_sink(StdoutEventSink())
+        await contract.verify_document({"type": "certificate", "number": 2})
+        drain = asyncio.ensure_future(contract.event_log.flush())
+        await asyncio.sleep(0.01)
+
+        # The loop keeps turning while the sink's write is still in progress
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        assert time.perf_counter() - started < 0.1
+        assert not drain.done()
+        await drain
+
+    assert stdout.getvalue().startswith("ChainAware Event: DOCUMENT_VERIFIED - ")
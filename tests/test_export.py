@@ -0,0 +1,86 @@
+import csv
+import io
+import json
+import tracemalloc
+
+import pytest
+
+from chainaware_traceability import EXPORT_CSV_COLUMNS
+
+from helpers import async_test, product_data, reading, running_contract
+
+async def catalog(contract, products=10, readings=5):
+    product_ids = []
+    for index in range(products):
+        product_id = await contract.register_product(product_data(index))
+        for row in range(readings):
+            await contract.update_location(product_id, reading(row))
+        product_ids.append(product_id)
+    return product_ids
+
+async def collect(lines):
+    return [line async for line in lines]
+
+@async_test
+async def test_ndjson_export_of_a_batch():
+    async with running_contract() as contract:
+        product_ids = await catalog(contract)
+        await contract.update_location(product_ids[1], reading(5, temperature=45.0, humidity=90.0))
+        records = [json.loads(line) for line in await collect(contract.export_traceability(batch_number="B0001"))]
+        expected_histories = {
+            product_id: (await contract.get_product_traceability(product_id))["location_history"]
+            for product_id in (product_ids[1], product_ids[6])
+        }
+
+    assert [(record["record_type"], record["product_id"]) for record in records] == (
+        [("product", product_ids[1])] + [("location", product_ids[1])] * 6 + [("alert", product_ids[1])]
+        + [("product", product_ids[6])] + [("location", product_ids[6])] * 5
+    )
+    assert records[0]["batch_number"] == "B0001"
+    for product_id, history in expected_histories.items():
+        rows = [record for record in records if record["record_type"] == "location" and record["product_id"] == product_id]
+        assert [{key: row[key] for key in history[0]} for row in rows] == history
+    assert records[7]["level"] == "high"
+
+@async_test
+async def test_csv_export_with_inclusive_time_bounds():
+    async with running_contract() as contract:
+        product_ids = await catalog(contract, products=2)
+        lines = await collect(contract.export_traceability(
+            format="csv", manufacturer="Manufacturer 0", since=reading(1)["timestamp"], until=reading(3)["timestamp"],
+            record_types=("location",)
+        ))
+
+    rows = list(csv.DictReader(io.StringIO("".join(lines))))
+    assert lines[0].rstrip("\n").split(",") == list(EXPORT_CSV_COLUMNS)
+    assert [(row["record_type"], row["product_id"], row["timestamp"]) for row in rows] == [
+        ("location", product_ids[0], reading(index)["timestamp"]) for index in (1, 2, 3)
+    ]
+    assert rows[0]["temperature"] == "4.0" and rows[0]["name"] == ""
+
+@async_test
+async def test_export_rejects_unknown_formats_and_record_types():
+    async with running_contract() as contract:
+        with pytest.raises(Exception, match="Unknown export format"):
+            await collect(contract.export_traceability(format="xml"))
+        with pytest.raises(Exception, match="Unknown export record types"):
+            await collect(contract.export_traceability(record_types=("shipment",)))
+
+@async_test
+async def test_export_memory_does_not_grow_with_history():
+    async with running_contract() as contract:
+        product_id = await contract.register_product(product_data(0))
+        await contract.update_locations_bulk([(product_id, reading(row)) for row in range(5000)])
+
+        exported = 0
+        tracemalloc.start()
+        try:
+            async for line in contract.export_traceability():
+                exported += len(line)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    # Over 1 MB is exported while no more than a few lines are alive at once
+    assert exported > 1_000_000
+    assert peak < 100_000
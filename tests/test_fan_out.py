@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+from helpers import async_test, product_data, reading, running_contract
+
+DESTINATION = {"latitude": 48.85, "longitude": 2.35}
+
+def delayed(seconds, result=None, error=None):
+    """Stub provider that answers after a delay, counting its calls"""
+    async def provider(*args):
+        provider.calls += 1
+        await asyncio.sleep(seconds)
+        if error is not None:
+            raise error
+        return result
+    provider.calls = 0
+    return provider
+
+async def tracked_product(contract):
+    product_id = await contract.register_product(product_data(0))
+    await contract.update_location(product_id, reading(0))
+    return product_id
+
+@async_test
+async def test_sources_are_awaited_concurrently():
+    async with running_contract() as contract:
+        product_id = await tracked_product(contract)
+        contract._get_weather_data = delayed(0.2, {"severe_weather": False})
+        contract._get_traffic_data = delayed(0.2, {"congestion_level": 0.1})
+        contract._analyze_historical_patterns = delayed(0.2, [])
+
+        started = time.perf_counter()
+        prediction = await contract.predict_delivery_risks(product_id, DESTINATION)
+        elapsed = time.perf_counter() - started
+
+    # The slowest source, not the sum of all three
+    assert elapsed < 0.4
+    assert prediction.factors == []
+    assert contract._get_weather_data.calls == contract._get_traffic_data.calls == 1
+
+@async_test
+async def test_slow_and_failing_sources_are_recorded_as_degraded():
+    async with running_contract() as contract:
+        product_id = await tracked_product(contract)
+        contract.source_timeouts["weather"] = 0.05
+        contract._get_weather_data = delayed(5.0, {"severe_weather": True})
+        contract._get_traffic_data = delayed(0.0, error=ConnectionError("traffic API down"))
+        contract._analyze_historical_patterns = delayed(0.0, [])
+
+        started = time.perf_counter()
+        prediction = await contract.predict_delivery_risks(product_id, DESTINATION)
+        elapsed = time.perf_counter() - started
+
+    assert elapsed < 1.0
+    assert sorted(prediction.factors) == ["traffic_unavailable", "weather_timeout"]
+    assert prediction.level.value == "medium"
+
+@async_test
+async def test_document_check_degrades_when_fraud_analysis_times_out():
+    async with running_contract() as contract:
+        contract.source_timeouts["fraud_analysis"] = 0.05
+        contract._analyze_document_fraud_risk = delayed(5.0, 0.0)
+        result = await contract.verify_document({"type": "certificate", "number": 7})
+
+    assert result["degraded_factors"] == ["fraud_analysis_timeout"]
+    assert result["verified"] is False
+    assert "Fraud analysis unavailable" in result["issues"]
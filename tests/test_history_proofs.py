@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from chainaware_traceability import verify_history_proof
+
+from helpers import async_test, product_data, reading, running_contract
+
+SIZES = [1, 2, 3, 5, 7, 8, 13, 16, 17]
+
+async def product_with_readings(contract, count, index=0):
+    product_id = await contract.register_product(product_data(index))
+    for row in range(count):
+        await contract.update_location(product_id, reading(row, temperature=4.0 + row % 3))
+    return product_id
+
+def flip(hex_digest):
+    return ("0" if hex_digest[0] != "0" else "1") + hex_digest[1:]
+
+@pytest.mark.parametrize("size", SIZES)
+@async_test
+async def test_every_reading_verifies_against_the_root(size):
+    async with running_contract() as contract:
+        product_id = await product_with_readings(contract, size)
+        root = await contract.get_history_root(product_id)
+        proofs = [await contract.get_history_proof(product_id, index) for index in range(size)]
+
+    assert root["readings"] == size
+    for proof in proofs:
+        assert proof["root"] == root["root"]
+        assert verify_history_proof(proof["reading"], proof, root["root"])
+
+@async_test
+async def test_tampered_reading_sibling_or_root_fails():
+    async with running_contract() as contract:
+        product_id = await product_with_readings(contract, 11)
+        root = (await contract.get_history_root(product_id))["root"]
+        proof = await contract.get_history_proof(product_id, 4)
+
+    assert verify_history_proof(proof["reading"], proof, root)
+    assert not verify_history_proof({**proof["reading"], "temperature": 25.0}, proof, root)
+    assert not verify_history_proof(proof["reading"], {**proof, "siblings": [flip(proof["siblings"][0])] + proof["siblings"][1:]}, root)
+    assert not verify_history_proof(proof["reading"], {**proof, "peaks": [flip(proof["peaks"][0])] + proof["peaks"][1:]}, root)
+    assert not verify_history_proof(proof["reading"], {**proof, "index": 5}, root)
+    assert not verify_history_proof(proof["reading"], proof, flip(root))
+
+async def roots_of(contract, product_ids):
+    return [(await contract.get_history_root(product_id))["root"] for product_id in product_ids]
+
+@async_test
+async def test_roots_survive_snapshot_and_wal_replay(tmp_path):
+    path = os.path.join(tmp_path, "state.snap")
+    journal = os.path.join(tmp_path, "wal")
+    async with running_contract() as contract:
+        await contract.enable_durability(journal, fsync_interval=0)
+        product_ids = [await product_with_readings(contract, size, index) for index, size in enumerate((5, 8, 13))]
+        expected = await roots_of(contract, product_ids)
+        await contract.save_snapshot(path)
+
+    async with running_contract() as restored:
+        await restored.load_snapshot(path)
+        assert await roots_of(restored, product_ids) == expected
+        proof = await restored.get_history_proof(product_ids[2], 12)
+        assert verify_history_proof(proof["reading"], proof, expected[2])
+
+        # Readings appended after a restore extend the same commitment
+        await restored.update_location(product_ids[0], reading(5))
+        assert (await restored.get_history_root(product_ids[0]))["readings"] == 6
+
+    async with running_contract() as replayed:
+        recovery = await replayed.enable_durability(journal, fsync_interval=0)
+        assert recovery["records"] > 0
+        assert await roots_of(replayed, product_ids) == expected
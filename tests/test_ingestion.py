@@ -0,0 +1,46 @@
+import pytest
+
+from helpers import async_test, product_data, reading, running_contract
+
+@async_test
+async def test_update_location_rejects_non_numeric_fields():
+    async with running_contract() as contract:
+        product_id = await contract.register_product(product_data(0))
+        with pytest.raises(Exception, match="Invalid location field: latitude"):
+            await contract.update_location(product_id, reading(0, latitude="40.1"))
+        with pytest.raises(Exception, match="Invalid location field: temperature"):
+            await contract.update_location(product_id, reading(1, temperature=float("nan")))
+        await contract.update_location(product_id, reading(2))
+        traceability = await contract.get_product_traceability(product_id)
+    assert len(traceability["location_history"]) == 1
+
+@async_test
+async def test_bulk_update_reports_each_failure_and_keeps_going():
+    async with running_contract() as contract:
+        product_id = await contract.register_product(product_data(0))
+        batch = [
+            (product_id, reading(0)),
+            (product_id, reading(1, latitude="north")),
+            ("missing", reading(2)),
+            (product_id, reading(3, humidity=[55])),
+            (product_id, reading(4, latitude=95.0)),
+            (product_id, reading(5))
+        ]
+        results = await contract.update_locations_bulk(batch)
+
+        # A failure while storing is reported for that item only
+        original = contract._record_location
+        async def failing(product_id, location, risk_assessment=None):
+            raise Exception("storage failed")
+        contract._record_location = failing
+        failed = await contract.update_locations_bulk([(product_id, reading(6))])
+        contract._record_location = original
+
+        traceability = await contract.get_product_traceability(product_id)
+
+    assert [result["success"] for result in results] == [True, False, False, False, False, True]
+    assert results[1]["error"] == "Invalid location field: latitude"
+    assert results[3]["error"] == "Invalid location field: humidity"
+    assert results[4]["error"] == "Coordinates out of range"
+    assert failed == [{"index": 0, "product_id": product_id, "success": False, "error": "storage failed"}]
+    assert len(traceability["location_history"]) == 2
@@ -0,0 +1,23 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from chainaware_traceability import LocationData, LocationHistory
+
+def test_failed_append_leaves_columns_aligned():
+    history = LocationHistory()
+    history.append(LocationData(latitude=40.0, longitude=-3.7, timestamp=datetime(2024, 1, 1), temperature=4.0))
+    with pytest.raises((TypeError, ValueError)):
+        history.append(LocationData(latitude=41.0, longitude=-3.7, timestamp=datetime(2024, 1, 2), temperature="warm"))
+    with pytest.raises((TypeError, ValueError)):
+        history.append(LocationData(latitude="north", longitude=-3.7, timestamp=datetime(2024, 1, 2)))
+
+    assert {len(getattr(history, name)) for name, _ in LocationHistory.COLUMNS} == {1}
+    assert history.get(0).latitude == 40.0
+
+def test_append_round_trips_values():
+    timestamp = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+    history = LocationHistory()
+    history.append(LocationData(latitude=40, longitude=-3.5, timestamp=timestamp, humidity=None, shock_level=2))
+    reading = history.get(0)
+    assert (reading.latitude, reading.timestamp, reading.humidity, reading.shock_level) == (40.0, timestamp, None, 2.0)
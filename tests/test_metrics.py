@@ -0,0 +1,50 @@
+import pytest
+
+from chainaware_traceability import INSTRUMENTED_METHODS
+
+from helpers import async_test, product_data, reading, running_contract
+
+def histogram_counts(contract, name, label):
+    return {
+        entry["labels"][label]: entry["count"]
+        for entry in contract.get_metrics()["histograms"].get(name, [])
+    }
+
+def counter(contract, name):
+    return sum(entry["value"] for entry in contract.get_metrics()["counters"].get(name, []))
+
+@async_test
+async def test_public_methods_are_wrapped_and_stages_timed_inline():
+    async with running_contract() as contract:
+        contract.enable_metrics()
+        assert set(INSTRUMENTED_METHODS) <= set(contract.__dict__)
+        assert "_store_location" not in contract.__dict__ and "_raise_alert" not in contract.__dict__
+
+        product_id = await contract.register_product(product_data(0))
+        await contract.update_location(product_id, reading(0))
+        await contract.update_location(product_id, reading(1, temperature=60.0, shock_level=9.0))
+
+        methods = histogram_counts(contract, "method_duration_seconds", "method")
+        stages = histogram_counts(contract, "stage_duration_seconds", "stage")
+        assert methods["register_product"] == 1 and methods["update_location"] == 2
+        assert stages["validation"] == 1 and stages["regulatory_compliance"] == 1
+        assert stages["store_location"] == 2 and stages["risk_analysis"] == 2
+        assert stages["alert_creation"] == 1
+        assert counter(contract, "readings_ingested_total") == 2
+        assert counter(contract, "alerts_raised_total") == 1
+
+        # Turning metrics off removes the wrappers and stops stage timing, keeping the data
+        contract.disable_metrics()
+        assert not set(INSTRUMENTED_METHODS) & set(contract.__dict__)
+        await contract.update_location(product_id, reading(2))
+        assert histogram_counts(contract, "stage_duration_seconds", "stage")["store_location"] == 2
+        assert counter(contract, "readings_ingested_total") == 2
+
+@async_test
+async def test_errors_are_counted_per_public_method():
+    async with running_contract() as contract:
+        contract.enable_metrics()
+        with pytest.raises(Exception, match="Product not found"):
+            await contract.update_location("missing", reading(0))
+        errors = contract.get_metrics()["counters"]["method_errors_total"]
+        assert errors == [{"labels": {"method": "update_location"}, "value": 1}]
@@ -0,0 +1,69 @@
+import random
+import statistics
+
+import pytest
+
+from chainaware_traceability import HUMIDITY_MAX, HUMIDITY_MIN, SHOCK_MAX, TEMPERATURE_MAX, TEMPERATURE_MIN
+
+from helpers import async_test, product_data, reading, running_contract
+
+def out_of_range(sensor, value):
+    if not value:
+        return False
+    if sensor == "temperature":
+        return value < TEMPERATURE_MIN or value > TEMPERATURE_MAX
+    if sensor == "humidity":
+        return value < HUMIDITY_MIN or value > HUMIDITY_MAX
+    return value > SHOCK_MAX
+
+def random_readings(count):
+    generator = random.Random(13)
+    seconds = 0
+    readings = []
+    for index in range(count):
+        seconds += generator.randint(1, 30)
+        values = {
+            "temperature": generator.uniform(-5.0, 45.0),
+            "humidity": generator.uniform(20.0, 90.0),
+            "shock_level": generator.uniform(0.0, 7.0)
+        }
+        for sensor in values:
+            if generator.random() < 0.2:
+                values[sensor] = None
+        readings.append(reading(seconds, **values))
+    return readings
+
+@async_test
+async def test_running_aggregates_match_a_recomputation():
+    readings = random_readings(300)
+    async with running_contract() as contract:
+        contract.configure_anomaly_detection(False)
+        product_id = await contract.register_product(product_data(0))
+        for location_data in readings:
+            await contract.update_location(product_id, location_data)
+        alerts = (await contract.get_product_traceability(product_id))["alerts"]
+        await contract.resolve_alert(alerts[0]["id"], "Reefer unit repaired")
+        statistics_now = await contract.get_sensor_statistics(product_id)
+        score = (await contract.get_product_traceability(product_id))["traceability_score"]
+
+    assert statistics_now["readings"] == len(readings)
+    for sensor, summary in statistics_now["sensors"].items():
+        values = [location_data[sensor] for location_data in readings if location_data[sensor] is not None]
+        assert summary["count"] == len(values)
+        assert summary["min"] == min(values) and summary["max"] == max(values)
+        assert summary["mean"] == pytest.approx(statistics.fmean(values))
+        assert summary["variance"] == pytest.approx(statistics.pvariance(values))
+
+    # Each interval is charged to the reading that starts it
+    history = contract.locations[product_id]
+    times = [history.get(index).timestamp for index in range(len(history))]
+    gaps = [(later - earlier).total_seconds() for earlier, later in zip(times, times[1:])]
+    assert statistics_now["tracked_seconds"] == pytest.approx(sum(gaps))
+    for sensor in ("temperature", "humidity", "shock_level"):
+        expected = sum(gap for location_data, gap in zip(readings, gaps) if out_of_range(sensor, location_data[sensor]))
+        assert statistics_now["seconds_out_of_range"][sensor] == pytest.approx(expected)
+
+    # Registration completeness, capped tracking points and the resolved share of alerts
+    assert statistics_now["alerts"] == len(alerts) > 1
+    assert statistics_now["resolved_alerts"] == 1
+    assert score == pytest.approx(20.0 + 15.0 + 30.0 + 20.0 / len(alerts))
@@ -0,0 +1,19 @@
+from helpers import async_test, product_data, running_contract
+
+@async_test
+async def test_query_matcher_rebuilds_only_for_new_manufacturers():
+    async with running_contract() as contract:
+        await contract.register_product(product_data(0))
+        await contract.query_natural_language("products from manufacturer 0")
+        matcher = contract._query_matcher
+
+        # Same manufacturer, new batch number, origin and codes
+        data = dict(product_data(3), batch_number="NEW-BATCH", origin="FR", regulatory_codes=["EU-GMP-9"])
+        await contract.register_product(data)
+        await contract.query_natural_language("products from manufacturer 0")
+        assert contract._query_matcher is matcher
+
+        await contract.register_product(dict(product_data(4), manufacturer="Acme Foods"))
+        intent = await contract._interpret_query_intent("products from acme foods")
+        assert contract._query_matcher is not matcher
+        assert intent["parameters"]["manufacturer"] == "Acme Foods"
@@ -0,0 +1,62 @@
+import pytest
+
+from chainaware_traceability import AlertType, ProductStatus, RiskLevel
+
+from helpers import async_test, product_data, reading, running_contract
+
+async def catalog(contract):
+    product_ids = []
+    for index in range(15):
+        data = product_data(index)
+        if index in (7, 14):
+            data["regulatory_codes"] = data["regulatory_codes"] + ["EU-GMP-9"]
+        product_id = await contract.register_product(data)
+        contract.set_alert_rate_limit(product_id, 0)
+        if index % 4 != 0:
+            await contract.update_location(product_id, reading(index))
+        product_ids.append(product_id)
+    return product_ids
+
+def recall_alerts(contract, product_id):
+    return [alert for alert in contract.alerts_by_product.get(product_id, {}).values()
+            if alert.type == AlertType.REGULATORY_VIOLATION]
+
+@async_test
+async def test_recall_by_batch_manufacturer_and_code():
+    async with running_contract() as contract:
+        product_ids = await catalog(contract)
+
+        by_batch = await contract.recall_products(batch_number="B0002", reason="Listeria")
+        by_manufacturer = await contract.recall_products(manufacturer="Manufacturer 1")
+        by_code = await contract.recall_products(regulatory_code="EU-GMP-9")
+        repeated = await contract.recall_products(batch_number="B0002")
+
+    recalled = {2, 7, 12} | {1, 4, 7, 10, 13} | {7, 14}
+    assert [entry["product_id"] for entry in by_batch["products"]] == [product_ids[index] for index in (2, 7, 12)]
+    assert (by_batch["affected"], by_batch["recalled"]) == (3, 3)
+    assert (by_manufacturer["affected"], by_manufacturer["recalled"]) == (5, 4)
+    assert (by_code["affected"], by_code["recalled"]) == (2, 1)
+    assert (repeated["affected"], repeated["recalled"]) == (3, 0)
+
+    for index, product_id in enumerate(product_ids):
+        alerts = recall_alerts(contract, product_id)
+        if index in recalled:
+            assert contract.products[product_id].status == ProductStatus.RECALLED
+            # Exactly one critical alert, despite a rate limit that suppresses everything else
+            assert [(alert.level, alert.count) for alert in alerts] == [(RiskLevel.CRITICAL, 1)]
+        else:
+            assert contract.products[product_id].status != ProductStatus.RECALLED
+            assert alerts == []
+    assert "Listeria" in recall_alerts(contract, product_ids[2])[0].message
+
+    # Latest positions, or None for products that never reported one
+    positions = {entry["product_id"]: (entry["latitude"], entry["longitude"]) for entry in by_manufacturer["products"]}
+    for index in (1, 4, 7, 10, 13):
+        expected = reading(index) if index % 4 else {"latitude": None, "longitude": None}
+        assert positions[product_ids[index]] == (expected["latitude"], expected["longitude"])
+
+@async_test
+async def test_recall_requires_a_criterion():
+    async with running_contract() as contract:
+        with pytest.raises(Exception, match="required"):
+            await contract.recall_products()
@@ -0,0 +1,91 @@
+import math
+import random
+import re
+
+import pytest
+
+from chainaware_traceability import KM_PER_DEGREE, AlertType, PlannedRoute, RiskLevel
+
+from helpers import async_test, product_data, reading, running_contract
+
+EQUATOR_ROUTE = [(0.0, 10.0), (0.0, 11.0), (0.0, 12.0)]
+DATELINE_ROUTE = [(-17.0, 178.0), (-17.0, 179.5), (-17.0, -179.5), (-17.0, -178.0)]
+
+def route_alerts(contract, product_id):
+    return [alert for alert in contract.alerts.values()
+            if alert.product_id == product_id and alert.type == AlertType.ROUTE_DEVIATION]
+
+async def routed_product(contract, waypoints):
+    product_id = await contract.register_product(product_data(0))
+    contract.set_planned_route(product_id, waypoints, tolerance_km=5.0)
+    return product_id
+
+@pytest.mark.parametrize("latitude, level", [
+    (0.02, None),               # 2.2 km, inside the corridor
+    (0.07, RiskLevel.MEDIUM),   # 7.8 km
+    (0.085, RiskLevel.MEDIUM),  # 9.5 km, just under twice the tolerance
+    (0.095, RiskLevel.HIGH),    # 10.6 km, just over it
+    (-1.0, RiskLevel.HIGH)
+])
+@async_test
+async def test_deviation_level_follows_distance(latitude, level):
+    async with running_contract() as contract:
+        product_id = await routed_product(contract, EQUATOR_ROUTE)
+        await contract.update_location(product_id, reading(0, latitude=latitude, longitude=10.5))
+        alerts = route_alerts(contract, product_id)
+    if level is None:
+        assert not alerts
+        return
+    (alert,) = alerts
+    assert alert.level == level
+    distance = float(re.search(r"is ([\d.]+) km off", alert.message).group(1))
+    assert distance == pytest.approx(abs(latitude) * KM_PER_DEGREE, abs=0.1)
+
+@async_test
+async def test_route_across_the_antimeridian():
+    async with running_contract() as contract:
+        product_id = await routed_product(contract, DATELINE_ROUTE)
+        for index, longitude in enumerate((179.9, 180.0, -179.9)):
+            await contract.update_location(product_id, reading(index, latitude=-17.02, longitude=longitude))
+        status = await contract.get_route_status(product_id)
+        assert not route_alerts(contract, product_id)
+        assert status["on_route"] and status["distance_km"] == pytest.approx(0.02 * KM_PER_DEGREE, abs=0.05)
+
+        await contract.update_location(product_id, reading(3, latitude=-16.85, longitude=-179.9))
+        (alert,) = route_alerts(contract, product_id)
+        assert alert.level == RiskLevel.HIGH
+        assert "16.7 km off" in alert.message
+
+@async_test
+async def test_repeated_deviations_coalesce():
+    async with running_contract() as contract:
+        product_id = await routed_product(contract, EQUATOR_ROUTE)
+        for index, latitude in enumerate((0.07, 0.08, 0.2, 0.07)):
+            await contract.update_location(product_id, reading(index, latitude=latitude, longitude=10.2 + index * 0.1))
+        await contract.update_location(product_id, reading(4, latitude=0.0, longitude=10.8))
+        (alert,) = route_alerts(contract, product_id)
+    assert alert.count == 4
+    assert alert.level == RiskLevel.HIGH  # the worst deviation so far
+    assert alert.first_seen <= alert.last_seen
+
+def test_nearest_and_find_within_match_a_full_scan():
+    generator = random.Random(7)
+    for _ in range(50):
+        latitude, longitude = generator.uniform(-60, 60), generator.uniform(-180, 180)
+        step = generator.choice([0.01, 0.5, 5.0])
+        waypoints = []
+        for _ in range(generator.choice([2, 9, 150])):
+            waypoints.append((latitude, (longitude + 180) % 360 - 180))
+            latitude += generator.uniform(-step, step) / 2
+            longitude += generator.uniform(-step, step)
+        route = PlannedRoute(waypoints, tolerance_km=5.0)
+        for _ in range(20):
+            base_lat, base_lon = generator.choice(waypoints)
+            point = (base_lat + generator.uniform(-2 * step, 2 * step), base_lon + generator.uniform(-2 * step, 2 * step))
+            scale = math.cos(math.radians(point[0]))
+            closest = min(route._segment_distance(segment, *point, scale)[0] for segment in range(route.segments))
+            hint = generator.randrange(route.segments)
+            assert route.nearest(*point)[0] == pytest.approx(closest, abs=1e-3)
+            assert route.nearest(*point, hint)[0] == pytest.approx(closest, abs=1e-3)
+            assert route.find_within(*point, closest * 1.001 + 1e-6, hint) is not None
+            assert route.find_within(*point, closest * 0.999 - 1e-6, hint) is None
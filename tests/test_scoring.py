@@ -0,0 +1,60 @@
+import itertools
+import math
+
+import pytest
+
+import chainaware_traceability as chainaware
+from chainaware_traceability import (
+    HUMIDITY_MAX, HUMIDITY_MIN, RISK_FACTORS, RISK_LEVEL_CODES, SHOCK_MAX, TEMPERATURE_MAX, TEMPERATURE_MIN,
+    LocationData, score_risk_batch
+)
+
+from helpers import START_TIME, async_test, running_contract
+
+def around(*thresholds: float):
+    """Each threshold with its neighbouring floats, plus zero and a missing value"""
+    values = [0.0, None]
+    for threshold in thresholds:
+        values += [math.nextafter(threshold, -math.inf), float(threshold), math.nextafter(threshold, math.inf)]
+    return values
+
+TEMPERATURES = around(TEMPERATURE_MIN, TEMPERATURE_MAX) + [-20.0, 20.0, 60.0]
+HUMIDITIES = around(HUMIDITY_MIN, HUMIDITY_MAX) + [10.0, 55.0, 95.0]
+SHOCKS = around(SHOCK_MAX) + [1.0, 9.0]
+CASES = list(itertools.product(TEMPERATURES, HUMIDITIES, SHOCKS))
+
+def columns():
+    return [[math.nan if case[field] is None else case[field] for case in CASES] for field in range(3)]
+
+async def scalar_scores():
+    async with running_contract() as contract:
+        scores = []
+        for temperature, humidity, shock_level in CASES:
+            location = LocationData(0.0, 0.0, START_TIME, temperature=temperature, humidity=humidity,
+                                    shock_level=shock_level)
+            scores.append(await contract._analyze_current_risks("p", location))
+    return scores
+
+def python_scores():
+    numpy = chainaware.np
+    chainaware.np = None
+    try:
+        return score_risk_batch(*columns())
+    finally:
+        chainaware.np = numpy
+
+def as_lists(scores):
+    levels, masks, confidences = scores
+    return [int(level) for level in levels], [int(mask) for mask in masks], [float(value) for value in confidences]
+
+@async_test
+async def test_python_batch_matches_scalar_path():
+    levels, masks, confidences = as_lists(python_scores())
+    for index, prediction in enumerate(await scalar_scores()):
+        assert RISK_LEVEL_CODES[levels[index]] == prediction.level, CASES[index]
+        assert [factor for bit, factor in enumerate(RISK_FACTORS) if masks[index] >> bit & 1] == prediction.factors
+        assert confidences[index] == prediction.confidence
+
+@pytest.mark.skipif(chainaware.np is None, reason="NumPy is not installed")
+def test_numpy_batch_matches_python_batch():
+    assert as_lists(score_risk_batch(*columns())) == as_lists(python_scores())
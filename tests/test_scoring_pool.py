@@ -0,0 +1,45 @@
+import math
+
+from chainaware_traceability import ScoringPool, hash_documents, score_risk_batch
+
+from helpers import async_test, product_data, reading, running_contract
+
+@async_test
+async def test_pool_results_match_inline_scoring():
+    size = 5000
+    product_ids = [f"{index % 97:016x}" for index in range(size)]
+    temperature = [-5.0 + (index % 60) for index in range(size)]
+    humidity = [math.nan if index % 13 == 0 else 20.0 + (index % 70) for index in range(size)]
+    shock_level = [math.nan if index % 11 == 0 else (index % 9) * 1.0 for index in range(size)]
+    documents = [{"product_id": product_ids[index], "number": index} for index in range(300)]
+
+    pool = ScoringPool(workers=3, min_batch=1)
+    try:
+        levels, masks, confidences = await pool.score(product_ids, temperature, humidity, shock_level)
+        digests = await pool.hash_documents([document["product_id"] for document in documents], documents)
+    finally:
+        pool.shutdown()
+
+    expected_levels, expected_masks, expected_confidences = score_risk_batch(temperature, humidity, shock_level)
+    assert list(levels) == [int(level) for level in expected_levels]
+    assert list(masks) == [int(mask) for mask in expected_masks]
+    assert list(confidences) == [float(confidence) for confidence in expected_confidences]
+    assert digests == hash_documents(documents)
+
+@async_test
+async def test_bulk_ingestion_uses_the_pool_only_when_asked():
+    async with running_contract() as contract:
+        product_ids = [await contract.register_product(product_data(index)) for index in range(3)]
+        contract.configure_anomaly_detection(enabled=False)
+        contract.enable_parallel_scoring(workers=2, min_batch=1)
+        batch = [(product_ids[index % 3], reading(index, temperature=-5.0 + index % 30)) for index in range(60)]
+
+        inline = await contract.update_locations_bulk(batch[:30])
+        assert contract.get_parallel_scoring_stats()["tasks"] == 0
+        pooled = await contract.update_locations_bulk(batch[30:], use_scoring_pool=True)
+        assert contract.get_parallel_scoring_stats()["items"] == 30
+
+        # Both halves have the same sensor values, so both paths must score them alike
+        levels = [result["risk_level"] for result in inline]
+        assert levels == [result["risk_level"] for result in pooled]
+        assert {"low", "medium"} <= set(levels)
@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+from helpers import START_TIME, async_test, product_data, running_contract
+
+@async_test
+async def test_bulk_registered_products_are_found_in_production_order():
+    order = list(range(200))
+    random.Random(7).shuffle(order)
+    async with running_contract() as contract:
+        await contract.register_products_bulk([product_data(index) for index in order])
+        page = await contract.search_products(produced_after=START_TIME.replace(minute=50).isoformat(),
+                                              produced_before=START_TIME.replace(hour=1, minute=9).isoformat(),
+                                              fields=["name"], limit=100)
+    assert [product["name"] for product in page["products"]] == [f"Product {index}" for index in range(50, 70)]
+    assert page["next_cursor"] is None
+
+@pytest.mark.parametrize("limit", [0, -1])
+@async_test
+async def test_search_rejects_non_positive_limit(limit):
+    async with running_contract() as contract:
+        await contract.register_product(product_data(0))
+        with pytest.raises(Exception, match="limit must be at least 1"):
+            await contract.search_products(limit=limit)
+
+@pytest.mark.parametrize("cursor", ["-1", "next", "2e3"])
+@async_test
+async def test_search_rejects_invalid_cursor(cursor):
+    async with running_contract() as contract:
+        await contract.register_product(product_data(0))
+        with pytest.raises(Exception, match="invalid cursor"):
+            await contract.search_products(cursor=cursor)
+
+@async_test
+async def test_search_cursor_walks_every_page():
+    async with running_contract() as contract:
+        await contract.register_products_bulk([product_data(index) for index in range(23)])
+        names, cursor = [], None
+        while True:
+            page = await contract.search_products(manufacturer="Manufacturer 1", fields=["name"], limit=3, cursor=cursor)
+            names.extend(product["name"] for product in page["products"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+    assert names == [f"Product {index}" for index in range(1, 23, 3)]
@@ -0,0 +1,43 @@
+import os
+
+from chainaware_traceability import ChainAwareTraceability
+
+from helpers import async_test, product_data, running_contract
+
+# Increasing instants written with different offsets, some sensors missing
+READINGS = [
+    {"latitude": 40.0, "longitude": -3.7, "timestamp": "2024-01-01T00:00:00",
+     "temperature": 4.0, "humidity": 55.0, "shock_level": 1.0},
+    {"latitude": 40.1, "longitude": -3.6, "timestamp": "2024-01-01T00:01:00+00:00",
+     "temperature": 45.0, "humidity": 90.0},
+    {"latitude": 40.2, "longitude": -3.5, "timestamp": "2024-01-01T02:02:00+02:00", "humidity": 90.0},
+    {"latitude": 40.3, "longitude": -3.4, "timestamp": "2023-12-31T18:33:00-05:30", "shock_level": 7.5},
+    {"latitude": 40.4, "longitude": -3.3, "timestamp": "2024-01-01T00:04:30.250000+00:00"}
+]
+
+async def state_of(contract: ChainAwareTraceability, product_ids):
+    return [
+        (await contract.get_product_traceability(product_id), await contract.get_sensor_statistics(product_id))
+        for product_id in product_ids
+    ]
+
+@async_test
+async def test_snapshot_round_trip_keeps_offsets_and_missing_values(tmp_path):
+    path = os.path.join(tmp_path, "state.snap")
+    async with running_contract() as contract:
+        product_ids = [await contract.register_product(product_data(index)) for index in range(2)]
+        for product_id in product_ids:
+            for location_data in READINGS:
+                assert await contract.update_location(product_id, location_data)
+        before = await state_of(contract, product_ids)
+        await contract.save_snapshot(path)
+
+    async with running_contract() as restored:
+        await restored.load_snapshot(path)
+        after = await state_of(restored, product_ids)
+
+    assert after == before
+    history = before[0][0]["location_history"]
+    assert [location["timestamp"][-6:] for location in history[1:4]] == ["+00:00", "+02:00", "-05:30"]
+    assert history[-1]["temperature"] is None and history[-1]["shock_level"] is None
+    assert before[0][0]["alerts"]
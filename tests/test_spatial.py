@@ -0,0 +1,61 @@
+from chainaware_traceability import Geofence, MemoryEventSink
+
+from helpers import async_test, product_data, reading, running_contract
+
+@async_test
+async def test_spatial_index_tracks_latest_position():
+    async with running_contract() as contract:
+        product_id = await contract.register_product(product_data(0))
+        await contract.update_location(product_id, reading(0, latitude=40.0, longitude=-3.7))
+        assert [entry["product_id"] for entry in await contract.find_products_within_radius(40.0, -3.7, 5.0)] == [product_id]
+
+        # Moving to Paris takes the product out of the Madrid query
+        await contract.update_location(product_id, reading(1, latitude=48.85, longitude=2.35))
+        assert await contract.find_products_within_radius(40.0, -3.7, 5.0) == []
+        nearest = await contract.find_nearest_products(48.8, 2.3, k=1)
+        assert nearest[0]["product_id"] == product_id
+        assert (nearest[0]["latitude"], nearest[0]["longitude"]) == (48.85, 2.35)
+        assert nearest[0]["distance_km"] < 10
+
+# Around Fiji, straddling the antimeridian
+DATELINE_FENCE = [(-15.0, 175.0), (-15.0, -175.0), (-20.0, -175.0), (-20.0, 175.0)]
+
+def test_polygon_across_the_antimeridian_contains_both_sides():
+    geofence = Geofence(id="fiji", polygon=DATELINE_FENCE)
+    assert geofence.contains(-17.0, 179.5) and geofence.contains(-17.0, -179.5) and geofence.contains(-17.0, 180.0)
+    assert not geofence.contains(-17.0, 170.0)
+    assert not geofence.contains(-17.0, -170.0)
+    assert not geofence.contains(-17.0, 0.0)
+    assert not geofence.contains(-25.0, 179.5)
+
+@async_test
+async def test_geofence_enter_and_exit_events():
+    async with running_contract() as contract:
+        sink = MemoryEventSink()
+        await contract.configure_event_sink(sink)
+        contract.add_geofence("fiji", polygon=DATELINE_FENCE)
+        contract.add_geofence("port", center=(-18.1, 178.4), radius_km=20.0)
+        product_id = await contract.register_product(product_data(0))
+
+        track = [(-17.0, 170.0), (-17.0, 179.5), (-17.0, -179.5), (-18.1, 178.45), (-17.0, -170.0)]
+        members, transitions = [], []
+        for index, (latitude, longitude) in enumerate(track):
+            await contract.update_location(product_id, reading(index, latitude=latitude, longitude=longitude))
+            await contract.event_log.flush()
+            transitions.append({(event["event"], event["data"]["geofence_id"]) for event in sink.events
+                                if event["event"].startswith("GEOFENCE_")})
+            sink.buffer.clear()
+            inside = []
+            for geofence_id in ("fiji", "port"):
+                if await contract.find_products_in_geofence(geofence_id):
+                    inside.append(geofence_id)
+            members.append(inside)
+
+    assert transitions == [
+        set(),
+        {("GEOFENCE_ENTERED", "fiji")},
+        set(),  # crossing the antimeridian inside the fence is not an exit
+        {("GEOFENCE_ENTERED", "port")},
+        {("GEOFENCE_EXITED", "fiji"), ("GEOFENCE_EXITED", "port")}
+    ]
+    assert members == [[], ["fiji"], ["fiji"], ["fiji", "port"], []]
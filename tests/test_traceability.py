@@ -0,0 +1,74 @@
+import math
+
+import pytest
+
+from helpers import async_test, product_data, reading, running_contract
+
+@pytest.mark.parametrize("bucket_seconds", [0, -60.0, math.nan, math.inf])
+@async_test
+async def test_bucket_downsampling_rejects_invalid_bucket_size(bucket_seconds):
+    async with running_contract() as contract:
+        product_id = await contract.register_product(product_data(0))
+        await contract.update_location(product_id, reading(0))
+        with pytest.raises(ValueError, match="bucket_seconds"):
+            await contract.get_product_traceability(product_id, downsample="bucket", bucket_seconds=bucket_seconds)
+
+@async_test
+async def test_bucket_downsampling_summarizes_each_bucket():
+    async with running_contract() as contract:
+        product_id = await contract.register_product(product_data(0))
+        for index in range(120):
+            await contract.update_location(product_id, reading(index))
+        result = await contract.get_product_traceability(product_id, downsample="bucket", bucket_seconds=60)
+    buckets = result["location_history"]
+    assert len(buckets) == 2
+    assert all(bucket["bucket_seconds"] == 60 for bucket in buckets)
+
+async def product_with_history(contract, readings=120):
+    product_id = await contract.register_product(product_data(0))
+    await contract.update_locations_bulk([
+        (product_id, reading(index, latitude=40.0 + (index % 7) * 0.01, temperature=4.0 + index % 5))
+        for index in range(readings)
+    ])
+    return product_id
+
+@pytest.mark.parametrize("limit", [0, -3])
+@async_test
+async def test_history_rejects_non_positive_limit(limit):
+    async with running_contract() as contract:
+        product_id = await product_with_history(contract)
+        with pytest.raises(Exception, match="limit must be at least 1"):
+            await contract.get_product_traceability(product_id, limit=limit)
+
+@pytest.mark.parametrize("cursor", ["-3", "abc", "1.5", " 2"])
+@async_test
+async def test_history_rejects_invalid_cursor(cursor):
+    async with running_contract() as contract:
+        product_id = await product_with_history(contract)
+        with pytest.raises(Exception, match="invalid cursor"):
+            await contract.get_product_traceability(product_id, limit=10, cursor=cursor)
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"downsample": "nth", "every": 7},
+    {"downsample": "bucket", "bucket_seconds": 9},
+    {"downsample": "douglas_peucker", "tolerance_km": 0.5},
+    {"downsample": "nth", "every": 3, "since": reading(10)["timestamp"], "until": reading(99)["timestamp"]}
+])
+@async_test
+async def test_pages_join_into_the_full_history(options):
+    async with running_contract() as contract:
+        product_id = await product_with_history(contract)
+        full = (await contract.get_product_traceability(product_id, **options))["location_history"]
+
+        pages, cursor = [], None
+        while True:
+            result = await contract.get_product_traceability(product_id, limit=4, cursor=cursor, **options)
+            pages.append(result["location_history"])
+            cursor = result["location_cursor"]
+            if cursor is None:
+                break
+
+    assert len(full) > 4
+    assert all(0 < len(page) <= 4 for page in pages)
+    assert [row for page in pages for row in page] == full